@@ -0,0 +1,448 @@
+"""
+This file combines the continuous monitors from all of the executors in a cluster (e.g., as copied
+by collect_continuous_monitors.py), to show how the resources of the whole cluster were used over
+time.
+
+The executors take their samples at different times, so the samples from each monitor are first
+resampled onto a time grid shared by all of the monitors. The result is then summarized with
+cluster-level statistics (e.g., the total network throughput, or the median and 95th percentile of
+the CPU utilization of the executors) for each time interval, and with heatmaps that show each
+executor's utilization over time, which make executors that were slower or busier than the rest
+stand out.
+"""
+
+import argparse
+import functools
+from os import path
+import warnings
+
+from matplotlib.backends import backend_agg
+from matplotlib.backends import backend_pdf
+from matplotlib import figure
+import numpy
+
+import log_files
+import monitor_table
+import plot_continuous_monitor
+import utils
+
+BIN = "bin"
+INTERPOLATE = "interpolate"
+# Series derived from the values for all of an executor's disks.
+MEAN_DISK_UTILIZATION = "disk utilization"
+TOTAL_RUNNING_DISK_MONOTASKS = "running disk monotasks"
+# The cluster-level statistics computed for each series, over the executors that have a value for
+# the series in each time interval.
+STATISTICS = ["executors", "sum", "mean", "min", "median", "95th percentile", "max"]
+# The series that are summarized and plotted by default, in addition to the utilization of each
+# disk.
+DEFAULT_SERIES = [
+  "cpu utilization",
+  "bytes received",
+  "bytes transmitted",
+  MEAN_DISK_UTILIZATION,
+  "running macrotasks",
+  "running compute monotasks",
+  TOTAL_RUNNING_DISK_MONOTASKS,
+  "gc fraction"
+]
+# The series that are shown in heatmaps, with one row per executor.
+HEATMAP_SERIES = [
+  "cpu utilization",
+  MEAN_DISK_UTILIZATION,
+  "bytes received",
+  "bytes transmitted",
+  "running macrotasks"
+]
+
+
+class AlignedMonitors(object):
+  """ The samples from several continuous monitors, resampled onto the same times.
+
+  times holds the start of each interval of the shared time grid, in milliseconds since the first
+  sample of any of the monitors, interval holds the length of the intervals, and names holds the
+  name of each monitor. series() returns a 2-D array with one row per monitor and one column per
+  interval, which is NaN for intervals where a monitor has no value (e.g., because it started later
+  than the others, or doesn't have the disk).
+  """
+
+  def __init__(self, times, interval, names, name_to_series):
+    self.times = times
+    self.interval = interval
+    self.names = names
+    self.__name_to_series = name_to_series
+
+  def series_names(self):
+    return sorted(self.__name_to_series)
+
+  def series(self, name):
+    return self.__name_to_series[name]
+
+  def summarize(self, name):
+    """
+    Returns a mapping from each of STATISTICS to an array with the value of that statistic over the
+    monitors for each interval. The statistics are NaN for intervals where none of the monitors
+    have a value.
+    """
+    values = self.series(name)
+    num_values = numpy.sum(~numpy.isnan(values), axis=0)
+    with warnings.catch_warnings():
+      # The NaN-aware functions warn about intervals where all of the values are NaN.
+      warnings.simplefilter("ignore", RuntimeWarning)
+      percentiles = numpy.nanpercentile(values, [50, 95], axis=0)
+      statistics = {
+        "executors": num_values.astype(numpy.float64),
+        "sum": numpy.where(num_values > 0, numpy.nansum(values, axis=0), numpy.nan),
+        "mean": numpy.nanmean(values, axis=0),
+        "min": numpy.nanmin(values, axis=0),
+        "median": percentiles[0],
+        "95th percentile": percentiles[1],
+        "max": numpy.nanmax(values, axis=0)
+      }
+    return statistics
+
+
+class MonitorDescription(object):
+  """ The extent of a continuous monitor, which is all that's needed to choose the time grid.
+
+  first_time and last_time hold the absolute times of the first and last samples (None if there
+  are no samples), median_gap holds the median time between consecutive samples (None if there are
+  fewer than two distinct times), and disk_names holds the names of the disks in the monitor.
+  """
+
+  def __init__(self, first_time, last_time, median_gap, disk_names):
+    self.first_time = first_time
+    self.last_time = last_time
+    self.median_gap = median_gap
+    self.disk_names = disk_names
+
+
+def get_series(table, name):
+  """
+  Returns an array with the values of the named series for each sample in the given MonitorTable,
+  or None if the table doesn't have the series (e.g., because it doesn't have the disk). The name
+  can be any name accepted by MonitorTable.series(), or one of the series derived from all of the
+  disks.
+  """
+  if name in [MEAN_DISK_UTILIZATION, TOTAL_RUNNING_DISK_MONOTASKS]:
+    if not table.disk_names:
+      return None
+    field = "utilization" if name == MEAN_DISK_UTILIZATION else "running disk monotasks"
+    disk_values = table.disk_column(field)
+    with warnings.catch_warnings():
+      warnings.simplefilter("ignore", RuntimeWarning)
+      if name == MEAN_DISK_UTILIZATION:
+        return numpy.nanmean(disk_values, axis=1)
+      return numpy.where(numpy.all(numpy.isnan(disk_values), axis=1), numpy.nan,
+        numpy.nansum(disk_values, axis=1))
+  disk_name, _, disk_field = name.partition(" ")
+  if (name not in monitor_table.COLUMN_INDICES and disk_field in monitor_table.DISK_COLUMN_INDICES
+      and disk_name not in table.disk_names):
+    return None
+  return table.series(name)
+
+
+def describe(table):
+  """ Returns a MonitorDescription of the given MonitorTable. """
+  # Monitors without any samples have no start time, and are NaN throughout.
+  times = table.column("time") + (table.start_time or 0)
+  gaps = numpy.diff(times)
+  gaps = gaps[gaps > 0]
+  return MonitorDescription(
+    times[0] if len(times) > 0 else None,
+    times[-1] if len(times) > 0 else None,
+    float(numpy.median(gaps)) if len(gaps) > 0 else None,
+    table.disk_names)
+
+
+def get_default_interval(descriptions):
+  """
+  Returns twice the median, over the given MonitorDescriptions, of the median time between
+  consecutive samples of each monitor. The monitors don't take their samples exactly periodically,
+  so with shorter intervals, some intervals would have no samples from a monitor (when binning).
+  """
+  median_gaps = [description.median_gap for description in descriptions
+    if description.median_gap is not None]
+  if not median_gaps:
+    return 1.0
+  return 2 * float(numpy.median(median_gaps))
+
+
+def get_grid(descriptions, interval=None):
+  """
+  Returns a tuple of the start time, interval length, and number of intervals of a time grid that
+  covers all of the samples of the monitors with the given MonitorDescriptions, with intervals of
+  the given length in milliseconds (by default, see get_default_interval()).
+  """
+  non_empty = [description for description in descriptions if description.first_time is not None]
+  if not non_empty:
+    raise ValueError("None of the continuous monitors have any samples")
+  if interval is None:
+    interval = get_default_interval(descriptions)
+  grid_start = min([description.first_time for description in non_empty])
+  grid_end = max([description.last_time for description in non_empty])
+  return (grid_start, interval, int((grid_end - grid_start) // interval) + 1)
+
+
+def resample(times, values, grid_start, interval, num_intervals, method):
+  """ Resamples a series onto the time grid that starts at grid_start.
+
+  With BIN, the value for each interval is the mean of the samples taken during the interval (NaN
+  if there are none). With INTERPOLATE, the value is interpolated linearly from the samples before
+  and after the start of the interval (NaN outside of the times of the samples).
+  """
+  valid = ~numpy.isnan(values)
+  times = times[valid]
+  values = values[valid]
+  if method == INTERPOLATE:
+    grid = grid_start + interval * numpy.arange(num_intervals)
+    if len(times) == 0:
+      return numpy.full(num_intervals, numpy.nan)
+    return numpy.interp(grid, times, values, left=numpy.nan, right=numpy.nan)
+
+  bins = numpy.floor((times - grid_start) / interval).astype(numpy.int64)
+  # Samples outside of the grid (e.g., ones appended to the monitor after the grid was chosen) are
+  # dropped.
+  on_grid = (bins >= 0) & (bins < num_intervals)
+  bins = bins[on_grid]
+  values = values[on_grid]
+  sums = numpy.bincount(bins, weights=values, minlength=num_intervals)
+  counts = numpy.bincount(bins, minlength=num_intervals)
+  with numpy.errstate(invalid="ignore", divide="ignore"):
+    return numpy.where(counts > 0, sums / counts, numpy.nan)
+
+
+def resample_table(table, series_names, grid, method):
+  """
+  Returns a mapping from each of the given series names to an array with the series of the given
+  MonitorTable resampled onto the grid (as returned by get_grid()), or to None if the table doesn't
+  have the series.
+  """
+  grid_start, interval, num_intervals = grid
+  times = table.column("time") + (table.start_time or 0)
+  name_to_values = {}
+  for series_name in series_names:
+    values = get_series(table, series_name)
+    if values is not None:
+      values = resample(times, values, grid_start, interval, num_intervals, method)
+    name_to_values[series_name] = values
+  return name_to_values
+
+
+def combine(names, series_names, grid, resampled):
+  """
+  Returns an AlignedMonitors with the series resampled from each of the named monitors, as returned
+  by resample_table().
+  """
+  _, interval, num_intervals = grid
+  name_to_series = {}
+  for series_name in series_names:
+    series = numpy.full((len(resampled), num_intervals), numpy.nan)
+    for index, name_to_values in enumerate(resampled):
+      if name_to_values[series_name] is not None:
+        series[index] = name_to_values[series_name]
+    name_to_series[series_name] = series
+  return AlignedMonitors(interval * numpy.arange(num_intervals), interval, names, name_to_series)
+
+
+def align(tables, names, series_names, interval=None, method=BIN):
+  """ Resamples the given series of each MonitorTable onto a shared time grid.
+
+  The tables must have their start_time set (as parse_continuous_monitor() does), which is used to
+  line up their samples. The grid covers all of the samples, with intervals of the given length in
+  milliseconds (see get_grid()). Returns an AlignedMonitors.
+  """
+  grid = get_grid([describe(table) for table in tables], interval)
+  return combine(names, series_names, grid,
+    [resample_table(table, series_names, grid, method) for table in tables])
+
+
+def align_files(filenames, interval=None, method=BIN, use_checkpoint=True, num_processes=1):
+  """ Parses the given continuous monitors and resamples them onto a shared time grid.
+
+  Returns a tuple of an AlignedMonitors with the series from get_series_names() and the names of
+  those series. With one process, the monitors are parsed in this process and passed to align().
+  Otherwise, the monitors are parsed by num_processes worker processes, and only small results are
+  passed back (see utils.parallel_map()): each monitor is parsed once to describe it, which
+  determines the grid, and again to resample it onto the grid. The second parse loads the
+  checkpoint saved by the first, so monitors that can't be checkpointed (because use_checkpoint is
+  false, or they are compressed or in a bundle) are instead parsed once, in this process.
+  """
+  names = [get_monitor_name(filename) for filename in filenames]
+  worker_indices = []
+  if num_processes > 1:
+    worker_indices = [index for index, filename in enumerate(filenames)
+      if use_checkpoint and log_files.is_plain_file(filename)]
+  if not worker_indices:
+    tables = [plot_continuous_monitor.parse_continuous_monitor(filename, use_checkpoint)
+      for filename in filenames]
+    series_names = get_series_names(tables)
+    return (align(tables, names, series_names, interval, method), series_names)
+
+  worker_filenames = [filenames[index] for index in worker_indices]
+  index_to_table = {index: plot_continuous_monitor.parse_continuous_monitor(filename, use_checkpoint)
+    for index, filename in enumerate(filenames) if index not in worker_indices}
+  index_to_description = {index: describe(table) for index, table in index_to_table.iteritems()}
+  index_to_description.update(zip(worker_indices, utils.parallel_map(
+    functools.partial(parse_and_describe, use_checkpoint), worker_filenames, num_processes)))
+  descriptions = [index_to_description[index] for index in range(len(filenames))]
+  series_names = get_series_names(descriptions)
+  grid = get_grid(descriptions, interval)
+
+  index_to_resampled = {index: resample_table(table, series_names, grid, method)
+    for index, table in index_to_table.iteritems()}
+  index_to_resampled.update(zip(worker_indices, utils.parallel_map(
+    functools.partial(parse_and_resample, use_checkpoint, series_names, grid, method),
+    worker_filenames, num_processes)))
+  resampled = [index_to_resampled[index] for index in range(len(filenames))]
+  return (combine(names, series_names, grid, resampled), series_names)
+
+
+def parse_and_describe(use_checkpoint, filename):
+  """ Parses the given continuous monitor, and returns a MonitorDescription of it. """
+  return describe(plot_continuous_monitor.parse_continuous_monitor(filename, use_checkpoint))
+
+
+def parse_and_resample(use_checkpoint, series_names, grid, method, filename):
+  """ Parses the given continuous monitor, and returns the output of resample_table() for it. """
+  return resample_table(plot_continuous_monitor.parse_continuous_monitor(filename, use_checkpoint),
+    series_names, grid, method)
+
+
+def get_series_names(tables):
+  """
+  Returns DEFAULT_SERIES, followed by the utilization of each disk in any of the given
+  MonitorTables (or MonitorDescriptions).
+  """
+  disk_names = sorted(set([disk_name for table in tables for disk_name in table.disk_names]))
+  return DEFAULT_SERIES + ["{} utilization".format(disk_name) for disk_name in disk_names]
+
+
+def write_summary(aligned, output_filename, series_names):
+  """
+  Writes a tab-separated file with one row per interval, with the time (in seconds) followed by the
+  STATISTICS for each of the given series.
+  """
+  columns = [aligned.times / 1000.0]
+  header = ["time"]
+  for series_name in series_names:
+    statistics = aligned.summarize(series_name)
+    for statistic in STATISTICS:
+      columns.append(statistics[statistic])
+      header.append("{} {}".format(series_name, statistic))
+  numpy.savetxt(output_filename, numpy.column_stack(columns), fmt="%.12g", delimiter="\t",
+    header="\t".join(header))
+
+
+def plot(aligned, output_filename, series_names):
+  """ Writes graphs of the cluster-level statistics and heatmaps to a multi-page PDF.
+
+  There is one page per series with the mean, median, 95th percentile, and maximum over the
+  executors, a page with the totals over the cluster, and a heatmap for each of HEATMAP_SERIES, with
+  one row per executor. As in plot_matplotlib.plot(), the graphs are drawn with the Agg renderer on
+  a single Figure, so no display is needed.
+  """
+  times = aligned.times / 1000.0
+  fig = figure.Figure(figsize=(11, 6))
+  backend_agg.FigureCanvasAgg(fig)
+
+  with backend_pdf.PdfPages(output_filename) as pdf:
+    for series_name in series_names:
+      fig.clear()
+      axes = fig.add_subplot(111)
+      axes.set_title("Cluster {}".format(series_name))
+      axes.set_xlabel("Time (s)")
+      axes.grid(b=True, which="both")
+      statistics = aligned.summarize(series_name)
+      axes.fill_between(times, statistics["min"], statistics["max"], color="0.85",
+        label="min-max")
+      for statistic in ["mean", "median", "95th percentile", "max"]:
+        axes.plot(times, statistics[statistic], label=statistic)
+      legend = axes.legend(loc="center left", bbox_to_anchor=(1, 0.5))
+      pdf.savefig(fig, additional_artists=[legend], bbox_inches="tight")
+
+    fig.clear()
+    axes = fig.add_subplot(111)
+    axes.set_title("Cluster totals")
+    axes.set_xlabel("Time (s)")
+    axes.grid(b=True, which="both")
+    for series_name in ["bytes received", "bytes transmitted", "running macrotasks"]:
+      axes.plot(times, aligned.summarize(series_name)["sum"], label=series_name)
+    legend = axes.legend(loc="center left", bbox_to_anchor=(1, 0.5))
+    pdf.savefig(fig, additional_artists=[legend], bbox_inches="tight")
+
+    for series_name in HEATMAP_SERIES:
+      fig.clear()
+      axes = fig.add_subplot(111)
+      axes.set_title("{} by executor".format(series_name))
+      axes.set_xlabel("Time (s)")
+      values = numpy.ma.masked_invalid(aligned.series(series_name))
+      image = axes.imshow(values, aspect="auto", interpolation="nearest", origin="lower",
+        extent=(times[0], times[-1] + aligned.interval / 1000.0, -0.5, len(aligned.names) - 0.5))
+      axes.set_yticks(range(len(aligned.names)))
+      axes.set_yticklabels(aligned.names, fontsize="x-small")
+      fig.colorbar(image, ax=axes)
+      pdf.savefig(fig, bbox_inches="tight")
+
+
+def get_monitor_name(filename):
+  """ Returns a short name for the executor whose continuous monitor is in the given file. """
+  name = path.basename(filename)
+  suffix = "_executor_monitor"
+  return name[:-len(suffix)] if name.endswith(suffix) else name
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(
+    description="Combines the continuous monitors from all of the executors in a cluster.")
+  parser.add_argument("filenames", nargs="*",
+                      help="continuous monitor files (which can be compressed or in a tar bundle)")
+  parser.add_argument("-d", "--log-dir",
+                      help=("a directory or tar bundle; all of the files in it whose names end " +
+                        "with executor_monitor are combined"))
+  parser.add_argument("-o", "--output-prefix",
+                      help=("prefix for the output files (<prefix>_cluster_monitor and " +
+                        "<prefix>_cluster_graphs.pdf); by default, the log directory"))
+  parser.add_argument("--interval",
+                      help=("the length of the intervals that the monitors are resampled to, " +
+                        "in milliseconds (by default, twice the median time between samples)"),
+                      type=float)
+  parser.add_argument("--method",
+                      help=("how to resample each monitor: bin averages the samples in each " +
+                        "interval, and interpolate interpolates linearly between samples"),
+                      choices=[BIN, INTERPOLATE], default=BIN)
+  parser.add_argument("-j", "--jobs",
+                      help="the number of processes used to parse the monitors",
+                      type=int, default=1)
+  parser.add_argument("--no-checkpoint",
+                      help="parse each monitor from the beginning, without using a checkpoint",
+                      action="store_false", dest="use_checkpoint", default=True)
+  args = parser.parse_args()
+  if not args.filenames and not args.log_dir:
+    parser.error("Either continuous monitor files or --log-dir must be specified")
+  if not args.output_prefix:
+    if not args.log_dir:
+      parser.error("--output-prefix must be specified when --log-dir isn't")
+    args.output_prefix = log_files.strip_bundle_extension(args.log_dir.rstrip("/"))
+  return args
+
+
+def main():
+  args = parse_args()
+  filenames = list(args.filenames)
+  if args.log_dir:
+    filenames.extend(
+      log_files.find_logs(args.log_dir, lambda name: name.endswith("executor_monitor")))
+  aligned, series_names = align_files(
+    filenames, args.interval, args.method, args.use_checkpoint, args.jobs)
+
+  summary_filename = "{}_cluster_monitor".format(args.output_prefix)
+  write_summary(aligned, summary_filename, series_names)
+  graphs_filename = "{}_cluster_graphs.pdf".format(args.output_prefix)
+  plot(aligned, graphs_filename, series_names)
+  print "Combined {} continuous monitors into {} and {}".format(
+    len(filenames), summary_filename, graphs_filename)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,74 @@
+"""
+This script measures how long it takes to decode the events in an event log, comparing decoding
+every line (which is what the Analyzer used to do) to skipping the events that the Analyzer doesn't
+use based on the event type at the start of each line.
+"""
+
+import argparse
+import time
+
+import parse_event_logs
+
+
+def main():
+  args = __parse_args()
+  # Read the file once so that all of the timed runs read it from the buffer cache.
+  num_lines = sum([1 for _ in open(args.filename, "r")])
+  print "Event log {} has {} lines".format(args.filename, num_lines)
+
+  decode_all_s, num_decoded = __time_best_of(args.trials, __decode_all_events, args.filename)
+  print "Decoding all events: {:.2f} s ({} events)".format(decode_all_s, num_decoded)
+
+  prefiltered_s, num_prefiltered = __time_best_of(
+    args.trials, __decode_analyzer_events, args.filename)
+  print "Decoding only {}: {:.2f} s ({} events)".format(
+    ", ".join(sorted(parse_event_logs.ANALYZER_EVENT_TYPES)), prefiltered_s, num_prefiltered)
+  print "Time saved by prefiltering: {:.2f} s ({:.1f}%)".format(
+    decode_all_s - prefiltered_s, 100 * (decode_all_s - prefiltered_s) / decode_all_s)
+
+
+def __parse_args():
+  parser = argparse.ArgumentParser(description="Benchmark decoding the events in an event log.")
+  parser.add_argument("-f", "--filename", help="The event log to decode.", required=True)
+  parser.add_argument(
+    "-t",
+    "--trials",
+    default=3,
+    help="The number of times to run each benchmark. The fastest run is reported.",
+    required=False,
+    type=int)
+  return parser.parse_args()
+
+
+def __time_best_of(trials, function, filename):
+  """
+  Runs function(filename) the given number of times, and returns a tuple of the fastest runtime (in
+  seconds) and the value that the function returned.
+  """
+  best_runtime_s = None
+  for _ in xrange(trials):
+    start = time.time()
+    result = function(filename)
+    runtime_s = time.time() - start
+    if best_runtime_s is None or runtime_s < best_runtime_s:
+      best_runtime_s = runtime_s
+  return (best_runtime_s, result)
+
+
+def __decode_all_events(filename):
+  """ Decodes every line of the event log, and returns the number of relevant events. """
+  num_events = 0
+  for line in open(filename, "r"):
+    if parse_event_logs.get_json(line)["Event"] in parse_event_logs.ANALYZER_EVENT_TYPES:
+      num_events += 1
+  return num_events
+
+
+def __decode_analyzer_events(filename):
+  """ Decodes only the events used by the Analyzer, and returns the number of those events. """
+  return sum([1 for _ in parse_event_logs.read_events(
+    open(filename, "r"), parse_event_logs.ANALYZER_EVENT_TYPES)])
+
+
+if __name__ == "__main__":
+  main()
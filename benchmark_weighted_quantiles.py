@@ -0,0 +1,126 @@
+"""
+This script measures how long it takes to summarize a distribution of utilizations (weighted by
+task runtimes) and a distribution of task runtimes, comparing the Python implementation that the
+Analyzer used to use to the vectorized implementation in weighted_quantiles.py.
+"""
+
+import argparse
+import numpy
+import time
+
+import parse_event_logs
+import weighted_quantiles
+
+
+def main():
+  args = __parse_args()
+  random = numpy.random.RandomState(args.seed)
+  utilizations = random.uniform(0, 1, args.num_values)
+  runtimes = random.randint(1, 10000, args.num_values)
+
+  python_s, python_result = __time_best_of(
+    args.trials, __summarize_utilizations_in_python, utilizations, runtimes)
+  vectorized_s, vectorized_result = __time_best_of(
+    args.trials, __summarize_utilizations_vectorized, utilizations, runtimes)
+  print "Weighted summary of {} values: Python {:.3f} s, vectorized {:.3f} s ({:.1f}x faster)" \
+    .format(args.num_values, python_s, vectorized_s, python_s / vectorized_s)
+  print "  Python:     {}".format(python_result)
+  print "  Vectorized: {}".format(vectorized_result)
+
+  python_s, python_result = __time_best_of(
+    args.trials, __summarize_runtimes_in_python, runtimes)
+  vectorized_s, vectorized_result = __time_best_of(
+    args.trials, __summarize_runtimes_vectorized, runtimes)
+  print "Unweighted summary of {} values: Python {:.3f} s, vectorized {:.3f} s ({:.1f}x faster)" \
+    .format(args.num_values, python_s, vectorized_s, python_s / vectorized_s)
+  print "  Python:     {}".format(python_result)
+  print "  Vectorized: {}".format(vectorized_result)
+
+
+def __parse_args():
+  parser = argparse.ArgumentParser(description="Benchmark summarizing weighted distributions.")
+  parser.add_argument(
+    "-n",
+    "--num-values",
+    default=1000000,
+    help="The number of values in each distribution.",
+    required=False,
+    type=int)
+  parser.add_argument(
+    "-t",
+    "--trials",
+    default=3,
+    help="The number of times to run each benchmark. The fastest run is reported.",
+    required=False,
+    type=int)
+  parser.add_argument(
+    "-s",
+    "--seed",
+    default=0,
+    help="The seed used to generate the random values.",
+    required=False,
+    type=int)
+  return parser.parse_args()
+
+
+def __time_best_of(trials, function, *args):
+  """
+  Runs function(*args) the given number of times, and returns a tuple of the fastest runtime (in
+  seconds) and the value that the function returned.
+  """
+  best_runtime_s = None
+  for _ in xrange(trials):
+    start = time.time()
+    result = function(*args)
+    runtime_s = time.time() - start
+    if best_runtime_s is None or runtime_s < best_runtime_s:
+      best_runtime_s = runtime_s
+  return (best_runtime_s, result)
+
+
+def __summarize_utilizations_in_python(utilizations, runtimes):
+  """
+  Returns the weighted percentiles and weighted average of the utilizations, computed the way the
+  Analyzer used to, starting from Python lists of (utilization, runtime) pairs.
+  """
+  utilization_pairs = zip(utilizations.tolist(), runtimes.tolist())
+  utilization_pairs.sort()
+  current_total_runtime = 0
+  percentiles = parse_event_logs.UTILIZATION_PERCENTILES
+  output = []
+  percentile_index = 0
+  total_runtime = sum([x[1] for x in utilization_pairs])
+  for (utilization, runtime) in utilization_pairs:
+    current_total_runtime += runtime
+    current_total_runtime_fraction = float(current_total_runtime) / total_runtime
+    if current_total_runtime_fraction > percentiles[percentile_index]:
+      output.append(utilization)
+      percentile_index += 1
+      if percentile_index >= len(percentiles):
+        break
+  output.append(numpy.average(
+    [x[0] for x in utilization_pairs], weights=[x[1] for x in utilization_pairs]))
+  return output
+
+
+def __summarize_utilizations_vectorized(utilizations, runtimes):
+  summary = weighted_quantiles.summarize(
+    utilizations, parse_event_logs.UTILIZATION_PERCENTILES, runtimes)
+  return summary.quantiles + [summary.mean]
+
+
+def __summarize_runtimes_in_python(runtimes):
+  """ Returns the percentiles, minimum, and maximum, computed the way the Analyzer used to. """
+  values = runtimes.tolist()
+  return ([numpy.percentile(values, percentile)
+    for percentile in parse_event_logs.SUMMARY_PERCENTILES] + [min(values), max(values)])
+
+
+def __summarize_runtimes_vectorized(runtimes):
+  summary = weighted_quantiles.summarize(
+    runtimes, [percentile / 100. for percentile in parse_event_logs.SUMMARY_PERCENTILES])
+  return summary.quantiles + [summary.min, summary.max]
+
+
+if __name__ == "__main__":
+  main()
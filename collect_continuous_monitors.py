@@ -0,0 +1,269 @@
+"""
+This file copies the most recent continuous monitor from every executor in a Spark cluster to the
+local machine, fetching the monitors from many executors at once.
+
+The executors are accessed through a transport, which finds and copies files on a host. The
+default, SshTransport, uses ssh and scp, and shares a single (multiplexed) ssh connection for all
+of the commands sent to a host, so each executor is only logged into once. LocalTransport instead
+reads the files of each "host" from a local directory, which is useful to test the collector
+without a cluster.
+"""
+
+import argparse
+import functools
+import logging
+from multiprocessing import pool
+import os
+from os import path
+import shutil
+import subprocess
+import tempfile
+import time
+
+import plot_continuous_monitor
+import utils
+
+DEFAULT_MAX_PARALLEL_HOSTS = 16
+DEFAULT_NUM_ATTEMPTS = 3
+# The delay before retrying a failed command, which is doubled after each failure.
+DEFAULT_RETRY_DELAY_SECONDS = 2
+# How long an idle multiplexed ssh connection is kept open.
+CONTROL_PERSIST_SECONDS = 60
+REMOTE_MONITOR_DIR = "/tmp"
+MONITOR_NAME_SUBSTRING = "continuous_monitor"
+
+
+class SshTransport(object):
+  """ Finds and copies files on remote hosts using ssh and scp.
+
+  The first command sent to a host opens a master connection, which the later ssh and scp commands
+  for that host reuse, so they don't need to log in again. close() closes the master connections.
+  """
+
+  def __init__(self, identity_file, username):
+    self.identity_file = identity_file
+    self.username = username
+    # The path of each control socket has to be short (at most about 100 characters), so the
+    # sockets are put in a new directory in /tmp.
+    self.control_dir = tempfile.mkdtemp(prefix="ssh-", dir="/tmp")
+
+  def get_latest_file(self, host, directory, substring):
+    """
+    Returns the path of the most recently modified file in the given directory on host whose name
+    contains substring, or None if there is no such file.
+    """
+    command = "ls -t {} | grep {} | head -n 1".format(directory, substring)
+    if "ec2" in host:
+      command = "source /root/.bash_profile; {}".format(command)
+    filename = subprocess.check_output(
+      ["ssh"] + self.__get_options() + ["{}@{}".format(self.username, host), command]).strip()
+    if not filename:
+      return None
+    return path.join(directory, filename)
+
+  def copy_from(self, host, remote_file, local_file):
+    """ Copies remote_file from host to local_file, raising an exception if the copy fails. """
+    subprocess.check_call(["scp", "-q"] + self.__get_options() +
+      ["{}@{}:{}".format(self.username, host, remote_file), local_file])
+
+  def close(self):
+    """ Closes the connections to all of the hosts. """
+    with open(os.devnull, "w") as devnull:
+      for control_filename in os.listdir(self.control_dir):
+        user_and_host = control_filename.rsplit(":", 1)[0]
+        # This is best effort: the connection may already have been closed after being idle.
+        subprocess.call(["ssh", "-O", "exit"] + self.__get_options() + [user_and_host],
+          stdout=devnull, stderr=subprocess.STDOUT)
+    shutil.rmtree(self.control_dir, ignore_errors=True)
+
+  def __get_options(self):
+    return ["-o", "StrictHostKeyChecking=no",
+      "-o", "BatchMode=yes",
+      "-o", "ControlMaster=auto",
+      "-o", "ControlPath={}".format(path.join(self.control_dir, "%r@%h:%p")),
+      "-o", "ControlPersist={}".format(CONTROL_PERSIST_SECONDS),
+      "-i", self.identity_file]
+
+
+class LocalTransport(object):
+  """
+  Finds and copies files on "hosts" that are subdirectories of a local directory: the file
+  /tmp/foo on the host bar is read from <root_dir>/bar/tmp/foo.
+  """
+
+  def __init__(self, root_dir):
+    self.root_dir = root_dir
+
+  def get_latest_file(self, host, directory, substring):
+    """
+    Returns the path of the most recently modified file in the given directory on host whose name
+    contains substring, or None if there is no such file.
+    """
+    local_dir = self.__get_local_path(host, directory)
+    if not path.isdir(local_dir):
+      raise IOError("No directory {} on host {}".format(directory, host))
+    filenames = [filename for filename in os.listdir(local_dir) if substring in filename]
+    if not filenames:
+      return None
+    return path.join(directory,
+      max(filenames, key=lambda filename: path.getmtime(path.join(local_dir, filename))))
+
+  def copy_from(self, host, remote_file, local_file):
+    """ Copies remote_file from host to local_file, raising an exception if the copy fails. """
+    shutil.copyfile(self.__get_local_path(host, remote_file), local_file)
+
+  def close(self):
+    pass
+
+  def __get_local_path(self, host, remote_path):
+    return path.join(self.root_dir, host, remote_path.lstrip("/"))
+
+
+class MonitorCollector(object):
+  """ Copies the latest continuous monitor from each of a list of hosts, in parallel.
+
+  At most max_parallel_hosts hosts are accessed at once, by a pool of threads (the work is done by
+  ssh and scp processes, so threads are enough). Each command that fails is tried up to
+  num_attempts times, waiting retry_delay_seconds before the first retry and twice as long before
+  each later one, so that hosts that are briefly unreachable don't need to be collected again.
+  """
+
+  def __init__(self, transport, max_parallel_hosts=DEFAULT_MAX_PARALLEL_HOSTS,
+               num_attempts=DEFAULT_NUM_ATTEMPTS,
+               retry_delay_seconds=DEFAULT_RETRY_DELAY_SECONDS):
+    self.transport = transport
+    self.max_parallel_hosts = max_parallel_hosts
+    self.num_attempts = num_attempts
+    self.retry_delay_seconds = retry_delay_seconds
+    self.logger = logging.getLogger("MonitorCollector")
+
+  def collect(self, hosts, filename_prefix):
+    """ Copies the latest continuous monitor from each host.
+
+    The monitor from each host is copied to <filename_prefix>_<host>_executor_monitor. Returns a
+    tuple of a mapping from host to the name of the local copy of its monitor, and a mapping from
+    host to the exception that prevented copying its monitor (for hosts that have no monitor, this
+    is an IOError).
+    """
+    thread_pool = pool.ThreadPool(max(1, min(self.max_parallel_hosts, len(hosts))))
+    try:
+      results = thread_pool.map(
+        lambda host: self.__collect_from_host(host, filename_prefix), hosts, chunksize=1)
+    finally:
+      thread_pool.close()
+      thread_pool.join()
+
+    host_to_filename = {}
+    host_to_error = {}
+    for host, (local_filename, error) in zip(hosts, results):
+      if error is None:
+        host_to_filename[host] = local_filename
+      else:
+        host_to_error[host] = error
+    return (host_to_filename, host_to_error)
+
+  def __collect_from_host(self, host, filename_prefix):
+    """
+    Returns a tuple of the name of the local copy of the host's monitor and None, or None and the
+    exception that prevented copying it.
+    """
+    try:
+      remote_filename = self.__retry(host, lambda: self.transport.get_latest_file(
+        host, REMOTE_MONITOR_DIR, MONITOR_NAME_SUBSTRING))
+      if remote_filename is None:
+        raise IOError("No continuous monitor in {} on host {}".format(REMOTE_MONITOR_DIR, host))
+      local_filename = "{}_{}_executor_monitor".format(filename_prefix, host)
+      self.logger.info("Copying continuous monitor from file {} on host {} back to {}".format(
+        remote_filename, host, local_filename))
+      self.__retry(host, lambda: self.transport.copy_from(host, remote_filename, local_filename))
+      return (local_filename, None)
+    except Exception as e:
+      self.logger.error("Unable to copy the continuous monitor from host {}: {}".format(host, e))
+      return (None, e)
+
+  def __retry(self, host, function):
+    """ Returns the result of function(), calling it again if it raises an exception. """
+    retry_delay_seconds = self.retry_delay_seconds
+    for attempt in xrange(1, self.num_attempts + 1):
+      try:
+        return function()
+      except (subprocess.CalledProcessError, EnvironmentError) as e:
+        if attempt == self.num_attempts:
+          raise
+        self.logger.warning("Attempt {} of {} on host {} failed ({}); retrying in {} s".format(
+          attempt, self.num_attempts, host, e, retry_delay_seconds))
+        time.sleep(retry_delay_seconds)
+        retry_delay_seconds *= 2
+
+
+def read_hosts(hosts_filename):
+  """ Returns the hosts listed in the given file, one per line (e.g., Spark's conf/slaves file). """
+  with open(hosts_filename, "r") as hosts_file:
+    hosts = [line.strip() for line in hosts_file]
+  return [host for host in hosts if host and not host.startswith("#")]
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(
+    description="Copies the latest continuous monitor from every executor in a Spark cluster.")
+  parser.add_argument("-e", "--executor-hosts",
+                      help="comma-separated list of the executors to copy continuous monitors from")
+  parser.add_argument("--hosts-file",
+                      help="file that lists the executors, one per line (e.g., spark/conf/slaves)")
+  parser.add_argument("-f", "--filename-prefix",
+                      help="filename prefix to use for the files copied back", required=True)
+  parser.add_argument("-u", "--username", default="root",
+                      help="username to use when logging in")
+  parser.add_argument("-i", "--identity-file", help="identity file to use when logging in")
+  parser.add_argument("--local-root",
+                      help=("instead of using ssh, read the files of each executor from the " +
+                        "subdirectory of this directory named after the executor (for testing)"))
+  parser.add_argument("-j", "--max-parallel-hosts",
+                      help="the maximum number of executors to copy from at once",
+                      type=int, default=DEFAULT_MAX_PARALLEL_HOSTS)
+  parser.add_argument("--attempts",
+                      help="the number of times to try each command that fails",
+                      type=int, default=DEFAULT_NUM_ATTEMPTS)
+  parser.add_argument("-p", "--plot",
+                      help="plot the continuous monitors after they are copied (with gnuplot)",
+                      action="store_true", default=False)
+
+  args = parser.parse_args()
+  if not args.executor_hosts and not args.hosts_file:
+    parser.error("--executor-hosts or --hosts-file must be specified")
+  if not args.local_root and not args.identity_file:
+    parser.error("--identity-file must be specified")
+  return args
+
+
+def main():
+  logging.basicConfig(level=logging.INFO)
+  args = parse_args()
+  hosts = []
+  if args.executor_hosts:
+    hosts.extend([host for host in args.executor_hosts.split(",") if host])
+  if args.hosts_file:
+    hosts.extend(read_hosts(args.hosts_file))
+
+  if args.local_root:
+    transport = LocalTransport(args.local_root)
+  else:
+    transport = SshTransport(args.identity_file, args.username)
+  try:
+    host_to_filename, host_to_error = MonitorCollector(
+      transport, args.max_parallel_hosts, args.attempts).collect(hosts, args.filename_prefix)
+  finally:
+    transport.close()
+
+  print "Copied continuous monitors from {} of {} executors".format(
+    len(host_to_filename), len(hosts))
+  for host, error in sorted(host_to_error.iteritems()):
+    print "Unable to copy the continuous monitor from {}: {}".format(host, error)
+  if args.plot:
+    utils.parallel_map(
+      functools.partial(plot_continuous_monitor.plot_continuous_monitor, use_gnuplot=True),
+      sorted(host_to_filename.values()), args.max_parallel_hosts)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,261 @@
+"""
+This file contains an on-disk cache of parsed event logs, so that scripts that analyze the same
+event log many times don't need to decode the JSON in the log every time.
+
+Each cached log is stored as a single uncompressed .npz file that holds the columns of the log's
+TaskTable, along with a JSON description of the log's jobs and stages. A cache entry is also a
+checkpoint: it records how many bytes at the beginning of the event log were parsed, and a hash of
+those bytes. An entry is used as long as the event log still begins with the same bytes, so if more
+events were appended to the log (e.g., because the experiment was still running when it was
+cached), only the new events need to be parsed. If the log is now shorter than the parsed part, or
+begins with different bytes (e.g., because it was truncated or replaced with the log from another
+experiment), the entry is ignored. Event logs that are compressed or in a tar bundle (see
+log_files.py) can't be resumed, so their entries are only used if the compressed file or bundle is
+unchanged. When the total size of the cache exceeds a limit, the least recently used entries are
+deleted.
+"""
+
+import hashlib
+import json
+import logging
+import numpy
+import os
+from os import path
+
+from job import Job, JobStart
+import log_files
+import stage
+import task_table
+
+DEFAULT_CACHE_DIR = path.join(path.expanduser("~"), ".cache", "monotasks-scripts")
+DEFAULT_MAX_CACHE_BYTES = 10 * (1 << 30)
+# Should be incremented whenever the format of the cache files changes, so that old cache files are
+# ignored.
+CACHE_VERSION = 5
+# The content hash covers this many bytes from the beginning and the end of the hashed part of the
+# event log. Hashing the entire log would take almost as long as parsing it.
+HASHED_BYTES = 1 << 20
+METADATA_KEY = "metadata"
+
+
+def get_content_hash(filename, size = None):
+  """
+  Returns a hash of the first size bytes of the given file (all of it, if size is None), which
+  covers the size and the first and last HASHED_BYTES of those bytes.
+  """
+  if size is None:
+    size = os.path.getsize(filename)
+  content_hash = hashlib.sha1(str(size))
+  with open(filename, "rb") as f:
+    content_hash.update(f.read(min(size, HASHED_BYTES)))
+    if size > HASHED_BYTES:
+      last_start = max(HASHED_BYTES, size - HASHED_BYTES)
+      f.seek(last_start)
+      content_hash.update(f.read(size - last_start))
+  return content_hash.hexdigest()
+
+
+def is_unchanged_prefix(filename, size, content_hash):
+  """
+  Returns whether the given file still begins with the size bytes that had the given content hash
+  (as returned by get_content_hash()), so it has at most been appended to since then.
+  """
+  return (path.exists(filename) and os.path.getsize(filename) >= size and
+    get_content_hash(filename, size) == content_hash)
+
+
+def get_entry_key(cache_filename):
+  """
+  Returns the key of the cache entry that the named file in the cache directory belongs to, which
+  is the hash of the path of the cached event log or continuous monitor.
+  """
+  return cache_filename.split(".", 1)[0]
+
+
+class EventLogCache(object):
+
+  def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+    self.cache_dir = cache_dir
+    self.max_cache_bytes = max_cache_bytes
+    self.logger = logging.getLogger("EventLogCache")
+
+  def get_cache_filename(self, filename):
+    """ Returns the name of the file used to cache the parsed contents of the given event log. """
+    key = hashlib.sha1(path.abspath(filename)).hexdigest()
+    return path.join(self.cache_dir, "{}.npz".format(key))
+
+  def invalidate(self, filename):
+    """ Deletes the cached copy of the given event log, if there is one. """
+    cache_filename = self.get_cache_filename(filename)
+    if path.exists(cache_filename):
+      self.logger.debug("Deleting cached copy of {}: {}".format(filename, cache_filename))
+      os.remove(cache_filename)
+
+  def load(self, filename):
+    """ Loads the parsed contents of an event log from the cache.
+
+    Returns a 6-tuple of the TaskTable, a mapping from stage ID to Stage, a mapping from job ID to
+    Job (whose stages are the same objects as in the first mapping, where they were shared when the
+    log was saved), a mapping from stage ID to the IDs of the jobs that rely on the stage, a list of
+    the JobStart for each job, and the number of bytes at the beginning of the event log that were
+    parsed, or None if there is no valid cache entry for the event log. The events after that offset
+    (if any) were appended since the log was cached, and haven't been parsed.
+    """
+    cache_filename = self.get_cache_filename(filename)
+    if not path.exists(cache_filename):
+      return None
+    try:
+      with numpy.load(cache_filename) as cache_data:
+        metadata = json.loads(str(cache_data[METADATA_KEY]))
+        if (metadata.get("version") != CACHE_VERSION or
+            metadata.get("path") != path.abspath(filename)):
+          self.logger.debug("Ignoring out-of-date cached copy of {}".format(filename))
+          return None
+        if not self.__is_unchanged(filename, metadata["hashed_size"], metadata["prefix_hash"]):
+          self.logger.debug(("Ignoring cached copy of {}, which was truncated or replaced since " +
+            "it was cached").format(filename))
+          return None
+        table = task_table.TaskTable.from_arrays(
+          cache_data, metadata["category_values"], metadata["disk_names"])
+    except Exception as e:
+      self.logger.warning("Ignoring unreadable cached copy of {} ({}): {}".format(
+        filename, cache_filename, e))
+      return None
+
+    all_stages = []
+    for start, stop, start_time in metadata["stages"]:
+      new_stage = stage.Stage(table)
+      new_stage.set_rows(slice(start, stop))
+      new_stage.start_time = start_time
+      all_stages.append(new_stage)
+    stages = {stage_id: all_stages[stage_index]
+      for stage_id, stage_index in metadata["stage_ids_and_indices"]}
+    jobs = {}
+    for job_id, name, stage_ids_and_indices in metadata["jobs"]:
+      job = Job(job_id, name, table)
+      for stage_id, stage_index in stage_ids_and_indices:
+        job.stages[stage_id] = all_stages[stage_index]
+      jobs[job_id] = job
+    jobs_for_stage = {stage_id: job_ids for stage_id, job_ids in metadata["jobs_for_stage"]}
+    job_starts = [JobStart(job_id, ordinal, name, stage_ids)
+      for ordinal, (job_id, name, stage_ids) in enumerate(metadata["job_starts"])]
+
+    # Update the modification time, which is used to find the least recently used entries.
+    os.utime(cache_filename, None)
+    self.logger.debug("Loaded {} from cached copy {}".format(filename, cache_filename))
+    return (table, stages, jobs, jobs_for_stage, job_starts, metadata["offset"])
+
+  def save(self, filename, table, stages, jobs, jobs_for_stage, job_starts, offset):
+    """ Saves the parsed contents of an event log to the cache.
+
+    offset is the number of bytes at the beginning of the event log that were parsed. The table must
+    have been compacted, so that every stage's tasks are stored in a contiguous range of rows.
+    """
+    # Each Stage is only saved once, even if it is shared by several jobs.
+    stage_ids_to_indices = {}
+    metadata_stages = []
+
+    def get_stage_ids_and_indices(stage_id_to_stage):
+      stage_ids_and_indices = []
+      for stage_id, saved_stage in sorted(stage_id_to_stage.iteritems()):
+        if id(saved_stage) not in stage_ids_to_indices:
+          stage_ids_to_indices[id(saved_stage)] = len(metadata_stages)
+          rows = saved_stage.rows()
+          metadata_stages.append([rows.start, rows.stop, saved_stage.start_time])
+        stage_ids_and_indices.append([stage_id, stage_ids_to_indices[id(saved_stage)]])
+      return stage_ids_and_indices
+
+    metadata_stage_ids_and_indices = get_stage_ids_and_indices(stages)
+    metadata_jobs = [[job_id, job.name, get_stage_ids_and_indices(job.stages)]
+      for job_id, job in sorted(jobs.iteritems())]
+
+    # For a log that is compressed or in a bundle, the offset is in the decompressed log, so the
+    # whole compressed file or bundle is hashed instead.
+    physical_filename = log_files.get_physical_path(filename)
+    if log_files.is_plain_file(filename):
+      hashed_size = offset
+    else:
+      hashed_size = os.path.getsize(physical_filename)
+    metadata = {
+      "category_values": {name: table.category_values(name)
+        for name in task_table.CATEGORICAL_COLUMNS},
+      "disk_names": table.disk_names,
+      "stages": metadata_stages,
+      "stage_ids_and_indices": metadata_stage_ids_and_indices,
+      "jobs": metadata_jobs,
+      "jobs_for_stage": sorted(jobs_for_stage.iteritems()),
+      "job_starts": [[job_start.job_id, job_start.name, job_start.stage_ids]
+        for job_start in job_starts],
+      "version": CACHE_VERSION,
+      "path": path.abspath(filename),
+      "offset": offset,
+      "hashed_size": hashed_size,
+      "prefix_hash": get_content_hash(physical_filename, hashed_size)
+    }
+
+    try:
+      os.makedirs(self.cache_dir)
+    except OSError:
+      # The directory already exists (possibly because another process just created it).
+      if not path.isdir(self.cache_dir):
+        raise
+    cache_filename = self.get_cache_filename(filename)
+    # Write to a temporary file first, so that a partially written file is never used.
+    temp_filename = "{}.{}.tmp".format(cache_filename, os.getpid())
+    with open(temp_filename, "wb") as cache_file:
+      arrays = table.to_arrays()
+      arrays[METADATA_KEY] = numpy.array(json.dumps(metadata))
+      numpy.savez(cache_file, **arrays)
+    os.rename(temp_filename, cache_filename)
+    self.logger.debug("Saved parsed copy of {} to {}".format(filename, cache_filename))
+    self.evict_old_entries(cache_filename)
+
+  def __is_unchanged(self, filename, hashed_size, content_hash):
+    """
+    Returns whether the part of the given event log that was cached is unchanged: for a plain file,
+    whether it still begins with the hashed bytes, and otherwise, whether the compressed file or
+    bundle that holds it is exactly the one that was hashed.
+    """
+    physical_filename = log_files.get_physical_path(filename)
+    if (not log_files.is_plain_file(filename) and path.exists(physical_filename) and
+        os.path.getsize(physical_filename) != hashed_size):
+      return False
+    return is_unchanged_prefix(physical_filename, hashed_size, content_hash)
+
+  def evict_old_entries(self, keep_filename):
+    """ Deletes the least recently used cache entries until the cache is within its size limit.
+
+    The entry that holds keep_filename (e.g., one that was just saved) is never deleted. Checkpoints
+    of parsed continuous monitors (see plot_continuous_monitor.py) are also stored in the cache
+    directory, as a .json file and several .npy files whose names begin with the same key; they are
+    treated as a single entry, which was last used when any of its files was, and all of its files
+    are deleted together.
+    """
+    # Other processes may be using the cache at the same time (for example, when many event logs are
+    # parsed in parallel), so entries may disappear while this runs.
+    key_to_files = {}
+    for cache_filename in os.listdir(self.cache_dir):
+      if cache_filename.endswith((".npz", ".json", ".npy")):
+        cache_filepath = path.join(self.cache_dir, cache_filename)
+        try:
+          cache_stat = os.stat(cache_filepath)
+        except OSError:
+          continue
+        key_to_files.setdefault(get_entry_key(cache_filename), []).append(
+          (cache_stat.st_mtime, cache_stat.st_size, cache_filepath))
+
+    keep_key = get_entry_key(path.basename(keep_filename))
+    entries = [(max([mtime for mtime, _, _ in files]), sum([size for _, size, _ in files]), key)
+      for key, files in key_to_files.iteritems()]
+    total_bytes = sum([size for _, size, _ in entries])
+    for _, size, key in sorted(entries):
+      if total_bytes <= self.max_cache_bytes:
+        break
+      if key != keep_key:
+        self.logger.debug("Evicting cache entry {}".format(key))
+        for _, _, cache_filepath in key_to_files[key]:
+          try:
+            os.remove(cache_filepath)
+          except OSError:
+            pass
+        total_bytes -= size
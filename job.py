@@ -1,32 +1,63 @@
 import collections
+import copy
+import functools
 import logging
 
 import stage
 
+# The information about a job that is available when the job starts, which is what job predicates
+# are passed (see parse_event_logs.Analyzer). The ordinal is the number of jobs that started earlier
+# in the event log.
+JobStart = collections.namedtuple("JobStart", ["job_id", "ordinal", "name", "stage_ids"])
+
 class Job:
-  def __init__(self, id, name):
+  def __init__(self, id, name, task_table):
     self.id = id
     self.name = name
     self.logger = logging.getLogger("Job")
-    # Map of stage IDs to Stages.
-    self.stages = collections.defaultdict(stage.Stage)
+    # Map of stage IDs to Stages. All of the stages store their tasks in task_table.
+    self.stages = collections.defaultdict(functools.partial(stage.Stage, task_table))
+    # The job's runtime, which is computed the first time it's needed (after all of the job's events
+    # have been added), and discarded if the job's stages change.
+    self.__runtime = None
 
   def add_event(self, data):
     event_type = data["Event"]
     if event_type == "SparkListenerTaskEnd":
       stage_id = data["Stage ID"]
       self.stages[stage_id].add_event(data)
+      self.__runtime = None
 
   def initialize_job(self):
     """ Should be called after adding all events to the job. """
     # Drop empty stages.
     stages_to_drop = []
     for id, s in self.stages.iteritems():
-      if len(s.tasks) == 0:
+      if s.num_tasks() == 0:
         stages_to_drop.append(id)
     for id in stages_to_drop:
       print "Dropping stage %s because it is empty" % id
       del self.stages[id]
+    self.__runtime = None
+
+  def add_stage_task(self, stage_id, shared_stage, row):
+    """ Adds a task that finished while this job was running to the job's stage with stage_id.
+
+    This is used to add tasks after the job has been initialized. shared_stage is the Stage that
+    holds all of the stage's tasks (see parse_event_logs.Analyzer), which the task (stored in the
+    given row of the task table) has already been added to. As when the job is created from a whole
+    event log, the job shares shared_stage unless the job doesn't include some of its tasks (because
+    they finished before the job started), in which case the task is added to the job's own Stage.
+    """
+    if stage_id not in self.stages:
+      # The job doesn't include any of the stage's earlier tasks.
+      if shared_stage.num_tasks() == 1:
+        self.stages[stage_id] = shared_stage
+      else:
+        self.stages[stage_id].add_row(row)
+    elif self.stages[stage_id] is not shared_stage:
+      self.stages[stage_id].add_row(row)
+    self.__runtime = None
 
   def all_tasks(self):
     """ Returns a list of all tasks. """
@@ -40,9 +71,14 @@ class Job:
     print "\n******** %s: %s ********" % (self.id, text)
 
   def runtime(self):
-    actual_start_time = min([s.start_time for s in self.stages.values()])
-    actual_finish_time = max([s.finish_time() for s in self.stages.values()])
-    return actual_finish_time - actual_start_time
+    """ Returns the job's runtime in milliseconds, which is 0 if none of its tasks have finished. """
+    if not self.stages:
+      return 0
+    if self.__runtime is None:
+      actual_start_time = min([s.start_time for s in self.stages.values()])
+      actual_finish_time = max([s.finish_time() for s in self.stages.values()])
+      self.__runtime = actual_finish_time - actual_start_time
+    return self.__runtime
 
   def get_executor_id_to_resource_metrics(self):
     """
@@ -56,7 +92,8 @@ class Job:
         if executor in executor_to_job_metrics:
           executor_to_job_metrics[executor].add_metrics(stage_metrics)
         else:
-          executor_to_job_metrics[executor] = stage_metrics
+          # Stages cache their metrics (and may be shared with other jobs), so merge into a copy.
+          executor_to_job_metrics[executor] = copy.deepcopy(stage_metrics)
     return executor_to_job_metrics
 
   def write_data_to_file(self, data, file_handle, newline=True):
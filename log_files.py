@@ -0,0 +1,264 @@
+"""
+This file contains functions to read experiment logs (event logs and continuous monitors) that are
+compressed or stored in tar bundles, without extracting them first.
+
+A log can be named by:
+  * the path of a plain file;
+  * the path of a file compressed with gzip (.gz), bzip2 (.bz2), or xz (.xz), which is decompressed
+    while it is read;
+  * the path of a member of a (possibly compressed) tar bundle, which is the path of the bundle
+    followed by the name of the member, e.g., "experiment_log_1.tar.gz/experiment_log_1/event_log".
+Logs that are compressed or in a bundle can only be read sequentially, from the beginning.
+
+Reading .xz files requires the xz command, since Python 2 doesn't include the lzma module.
+"""
+
+import bz2
+import errno
+import gzip
+import io
+import os
+from os import path
+import subprocess
+import tarfile
+
+# The size of the buffer used to read compressed logs, so that the decompressor is called with large
+# blocks rather than once per line.
+READ_BUFFER_BYTES = 4 << 20
+GZIP_EXTENSIONS = (".gz", ".tgz")
+BZIP2_EXTENSIONS = (".bz2", ".tbz2")
+XZ_EXTENSIONS = (".xz", ".txz")
+COMPRESSED_EXTENSIONS = GZIP_EXTENSIONS + BZIP2_EXTENSIONS + XZ_EXTENSIONS
+BUNDLE_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# A mapping from the path of a tar bundle to a tuple of its (modification time, size) when it was
+# read and the names of the files in it, used by list_bundle_members().
+__bundle_to_members = {}
+
+
+class StreamReader(io.RawIOBase):
+  """ Adapts a file-like object that only supports read() (e.g., a decompressed stream).
+
+  The result can be buffered with an io.BufferedReader, which splits the data into lines much faster
+  than the readline() of the decompressed streams. Closing the reader calls each of close_functions.
+  """
+  def __init__(self, stream, close_functions):
+    self.stream = stream
+    self.close_functions = close_functions
+
+  def readable(self):
+    return True
+
+  def readinto(self, buffer):
+    data = self.stream.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+  def close(self):
+    if not self.closed:
+      for close_function in self.close_functions:
+        close_function()
+    io.RawIOBase.close(self)
+
+
+def split_bundle_path(filename):
+  """
+  Returns a tuple of (bundle path, member name) if filename names a member of a tar bundle, or
+  (filename, None) otherwise.
+  """
+  if path.exists(filename):
+    return (filename, None)
+  bundle_path = filename
+  while True:
+    parent = path.dirname(bundle_path)
+    if parent == bundle_path:
+      return (filename, None)
+    bundle_path = parent
+    if is_bundle(bundle_path):
+      return (bundle_path, path.relpath(filename, bundle_path))
+
+
+def get_physical_path(filename):
+  """ Returns the path of the file that holds the given log (which is a bundle, for a member). """
+  return split_bundle_path(filename)[0]
+
+
+def is_bundle(filename):
+  """ Returns whether the given path names a tar bundle. """
+  return filename.endswith(BUNDLE_EXTENSIONS) and path.isfile(filename)
+
+
+def is_plain_file(filename):
+  """
+  Returns whether the given log is an uncompressed file that isn't in a bundle, so it can be read
+  starting at any offset.
+  """
+  return (not filename.endswith(COMPRESSED_EXTENSIONS)) and split_bundle_path(filename)[1] is None
+
+
+def strip_bundle_extension(filename):
+  """ Returns the given bundle name without its extension (e.g., ".tar.gz"). """
+  for extension in sorted(BUNDLE_EXTENSIONS, key=len, reverse=True):
+    if filename.endswith(extension):
+      return filename[:-len(extension)]
+  return filename
+
+
+def get_output_prefix(filename):
+  """
+  Returns the prefix to use for the names of the files written when analyzing the given log. This
+  is the name of the log, except for a member of a bundle (which can't be used as the name of a
+  directory), where it is the name of the bundle without its extension, followed by the name of the
+  member.
+  """
+  bundle_path, member_name = split_bundle_path(filename)
+  if member_name is None:
+    return filename
+  return "{}_{}".format(strip_bundle_extension(bundle_path), member_name.replace(os.sep, "_"))
+
+
+def open_log(filename):
+  """ Returns a file object that reads the (decompressed) contents of the given log. """
+  bundle_path, member_name = split_bundle_path(filename)
+  if member_name is None:
+    if not filename.endswith(COMPRESSED_EXTENSIONS):
+      return open(filename, "r")
+    stream, close_functions = __open_decompressed(filename)
+    return io.BufferedReader(StreamReader(stream, close_functions), READ_BUFFER_BYTES)
+
+  stream, close_functions = __open_decompressed(bundle_path)
+  # Read the bundle as a stream, so that only the part up to the end of the member is decompressed.
+  bundle = tarfile.open(fileobj=stream, mode="r|")
+  close_functions = [bundle.close] + close_functions
+  member_name = path.normpath(member_name)
+  for member in bundle:
+    if member.isfile() and path.normpath(member.name) == member_name:
+      return io.BufferedReader(
+        StreamReader(bundle.extractfile(member), close_functions), READ_BUFFER_BYTES)
+  for close_function in close_functions:
+    close_function()
+  raise IOError(errno.ENOENT, "No member named {} in {}".format(member_name, bundle_path))
+
+
+def list_bundle_members(bundle_path):
+  """
+  Returns the names of the files in the given tar bundle. The names are cached (until the bundle is
+  modified), so the bundle is only read the first time that its members are listed.
+  """
+  stat = os.stat(bundle_path)
+  version = (stat.st_mtime, stat.st_size)
+  cached = __bundle_to_members.get(bundle_path)
+  if cached is not None and cached[0] == version:
+    return list(cached[1])
+  stream, close_functions = __open_decompressed(bundle_path)
+  try:
+    bundle = tarfile.open(fileobj=stream, mode="r|")
+    member_names = [member.name for member in bundle if member.isfile()]
+    bundle.close()
+  finally:
+    for close_function in close_functions:
+      close_function()
+  __bundle_to_members[bundle_path] = (version, member_names)
+  return list(member_names)
+
+
+def list_experiments(log_dir):
+  """
+  Returns a sorted list of (name, path) tuples for the results of each experiment in log_dir, which
+  can each be a directory or a tar bundle (as copied by utils.copy_latest_zipped_logs()). The name
+  of a bundle doesn't include its extension. If a bundle was also extracted into a directory with
+  the same name, only the directory is included.
+  """
+  experiments = {}
+  for filename in os.listdir(log_dir):
+    filepath = path.join(log_dir, filename)
+    if path.isdir(filepath):
+      experiments[filename] = filepath
+    elif is_bundle(filepath):
+      experiments.setdefault(strip_bundle_extension(filename), filepath)
+  return sorted(experiments.iteritems())
+
+
+def find_logs(experiment_path, name_predicate):
+  """
+  Returns a sorted list of the paths of the logs in the results of an experiment (a directory or a
+  tar bundle) whose names (without the directory) satisfy name_predicate.
+  """
+  if path.isdir(experiment_path):
+    return sorted([path.join(experiment_path, filename) for filename in os.listdir(experiment_path)
+      if path.isfile(path.join(experiment_path, filename)) and name_predicate(filename)])
+  return sorted([path.join(experiment_path, member_name)
+    for member_name in list_bundle_members(experiment_path)
+    if name_predicate(path.basename(member_name))])
+
+
+def find_log(experiment_path, log_name):
+  """
+  Returns the path of the log named log_name in the results of an experiment (a directory or a tar
+  bundle), or None if there is no such log.
+  """
+  logs = find_logs(experiment_path, lambda name: name == log_name)
+  return logs[0] if logs else None
+
+
+def iter_logs(experiment_path, name_predicate):
+  """
+  Yields a tuple of (path, file object) for each of the logs in the results of an experiment that
+  find_logs() would return. A tar bundle is read in a single pass, rather than once to find the logs
+  and again to open each of them, so its logs are yielded in the order in which they're stored.
+  Each file object is closed (and, for a bundle, can no longer be read) once the next log is
+  requested.
+  """
+  if path.isdir(experiment_path):
+    for filename in find_logs(experiment_path, name_predicate):
+      log_file = open_log(filename)
+      try:
+        yield (filename, log_file)
+      finally:
+        log_file.close()
+    return
+
+  stat = os.stat(experiment_path)
+  stream, close_functions = __open_decompressed(experiment_path)
+  try:
+    bundle = tarfile.open(fileobj=stream, mode="r|")
+    member_names = []
+    for member in bundle:
+      if not member.isfile():
+        continue
+      member_names.append(member.name)
+      if name_predicate(path.basename(member.name)):
+        log_file = io.BufferedReader(
+          StreamReader(bundle.extractfile(member), []), READ_BUFFER_BYTES)
+        try:
+          yield (path.join(experiment_path, member.name), log_file)
+        finally:
+          log_file.close()
+    bundle.close()
+    # The whole bundle was read, so save its members for list_bundle_members().
+    __bundle_to_members[experiment_path] = ((stat.st_mtime, stat.st_size), member_names)
+  finally:
+    for close_function in close_functions:
+      close_function()
+
+
+def __open_decompressed(filename):
+  """
+  Returns a tuple of a stream of the decompressed contents of the given file (based on its
+  extension) and a list of functions to call to close it.
+  """
+  if filename.endswith(GZIP_EXTENSIONS):
+    stream = gzip.GzipFile(filename, "rb")
+  elif filename.endswith(BZIP2_EXTENSIONS):
+    stream = bz2.BZ2File(filename, "rb", buffering=READ_BUFFER_BYTES)
+  elif filename.endswith(XZ_EXTENSIONS):
+    try:
+      process = subprocess.Popen(
+        ["xz", "--decompress", "--stdout", filename], stdout=subprocess.PIPE,
+        bufsize=READ_BUFFER_BYTES)
+    except OSError as e:
+      raise IOError(e.errno, "Unable to run xz to read {}: {}".format(filename, e.strerror))
+    return (process.stdout, [process.stdout.close, process.wait])
+  else:
+    stream = open(filename, "rb")
+  return (stream, [stream.close])
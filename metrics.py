@@ -14,6 +14,8 @@
 # limitations under the License.
 #
 
+import numpy
+
 import utils
 
 MILLIS_PER_JIFFY = 10
@@ -174,8 +176,37 @@ class ExecutorResourceMetrics(object):
     during the time period from when the first task started running on the
     executor until the last task finished on the executor.
     """
-    first_task_to_start = sorted(tasks, key=lambda task: task.start_time)[0]
-    last_task_to_finish = sorted(tasks, key=lambda task: task.finish_time)[-1]
+    first_task_to_start = min(tasks, key=lambda task: task.start_time)
+    # Of the tasks that finished last, use the last one in the list.
+    last_task_to_finish = max(reversed(tasks), key=lambda task: task.finish_time)
+    return ExecutorResourceMetrics.__from_first_and_last_tasks(
+      first_task_to_start,
+      last_task_to_finish,
+      num_tasks=len(tasks),
+      hdfs_deser_decomp_millis=sum([t.hdfs_deser_decomp_millis for t in tasks]),
+      hdfs_ser_comp_millis=sum([t.hdfs_ser_comp_millis for t in tasks]))
+
+  @staticmethod
+  def get_resource_metrics_for_executor_rows(task_table, rows):
+    """Creates an ExecutorResourceMetrics object for the tasks in the given rows of a TaskTable.
+
+    This is equivalent to get_resource_metrics_for_executor_tasks() for the tasks in `rows` (an
+    array of row indices, in task order), but reads the columns of the table directly, so it
+    doesn't need to create a Task for each row.
+    """
+    first_row_to_start = rows[numpy.argmin(task_table.column("start_time")[rows])]
+    reversed_finish_times = task_table.column("finish_time")[rows][::-1]
+    last_row_to_finish = rows[len(rows) - 1 - numpy.argmax(reversed_finish_times)]
+    return ExecutorResourceMetrics.__from_first_and_last_tasks(
+      task_table.task(first_row_to_start),
+      task_table.task(last_row_to_finish),
+      num_tasks=len(rows),
+      hdfs_deser_decomp_millis=int(task_table.column("hdfs_deser_decomp_millis")[rows].sum()),
+      hdfs_ser_comp_millis=int(task_table.column("hdfs_ser_comp_millis")[rows].sum()))
+
+  @staticmethod
+  def __from_first_and_last_tasks(first_task_to_start, last_task_to_finish, num_tasks,
+      hdfs_deser_decomp_millis, hdfs_ser_comp_millis):
     start_millis = first_task_to_start.start_time
     end_millis = last_task_to_finish.finish_time
     elapsed_millis = end_millis - start_millis
@@ -186,8 +217,8 @@ class ExecutorResourceMetrics(object):
       elapsed_millis=elapsed_millis,
       cpu_millis=cpu_millis,
       num_cores=8,
-      hdfs_deser_decomp_millis=sum([t.hdfs_deser_decomp_millis for t in tasks]),
-      hdfs_ser_comp_millis=sum([t.hdfs_ser_comp_millis for t in tasks])
+      hdfs_deser_decomp_millis=hdfs_deser_decomp_millis,
+      hdfs_ser_comp_millis=hdfs_ser_comp_millis
     )
 
     transmit_idle_millis = (last_task_to_finish.end_network_transmit_idle_millis -
@@ -201,18 +232,20 @@ class ExecutorResourceMetrics(object):
       bytes_transmitted=bytes_transmitted)
 
     disk_name_to_metrics = {}
-    for disk_name, disk_utilization in first_task_to_start.disk_utilization.iteritems():
+    first_task_disk_utilization = first_task_to_start.disk_utilization
+    last_task_disk_utilization = last_task_to_finish.disk_utilization
+    for disk_name, disk_utilization in first_task_disk_utilization.iteritems():
       disk_name_to_metrics[disk_name] = DiskMetrics(
         elapsed_millis=elapsed_millis,
-        start_counters=first_task_to_start.disk_utilization[disk_name].start_counters,
-        end_counters=last_task_to_finish.disk_utilization[disk_name].end_counters,
+        start_counters=disk_utilization.start_counters,
+        end_counters=last_task_disk_utilization[disk_name].end_counters,
       )
 
     gc_millis = last_task_to_finish.end_gc_millis - first_task_to_start.start_gc_millis
     return ExecutorResourceMetrics(
       start_millis=start_millis,
       end_millis=end_millis,
-      num_tasks=len(tasks),
+      num_tasks=num_tasks,
       cpu_metrics=cpu_metrics,
       network_metrics=network_metrics,
       disk_name_to_metrics=disk_name_to_metrics,
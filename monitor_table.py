@@ -0,0 +1,196 @@
+"""
+This file contains a columnar store for the samples parsed from a continuous monitor.
+"""
+
+import numpy
+
+INITIAL_CAPACITY = 1024
+
+# Names of the columns that hold one value per sample. This is also the order of the columns in
+# the data files used by gnuplot, which the scripts in gnuplot_files/ refer to by number.
+COLUMNS = [
+  "time",
+  "cpu utilization",
+  "bytes received",
+  "bytes transmitted",
+  "running compute monotasks",
+  "running macrotasks",
+  "gc fraction",
+  "outstanding network bytes",
+  "macrotasks in network",
+  "macrotasks in compute",
+  "cpu system",
+  "macrotasks in disk",
+  "free heap memory",
+  "free off heap memory",
+  "local running macrotasks"
+]
+
+# Names of the columns that hold one value per sample per disk. Each of these can be read as a 2-D
+# array with one row per sample and one column per disk. Samples that don't include a disk (e.g.,
+# because they were taken before the disk was first seen) have NaN values for it.
+DISK_COLUMNS = ["utilization", "read throughput", "write throughput", "running disk monotasks"]
+
+COLUMN_INDICES = {name: index for index, name in enumerate(COLUMNS)}
+DISK_COLUMN_INDICES = {name: index for index, name in enumerate(DISK_COLUMNS)}
+
+
+class MonitorTable(object):
+  """ Stores the samples from a continuous monitor in preallocated NumPy arrays.
+
+  The fields in COLUMNS are stored in a 2-D array with one row per sample, and the fields in
+  DISK_COLUMNS in a 3-D array with one row per sample and one column per disk, so that each sample
+  is copied into the arrays with a single assignment per disk. The disks are discovered as the
+  samples are added, so a disk that first appears partway through the monitor gets a new column.
+  """
+
+  def __init__(self):
+    self.num_rows = 0
+    self.capacity = INITIAL_CAPACITY
+    # The absolute time of the first sample, which the "time" column is relative to, if known.
+    self.start_time = None
+    self.__values = numpy.zeros((self.capacity, len(COLUMNS)))
+    # Names of all disks that have been seen, in the order of the columns of the disk arrays.
+    self.disk_names = []
+    self.__disk_name_to_index = {}
+    self.__disk_values = numpy.zeros((self.capacity, 0, len(DISK_COLUMNS)))
+
+  def __len__(self):
+    return self.num_rows
+
+  def column(self, name):
+    """ Returns an array with the value of the given field for all samples. """
+    return self.__values[:self.num_rows, COLUMN_INDICES[name]]
+
+  def disk_column(self, name):
+    """ Returns a 2-D array with one row per sample and one column per disk in self.disk_names. """
+    return self.__disk_values[:self.num_rows, :, DISK_COLUMN_INDICES[name]]
+
+  def series(self, name):
+    """
+    Returns an array with the values of the given field for all samples. The field can also be
+    one of the disk fields for a single disk, named "<disk name> <field>" (e.g.,
+    "xvdb utilization").
+    """
+    if name in COLUMN_INDICES:
+      return self.column(name)
+    disk_name, _, disk_column_name = name.partition(" ")
+    return self.disk_column(disk_column_name)[:, self.__disk_name_to_index[disk_name]]
+
+  def values(self):
+    """
+    Returns a 2-D array with one row per sample, with the fields in COLUMNS followed by the fields
+    in DISK_COLUMNS for each disk in self.disk_names.
+    """
+    return numpy.hstack([self.__values[:self.num_rows],
+      self.__disk_values[:self.num_rows].reshape(
+        (self.num_rows, len(self.disk_names) * len(DISK_COLUMNS)))])
+
+  def take(self, rows):
+    """ Returns a new MonitorTable with the samples in the given rows. """
+    table = MonitorTable.from_arrays(
+      {name: array[rows] for name, array in self.to_arrays().iteritems()}, self.disk_names)
+    table.start_time = self.start_time
+    return table
+
+  def downsample(self, max_points):
+    """ Returns a MonitorTable with at most max_points samples, for plotting.
+
+    The samples are split into buckets of consecutive samples, and for each field (including each
+    disk field for each disk), the samples with the minimum and the maximum value in each bucket
+    are kept, along with the first and last samples. Short spikes (e.g., in utilization) remain
+    visible, since the sample at the peak is always kept. The kept samples are unmodified, so all
+    of the fields of a sample still line up. Since the fields can peak at different times, the
+    number of buckets starts at max_points / 2 and is reduced until the samples kept for all of the
+    fields fit in max_points (if even a single bucket keeps too many samples, evenly spaced samples
+    are kept instead). Returns this table if it has at most max_points samples.
+    """
+    if self.num_rows <= max_points:
+      return self
+    values = self.values()
+    num_buckets = max(max_points // 2, 1)
+    rows = self.__min_max_rows(values, num_buckets)
+    while len(rows) > max_points and num_buckets > 1:
+      num_buckets = max(min(num_buckets - 1, num_buckets * max_points // len(rows)), 1)
+      rows = self.__min_max_rows(values, num_buckets)
+    if len(rows) > max_points:
+      rows = numpy.unique(numpy.linspace(0, self.num_rows - 1, max_points).astype(numpy.int64))
+    return self.take(rows)
+
+  def add_sample(self, values, disk_name_to_values):
+    """ Adds a sample to the table.
+
+    values is a list with the value of each field in COLUMNS, and disk_name_to_values maps the name
+    of each disk in the sample to a list with the value of each field in DISK_COLUMNS. Disks that
+    haven't been seen before are added in sorted order. Returns the row index of the new sample.
+    """
+    index = self.num_rows
+    if index == self.capacity:
+      self.__grow(max(2 * self.capacity, INITIAL_CAPACITY))
+    for disk_name in sorted(disk_name_to_values):
+      if disk_name not in self.__disk_name_to_index:
+        self.__add_disk(disk_name)
+
+    self.__values[index] = values
+    for disk_name, disk_values in disk_name_to_values.iteritems():
+      self.__disk_values[index, self.__disk_name_to_index[disk_name]] = disk_values
+    self.num_rows += 1
+    return index
+
+  def to_arrays(self):
+    """ Returns a mapping from name to array with the contents of the table.
+
+    The result can be saved and passed to from_arrays(), along with disk_names, to recreate the
+    table.
+    """
+    return {"values": self.__values[:self.num_rows],
+      "disk_values": self.__disk_values[:self.num_rows]}
+
+  @staticmethod
+  def from_arrays(arrays, disk_names):
+    """ Creates a MonitorTable from the output of to_arrays(). """
+    table = MonitorTable()
+    table.__values = numpy.asarray(arrays["values"], dtype=numpy.float64).reshape(
+      (-1, len(COLUMNS)))
+    table.num_rows = table.capacity = len(table.__values)
+    table.disk_names = list(disk_names)
+    table.__disk_name_to_index = {name: index for index, name in enumerate(table.disk_names)}
+    table.__disk_values = numpy.asarray(arrays["disk_values"], dtype=numpy.float64).reshape(
+      (table.num_rows, len(table.disk_names), len(DISK_COLUMNS)))
+    return table
+
+  def __grow(self, new_capacity):
+    new_values = numpy.zeros((new_capacity, len(COLUMNS)))
+    new_values[:self.num_rows] = self.__values[:self.num_rows]
+    self.__values = new_values
+    new_disk_values = numpy.full(
+      (new_capacity, len(self.disk_names), len(DISK_COLUMNS)), numpy.nan)
+    new_disk_values[:self.num_rows] = self.__disk_values[:self.num_rows]
+    self.__disk_values = new_disk_values
+    self.capacity = new_capacity
+
+  def __add_disk(self, disk_name):
+    self.__disk_name_to_index[disk_name] = len(self.disk_names)
+    self.disk_names.append(disk_name)
+    self.__disk_values = numpy.concatenate([self.__disk_values,
+      numpy.full((self.capacity, 1, len(DISK_COLUMNS)), numpy.nan)], axis=1)
+
+  def __min_max_rows(self, values, num_buckets):
+    """
+    Returns a sorted array of the rows of the first and last samples and of the samples with the
+    minimum and the maximum value of each column of values in each of num_buckets buckets.
+    """
+    bucket_size = (self.num_rows + num_buckets - 1) // num_buckets
+    num_buckets = (self.num_rows + bucket_size - 1) // bucket_size
+    # Pad the samples so that the buckets are the same size. Missing (NaN) and padded values are
+    # never chosen as a minimum or a maximum, unless all of the values in the bucket are missing.
+    padded_values = numpy.full((num_buckets * bucket_size, values.shape[1]), numpy.nan)
+    padded_values[:self.num_rows] = values
+    padded_values = padded_values.reshape((num_buckets, bucket_size, values.shape[1]))
+    missing = numpy.isnan(padded_values)
+    bucket_starts = (numpy.arange(num_buckets) * bucket_size)[:, numpy.newaxis]
+    min_rows = bucket_starts + numpy.where(missing, numpy.inf, padded_values).argmin(axis=1)
+    max_rows = bucket_starts + numpy.where(missing, -numpy.inf, padded_values).argmax(axis=1)
+    rows = numpy.unique(numpy.concatenate(
+      [min_rows.ravel(), max_rows.ravel(), [0, self.num_rows - 1]]))
+    return rows[rows < self.num_rows]
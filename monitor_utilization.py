@@ -0,0 +1,157 @@
+"""
+This file contains functions to compute the utilization of each executor's resources while tasks
+were running, from the executors' continuous monitors.
+
+The utilizations in the event log are reported per task, so averaging them (weighted by the tasks'
+runtimes, as parse_event_logs.get_utilizations() does) counts time when several tasks were running
+several times. Here, the utilization while a set of tasks ran on an executor is instead the average
+of the executor's continuous monitor over the time when at least one of the tasks was running. Each
+monitor sample describes the utilization since the previous sample, so it is weighted by how much
+of that period overlaps with the tasks.
+
+All of the lookups use sorted arrays and numpy.searchsorted, so the cost is O((tasks + samples) log
+(tasks + samples)).
+"""
+
+import logging
+from os import path
+
+import numpy
+
+import plot_continuous_monitor
+
+# The resources whose utilization is computed by get_utilizations(), named after the corresponding
+# event log utilization summaries in parse_event_logs.py.
+UTILIZATION_NAMES = ["cpu_utilization", "disk_utilization", "disk_throughput",
+  "network_utilization", "network_utilization_recv", "network_utilization_fetch_only"]
+
+
+def merge_intervals(starts, finishes):
+  """
+  Returns a tuple of (starts, finishes) arrays for the sorted, disjoint intervals that cover the
+  same times as the given intervals.
+  """
+  order = numpy.argsort(starts, kind="mergesort")
+  starts = numpy.asarray(starts, dtype=numpy.float64)[order]
+  finishes = numpy.asarray(finishes, dtype=numpy.float64)[order]
+  if len(starts) == 0:
+    return (starts, finishes)
+  covered_until = numpy.maximum.accumulate(finishes)
+  # An interval starts a new merged interval unless it starts before all of the earlier intervals
+  # end.
+  is_new = numpy.concatenate([[True], starts[1:] > covered_until[:-1]])
+  new_indices = numpy.flatnonzero(is_new)
+  merged_finishes = covered_until[numpy.concatenate([new_indices[1:] - 1, [len(starts) - 1]])]
+  return (starts[new_indices], merged_finishes)
+
+
+def get_covered_time(times, merged_starts, merged_finishes):
+  """
+  Returns an array with the total length of the parts of the given merged intervals (as returned
+  by merge_intervals()) that are before each of the given times.
+  """
+  lengths_before = numpy.concatenate([[0.], numpy.cumsum(merged_finishes - merged_starts)])
+  # The number of intervals that start at or before each time; the last of them may still be
+  # running.
+  num_started = numpy.searchsorted(merged_starts, times, side="right")
+  last = numpy.maximum(num_started - 1, 0)
+  partial = numpy.clip(times - merged_starts[last], 0, merged_finishes[last] - merged_starts[last])
+  return numpy.where(num_started > 0, lengths_before[last] + partial, 0.)
+
+
+def get_sample_weights(sample_times, starts, finishes):
+  """ Returns the weight of each monitor sample, for the tasks that ran during the given intervals.
+
+  Sample i describes the time between sample i - 1 and sample i, so its weight is the length of the
+  part of that period during which at least one of the intervals was running. The first sample
+  describes an unknown period, so its weight is always 0.
+  """
+  weights = numpy.zeros(len(sample_times))
+  merged_starts, merged_finishes = merge_intervals(starts, finishes)
+  if len(merged_starts) == 0 or len(sample_times) < 2:
+    return weights
+  # Only the samples that end after the first interval starts, up to the first sample that ends
+  # after the last interval finishes, can overlap with the intervals.
+  first = max(numpy.searchsorted(sample_times, merged_starts[0], side="right"), 1)
+  last = min(numpy.searchsorted(sample_times, merged_finishes[-1], side="left"),
+    len(sample_times) - 1)
+  if first > last:
+    return weights
+  covered_time = get_covered_time(sample_times[first - 1:last + 1], merged_starts, merged_finishes)
+  weights[first:last + 1] = numpy.diff(covered_time)
+  return weights
+
+
+def get_utilizations(table, starts, finishes, fetch_starts, fetch_finishes, disk_names,
+                     network_bandwidth_bps):
+  """ Returns the utilizations in a continuous monitor while the given tasks were running.
+
+  table is the MonitorTable for the executor's monitor, and starts and finishes are the start and
+  finish times of the tasks. fetch_starts and fetch_finishes are the times of the tasks that fetched
+  shuffle data, which are used for network_utilization_fetch_only. Only the disks in disk_names are
+  included, and network throughputs are divided by network_bandwidth_bps (in bytes per second) to
+  get the network utilization. Returns a mapping from each name in UTILIZATION_NAMES to a tuple of
+  (utilization, weight) arrays, in the same format as parse_event_logs.get_utilizations(), where the
+  weight of each utilization is the time in milliseconds during which it applied while the tasks
+  ran.
+  """
+  sample_times = table.column("time") + table.start_time
+  weights = get_sample_weights(sample_times, starts, finishes)
+  used = weights > 0
+  weights = weights[used]
+
+  name_to_utilizations = {"cpu_utilization": (table.column("cpu utilization")[used], weights)}
+  disk_indices = [index for index, name in enumerate(table.disk_names) if name in disk_names]
+  disk_utilizations = table.disk_column("utilization")[used][:, disk_indices]
+  disk_throughputs = (table.disk_column("read throughput")[used][:, disk_indices] +
+    table.disk_column("write throughput")[used][:, disk_indices])
+  # Disks that weren't in a sample (because they weren't found yet) have NaN values.
+  disk_present = ~numpy.isnan(disk_utilizations)
+  disk_weights = numpy.repeat(weights[:, numpy.newaxis], len(disk_indices), axis=1)[disk_present]
+  name_to_utilizations["disk_utilization"] = (disk_utilizations[disk_present], disk_weights)
+  name_to_utilizations["disk_throughput"] = (disk_throughputs[disk_present], disk_weights)
+
+  # The monitor's network throughputs are in gigabits per second (see plot_continuous_monitor.py).
+  network_scale = plot_continuous_monitor.BYTES_PER_GIGABIT / network_bandwidth_bps
+  received_utilizations = table.column("bytes received")[used] * network_scale
+  transmitted_utilizations = table.column("bytes transmitted")[used] * network_scale
+  name_to_utilizations["network_utilization"] = (
+    numpy.concatenate([received_utilizations, transmitted_utilizations]),
+    numpy.concatenate([weights, weights]))
+  name_to_utilizations["network_utilization_recv"] = (received_utilizations, weights)
+
+  fetch_weights = get_sample_weights(sample_times, fetch_starts, fetch_finishes)
+  fetch_used = fetch_weights > 0
+  fetch_weights = fetch_weights[fetch_used]
+  name_to_utilizations["network_utilization_fetch_only"] = (numpy.concatenate([
+      table.column("bytes received")[fetch_used] * network_scale,
+      table.column("bytes transmitted")[fetch_used] * network_scale]),
+    numpy.concatenate([fetch_weights, fetch_weights]))
+  return name_to_utilizations
+
+
+def match_monitors_to_hosts(monitor_filenames, hosts):
+  """ Returns a mapping from host to the continuous monitor to use for the executor on the host.
+
+  Each entry of monitor_filenames is either "<host>=<filename>", or the name of a monitor file whose
+  name includes the name of a host (as the names of the files written by
+  collect_continuous_monitors.py do); if several hosts' names are in the file name, the longest one
+  is used. If there is a single host and a single monitor, the monitor is used for the host
+  regardless of its name. Monitors that don't match any of the hosts are ignored, with a warning.
+  """
+  logger = logging.getLogger("monitor_utilization")
+  host_to_filename = {}
+  for monitor_filename in monitor_filenames:
+    host, separator, filename = monitor_filename.partition("=")
+    if separator:
+      host_to_filename[host] = filename
+      continue
+    matching_hosts = [host for host in hosts if host in path.basename(monitor_filename)]
+    if matching_hosts:
+      host_to_filename[max(matching_hosts, key=len)] = monitor_filename
+    elif len(hosts) == 1 and len(monitor_filenames) == 1:
+      host_to_filename[hosts[0]] = monitor_filename
+    else:
+      logger.warning("Ignoring continuous monitor {}, which doesn't match any of the hosts: {}"
+        .format(monitor_filename, ", ".join(hosts)))
+  return host_to_filename
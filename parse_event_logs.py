@@ -5,216 +5,1091 @@ This file contains utilities to parse the JSON event log output by Spark.
 import collections
 import json
 import logging
+import multiprocessing
 import numpy
 from optparse import OptionParser
+import os
 import shuffle_job_filterer
 import sys
+import time
 
-from job import Job
+import event_log_cache
+from job import Job, JobStart
+import log_files
+import monitor_utilization
+import plot_continuous_monitor
+import quantile_sketch
+from stage import Stage
+import stragglers
+import task_table
+from task_table import TaskTable
+import weighted_quantiles
+
+# The event types that the Analyzer uses. All other events are skipped without being decoded.
+ANALYZER_EVENT_TYPES = frozenset(["SparkListenerJobStart", "SparkListenerTaskEnd"])
+# The percentiles written to summary files (such as the task runtime summary), and to utilization
+# summary files (as fractions, since the utilization percentiles are weighted).
+SUMMARY_PERCENTILES = [5, 25, 50, 75, 95]
+UTILIZATION_PERCENTILES = [0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+# The suffixes of the utilization summary files written by output_utilizations().
+UTILIZATION_NAMES = ["disk_utilization", "disk_throughput", "network_utilization",
+  "network_utilization_recv", "network_utilization_fetch_only", "cpu_utilization",
+  "cpu_process_user_utilization", "cpu_process_system_utilization"]
+# The disks that are included in the disk utilization summaries.
+UTILIZATION_DISK_NAMES = ["xvdb", "xvdf"]
+# The maximum number of tasks that a StreamingAnalyzer keeps in memory.
+DEFAULT_STREAMING_BATCH_SIZE = 10000
+# How often Analyzer.follow() checks the event log for new events.
+DEFAULT_FOLLOW_INTERVAL_S = 10
+# Divide by 8 to convert to bytes!
+NETWORK_BANDWIDTH_BPS = 1.0e9 / 8
+# Spark writes the "Event" field first, so each line of an event log should start with this.
+EVENT_PREFIX = '{"Event":"'
+# Spark writes the "Stage ID" field immediately after the "Event" field in task end events.
+TASK_END_STAGE_ID_PREFIX = EVENT_PREFIX + 'SparkListenerTaskEnd","Stage ID":'
 
 def get_json(line):
   # Need to first strip the trailing newline, and then escape newlines (which can appear
   # in the middle of some of the JSON) so that JSON library doesn't barf.
   return json.loads(line.strip("\n").replace("\n", "\\n"))
 
+def get_event_type(line):
+  """ Returns the type of the event in the given line of an event log, without decoding the JSON.
+
+  Returns None if the line doesn't start with the "Event" field, in which case the type can only be
+  found by decoding the line.
+  """
+  if line.startswith(EVENT_PREFIX):
+    end = line.find('"', len(EVENT_PREFIX))
+    if end != -1:
+      return line[len(EVENT_PREFIX):end]
+  return None
+
+def get_task_end_stage_id(line):
+  """ Returns the stage ID in the given line of an event log, without decoding the JSON.
+
+  Returns None if the line isn't a task end event that starts with the "Event" and "Stage ID"
+  fields.
+  """
+  if line.startswith(TASK_END_STAGE_ID_PREFIX):
+    end = line.find(",", len(TASK_END_STAGE_ID_PREFIX))
+    try:
+      return int(line[len(TASK_END_STAGE_ID_PREFIX):end])
+    except ValueError:
+      pass
+  return None
+
+def read_events(lines, event_types, should_decode = None):
+  """ Returns a generator of the decoded events with types in event_types, from the given lines.
+
+  Lines for other types of events are skipped without decoding the JSON, which is much faster than
+  decoding every line, since the Analyzer only uses a few of the many event types in a log. If
+  should_decode is given, it is called with each remaining line and its event type (which may be
+  None, as for get_event_type()), and the line is skipped without being decoded if it returns False.
+  """
+  logger = logging.getLogger("Analyzer")
+  for line in lines:
+    event_type = get_event_type(line)
+    if event_type is not None and event_type not in event_types:
+      continue
+    if should_decode is not None and not should_decode(line, event_type):
+      continue
+    try:
+      json_data = get_json(line)
+    except:
+      logger.error("BAD DATA: %s" % line)
+      continue
+    if json_data["Event"] in event_types:
+      yield json_data
+
+def get_job_name(json_data):
+  """ Returns the name of the job described by a SparkListenerJobStart event.
+
+  Uses the name of the stage with the highest ID as the job's name (this seems to be what the Spark
+  UI does). Returns None if the event doesn't include information about that stage.
+  """
+  max_stage_id = max([int(id) for id in json_data["Stage IDs"]])
+  job_name = None
+  for stage_info in json_data["Stage Infos"]:
+    if int(stage_info["Stage ID"]) == max_stage_id:
+      job_name = stage_info["Stage Name"]
+  return job_name
+
+def get_chunk_boundaries(filename, num_chunks):
+  """ Splits the given file into byte ranges that each start at the beginning of a line.
+
+  Returns a list of (start offset, end offset) tuples.
+  """
+  size = os.path.getsize(filename)
+  offsets = [0]
+  with open(filename, "rb") as f:
+    for i in xrange(1, num_chunks):
+      # Move to the start of the first line that begins at or after the evenly-spaced offset.
+      f.seek(max(size * i / num_chunks - 1, offsets[-1]))
+      f.readline()
+      offsets.append(min(f.tell(), size))
+  offsets.append(size)
+  return [(start, end) for start, end in zip(offsets[:-1], offsets[1:]) if end > start]
+
+def get_job_start_events(filename):
+  """ Returns a generator of (offset, decoded event) tuples for the job start events in a log. """
+  # The offset of the line that was most recently read.
+  line_offset = [0]
+
+  def read_lines(f):
+    offset = 0
+    for line in f:
+      line_offset[0] = offset
+      offset += len(line)
+      yield line
+
+  with open(filename, "rb") as f:
+    for json_data in read_events(read_lines(f), frozenset(["SparkListenerJobStart"])):
+      yield (line_offset[0], json_data)
+
+def parse_event_log_chunk(filename_start_end):
+  """ Parses the lines of an event log that are in a particular byte range.
+
+  filename_start_end should be a tuple of (event log filename, start offset, end offset, stage
+  offsets), where the offsets are the start of a line (as returned by get_chunk_boundaries()). If
+  stage offsets is not None, it maps the ID of each stage to the offset of the first job start event
+  for a job that relies on the stage and was accepted by a job predicate. The ends of tasks that
+  don't finish after one of those events are skipped without being decoded. This is run in a
+  separate process, so it returns a compact description of the chunk rather than Job and Stage
+  objects: a tuple of (
+    the tasks in the chunk, as a tuple of the arguments to TaskTable.from_arrays(),
+    an array with the stage ID of each task,
+    a list of (number of tasks in the chunk before the job started, job ID, job name, stage IDs)
+      for each SparkListenerJobStart event in the chunk,
+    the offset of the end of the last line that was parsed
+  ).
+  A partial line at the end of the log isn't parsed.
+  """
+  filename, start, end, stage_id_to_offset = filename_start_end
+  table = TaskTable()
+  stage_ids = []
+  job_starts = []
+  # The offset of the line that was most recently read, and of the end of that line.
+  line_offset = [start]
+  parsed_offset = [start]
+
+  def read_lines(f):
+    f.seek(start)
+    while parsed_offset[0] < end:
+      line = f.readline()
+      if not line.endswith("\n"):
+        break
+      line_offset[0] = parsed_offset[0]
+      parsed_offset[0] += len(line)
+      yield line
+
+  def should_decode(line, event_type):
+    stage_id = get_task_end_stage_id(line)
+    return stage_id is None or stage_id_to_offset.get(stage_id, end) < line_offset[0]
+
+  with open(filename, "rb") as f:
+    for json_data in read_events(read_lines(f), ANALYZER_EVENT_TYPES,
+        None if stage_id_to_offset is None else should_decode):
+      event_type = json_data["Event"]
+      if event_type == "SparkListenerJobStart":
+        job_starts.append(
+          (len(table), json_data["Job ID"], get_job_name(json_data), json_data["Stage IDs"]))
+      elif event_type == "SparkListenerTaskEnd":
+        table.add_task(json_data)
+        stage_ids.append(json_data["Stage ID"])
+
+  category_values = {name: table.category_values(name) for name in task_table.CATEGORICAL_COLUMNS}
+  return ((table.to_arrays(), category_values, table.disk_names),
+    numpy.array(stage_ids, dtype=numpy.int64),
+    job_starts,
+    parsed_offset[0])
+
+def get_utilizations(table, rows):
+  """ Returns the utilizations that output_utilizations() summarizes, for the given tasks.
+
+  rows selects the tasks from the TaskTable. Returns a mapping from each name in UTILIZATION_NAMES
+  to a tuple of (utilization, runtime) arrays, with the utilization of a resource while a task was
+  running and the task's runtime, which is used as the utilization's weight. A task can appear more
+  than once for a resource (e.g., once for each disk, or once for each direction of network
+  traffic).
+  """
+  start_times = table.column("start_time")[rows]
+  runtimes = table.column("finish_time")[rows] - start_times
+  name_to_utilizations = {
+    "cpu_utilization": (table.column("total_cpu_utilization")[rows] / 8., runtimes),
+    "cpu_process_user_utilization":
+      (table.column("process_user_cpu_utilization")[rows] / 8., runtimes),
+    "cpu_process_system_utilization":
+      (table.column("process_system_cpu_utilization")[rows] / 8., runtimes)
+  }
+
+  disk_present = table.disk_column("disk_present")[rows]
+  disk_utilization = table.disk_column("disk_utilization")[rows]
+  disk_throughput = (table.disk_column("disk_read_throughput_Bps")[rows] +
+    table.disk_column("disk_write_throughput_Bps")[rows])
+  disk_indices = [i for i, name in enumerate(table.disk_names) if name in UTILIZATION_DISK_NAMES]
+  disk_runtimes = numpy.concatenate([runtimes[disk_present[:, disk_index]]
+    for disk_index in disk_indices] + [numpy.zeros(0, dtype=runtimes.dtype)])
+  name_to_utilizations["disk_utilization"] = (numpy.concatenate([
+      disk_utilization[disk_present[:, disk_index], disk_index] for disk_index in disk_indices] +
+    [numpy.zeros(0)]), disk_runtimes)
+  name_to_utilizations["disk_throughput"] = (numpy.concatenate([
+      disk_throughput[disk_present[:, disk_index], disk_index] for disk_index in disk_indices] +
+    [numpy.zeros(0)]), disk_runtimes)
+
+  received_utilizations = table.column("bytes_received_ps")[rows] / NETWORK_BANDWIDTH_BPS
+  transmitted_utilizations = table.column("bytes_transmitted_ps")[rows] / NETWORK_BANDWIDTH_BPS
+  has_fetch = table.column("has_fetch")[rows]
+  name_to_utilizations["network_utilization"] = (
+    numpy.concatenate([received_utilizations, transmitted_utilizations]),
+    numpy.concatenate([runtimes, runtimes]))
+  name_to_utilizations["network_utilization_recv"] = (received_utilizations, runtimes)
+  name_to_utilizations["network_utilization_fetch_only"] = (
+    numpy.concatenate([received_utilizations[has_fetch], transmitted_utilizations[has_fetch]]),
+    numpy.concatenate([runtimes[has_fetch], runtimes[has_fetch]]))
+  return name_to_utilizations
+
+def write_summary(filename, percentile_values, min_value, max_value):
+  """ Writes a summary of a distribution, with the values of the SUMMARY_PERCENTILES. """
+  summary_file = open(filename, "w")
+  for percentile_value in percentile_values:
+    summary_file.write("%f\t" % percentile_value)
+  summary_file.write("%f\t%f\n" % (min_value, max_value))
+  summary_file.close()
+
+def write_utilization_summary(filename, percentile_values, weighted_average):
+  """
+  Writes a summary of a distribution of utilizations, with the values of the
+  UTILIZATION_PERCENTILES.
+  """
+  f = open(filename, "w")
+  f.write("Utilization\t0\t")
+  f.write("\t".join([str(x) for x in percentile_values + [weighted_average]]))
+  f.write("\n")
+  f.close()
+
+def write_sketch_summaries(prefix, task_runtime_sketch, name_to_sketch):
+  """
+  Writes the task runtime and utilization summaries (in the same format as the utilizations
+  report) from WeightedQuantileSketches, so the percentiles are estimates.
+  """
+  write_summary("%s_%s" % (prefix, "task_runtimes"),
+    task_runtime_sketch.quantiles([percentile / 100. for percentile in SUMMARY_PERCENTILES]),
+    task_runtime_sketch.min, task_runtime_sketch.max)
+  for name in UTILIZATION_NAMES:
+    sketch = name_to_sketch[name]
+    # Only stages that fetch shuffle data over the network have fetch utilizations.
+    if sketch.count > 0 or name != "network_utilization_fetch_only":
+      write_utilization_summary("%s_%s" % (prefix, name),
+        sketch.quantiles(UTILIZATION_PERCENTILES), sketch.mean())
+
+class Report(object):
+  """ A report that Analyzer.output_reports() writes.
+
+  Reports are accumulators: output_reports() makes a single pass over the analyzer's jobs and
+  stages (in order of ID), calls add_stage() for each of a job's stages and then add_job() for the
+  job, passing the same objects to every report, and finally calls finish(), which should write the
+  report's output files. Reports should only compute the stage and job aggregates that they need.
+
+  When the analyzer follows a growing event log (see Analyzer.follow()), the same reports are kept
+  across updates: after each update, add_stage() is called again for each stage that gained tasks,
+  add_job() is called again for the jobs with those stages, and finish() rewrites the output files.
+  A stage or job that is added again replaces what the report computed for it earlier.
+  """
+  def __init__(self, analyzer, prefix):
+    self.analyzer = analyzer
+    self.prefix = prefix
+
+  def add_stage(self, job_id, stage_id, stage):
+    """ Adds one of a job's stages to the report. Does nothing by default. """
+    pass
+
+  def add_job(self, job_id, job):
+    """ Adds a job to the report, after its stages. Does nothing by default. """
+    pass
+
+  def finish(self):
+    """ Writes the report's output files, after all of the jobs. Does nothing by default. """
+    pass
+
+class UtilizationsReport(Report):
+  """ Summarizes the task runtimes and the utilizations while tasks were running.
+
+  When the analyzer is following a growing event log, the summaries are kept in
+  WeightedQuantileSketches (as in the StreamingAnalyzer), and when a stage is added again, only the
+  tasks that were added to it since it was last added are summarized, so the cost of an update
+  doesn't grow with the size of the log. The percentiles are then estimates.
+  """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    if analyzer.following:
+      self.task_runtime_sketch = quantile_sketch.WeightedQuantileSketch()
+      self.name_to_sketch = {name: quantile_sketch.WeightedQuantileSketch()
+        for name in UTILIZATION_NAMES}
+      # For each job's stage, the number of the stage's tasks that have been summarized.
+      self.num_summarized_tasks = {}
+    else:
+      self.task_runtimes = []
+      self.name_to_all_utilizations = {name: ([], []) for name in UTILIZATION_NAMES}
+
+  def add_stage(self, job_id, stage_id, stage):
+    # This report outputs the distribution of utilizations while tasks were running by calculating
+    # a weighted average of the utilizations while tasks were running, using the macrotask duration
+    # as the weight. This is just an estimate of the average on the machine; the
+    # monitor_utilizations report (see MonitorUtilizationsReport) computes the average utilization
+    # directly from the continuous monitors, when they're given.
+    table = self.analyzer.task_table
+    if self.analyzer.following:
+      rows = stage.rows_after(self.num_summarized_tasks.get((job_id, stage_id), 0))
+      self.num_summarized_tasks[(job_id, stage_id)] = stage.num_tasks()
+      self.task_runtime_sketch.add(table.column("finish_time")[rows] -
+        table.column("start_time")[rows])
+      for name, (utilizations, runtimes) in get_utilizations(table, rows).iteritems():
+        self.name_to_sketch[name].add(utilizations, runtimes)
+      return
+    self.task_runtimes.append(stage.column("finish_time") - stage.column("start_time"))
+    name_to_utilizations = get_utilizations(table, stage.rows())
+    for name, (utilizations, runtimes) in name_to_utilizations.iteritems():
+      self.name_to_all_utilizations[name][0].append(utilizations)
+      self.name_to_all_utilizations[name][1].append(runtimes)
+
+  def finish(self):
+    if self.analyzer.following:
+      write_sketch_summaries(self.prefix, self.task_runtime_sketch, self.name_to_sketch)
+      return
+    self.analyzer.write_summary_file(
+      numpy.concatenate(self.task_runtimes), "%s_%s" % (self.prefix, "task_runtimes"))
+    for name in UTILIZATION_NAMES:
+      utilizations = numpy.concatenate(self.name_to_all_utilizations[name][0])
+      runtimes = numpy.concatenate(self.name_to_all_utilizations[name][1])
+      # Only stages that fetch shuffle data over the network have fetch utilizations.
+      if len(utilizations) > 0 or name != "network_utilization_fetch_only":
+        # Each utilization is weighted by the runtime of the task it was measured for.
+        summary = weighted_quantiles.summarize(utilizations, UTILIZATION_PERCENTILES, runtimes)
+        write_utilization_summary(
+          "%s_%s" % (self.prefix, name), summary.quantiles, summary.mean)
+
+class LoadBalancingBadnessReport(Report):
+  """ Summarizes how badly the tasks in each stage were balanced across executors. """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    # The load balancing badness of each job's stage, by (job ID, stage ID).
+    self.load_balancing = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    self.load_balancing[(job_id, stage_id)] = stage.load_balancing_badness()
+
+  def finish(self):
+    self.analyzer.write_summary_file(
+      [self.load_balancing[key] for key in sorted(self.load_balancing)],
+      "%s_load_balancing_badness" % self.prefix)
+
+class RuntimesReport(Report):
+  """ Summarizes the job runtimes. """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    self.job_id_to_runtime = {}
+
+  def add_job(self, job_id, job):
+    self.job_id_to_runtime[job_id] = job.runtime()
+
+  def finish(self):
+    self.analyzer.write_summary_file(
+      [runtime for _, runtime in sorted(self.job_id_to_runtime.iteritems())],
+      "%s_runtimes" % self.prefix)
+
+class StageResourceMetricsReport(Report):
+  """ Describes the CPU, network, and disk resources used by each executor during each stage. """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    self.executor_id_to_host = {}
+    # The description of each job's stage, by (job ID, stage ID).
+    self.descriptions = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    self.executor_id_to_host.update(self.analyzer.get_executor_id_to_host(stage.rows()))
+    executor_to_resource_metrics = stage.get_executor_id_to_resource_metrics()
+    self.descriptions[(job_id, stage_id)] = "".join([
+      "Job {}, Stage {}, Executor {} ({}):\n{}\n\n".format(
+        job_id, stage_id, executor_id, self.executor_id_to_host[executor_id], resource_metrics)
+      for executor_id, resource_metrics in sorted(executor_to_resource_metrics.iteritems())])
+
+  def finish(self):
+    with open("{}_{}".format(self.prefix, "stage_resource_metrics"), "w") as output:
+      output.write("".join([self.descriptions[key] for key in sorted(self.descriptions)]))
+
+class JobResourceMetricsReport(Report):
+  """ Describes the CPU, network, and disk resources used by each executor during each job. """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    self.executor_id_to_host = {}
+    self.descriptions = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    self.executor_id_to_host.update(self.analyzer.get_executor_id_to_host(stage.rows()))
+
+  def add_job(self, job_id, job):
+    executor_to_resource_metrics = job.get_executor_id_to_resource_metrics()
+    self.descriptions[job_id] = "".join(["Job {}, Executor {} ({}):\n{}\n\n".format(
+        job_id, executor_id, self.executor_id_to_host[executor_id], resource_metrics)
+      for executor_id, resource_metrics in sorted(executor_to_resource_metrics.iteritems())])
+
+  def finish(self):
+    with open("{}_{}".format(self.prefix, "job_resource_metrics"), "w") as output:
+      output.write("".join([self.descriptions[key] for key in sorted(self.descriptions)]))
+
+class IdealTimeMetricsReport(Report):
+  """
+  Describes the CPU, network, and disk ideal times for each stage of each job. Then, ideal job
+  runtime is reported as the sum of the runtimes of the bottleneck resource in each of the job's
+  stages.
+  """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    # For each job, a mapping from stage ID to a tuple of the stage's ideal runtime (the ideal time
+    # of its bottleneck resource) and its description.
+    self.job_id_to_stages = {}
+    self.job_descriptions = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    ideal_cpu_millis, ideal_network_millis, ideal_disk_millis = (
+      stage.get_ideal_times_from_metrics())
+    network_mbits = stage.get_network_mb()
+    self.job_id_to_stages.setdefault(job_id, {})[stage_id] = (
+      max(ideal_cpu_millis, ideal_network_millis, ideal_disk_millis),
+      "Job {}, Stage {}:\n".format(job_id, stage_id) +
+      "\tcpu: {:.2f} s\n".format(ideal_cpu_millis) +
+      "\tnetwork: {:.2f} s ({} mb)\n".format(ideal_network_millis, network_mbits) +
+      "\tdisk: {:.2f} s\n".format(ideal_disk_millis) +
+      "\tactual: {:.2f} s\n".format(stage.runtime() / 1000.))
+
+  def add_job(self, job_id, job):
+    job_runtime_s = 0
+    for stage_id, (ideal_runtime_s, _) in sorted(self.job_id_to_stages[job_id].iteritems()):
+      job_runtime_s += ideal_runtime_s
+    total_stage_runtime_s = sum([s.runtime() for s_id, s in job.stages.iteritems()]) / 1000.
+    self.job_descriptions[job_id] = (
+      "Job {} ideal runtime: {:.2f} s\n".format(job_id, job_runtime_s) +
+      "Job {} actual runtime: {:.2f} s\n".format(job_id, job.runtime() / 1000.) +
+      "Job {} total stage runtime: {:.2f} s\n\n".format(job_id, total_stage_runtime_s))
+
+  def finish(self):
+    descriptions = ["Ideal times:\n\n"]
+    for job_id, job_description in sorted(self.job_descriptions.iteritems()):
+      descriptions.extend([description
+        for _, (_, description) in sorted(self.job_id_to_stages[job_id].iteritems())])
+      descriptions.append(job_description)
+    with open("{}_{}".format(self.prefix, "ideal_time_metrics"), "w") as output:
+      output.write("".join(descriptions))
+
+class StragglersReport(Report):
+  """
+  Describes the stragglers in each stage, and the causes that they were attributed to (see
+  stragglers.py). Each straggler count is followed by the total runtime of the stragglers, in
+  milliseconds.
+  """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    self.descriptions = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    stage_stragglers = stage.get_stragglers()
+    description = ("Job {}, Stage {}: {} tasks, {} stragglers, " +
+      "{} progress rate stragglers ({} ms)").format(job_id, stage_id, stage.num_tasks(),
+      stage_stragglers.num_stragglers(), *stage_stragglers.progress_rate_stragglers())
+    explained = ["{} {} ({} ms)".format(cause, *stage_stragglers.explained_stragglers(cause))
+      for cause in stragglers.CAUSES]
+    explained.append("unexplained {} ({} ms)".format(*stage_stragglers.unexplained_stragglers()))
+    self.descriptions[(job_id, stage_id)] = (
+      "{}, explained by: {}, {} output rate stragglers ({} ms)\n".format(
+        description, ", ".join(explained), *stage_stragglers.output_progress_rate_stragglers()))
+
+  def finish(self):
+    with open("{}_{}".format(self.prefix, "stragglers"), "w") as output:
+      output.write("".join([self.descriptions[key] for key in sorted(self.descriptions)]))
+
+class MonitorUtilizationsReport(Report):
+  """
+  Summarizes the utilizations while tasks were running using the executors' continuous monitors
+  (see monitor_utilization.py), which gives time-weighted averages over the time when each stage's
+  tasks were running, rather than the estimates from the event log in the utilizations report. The
+  summaries are written in the same format as the utilizations report, to files named
+  <prefix>_monitor_<utilization name> (so <prefix>_monitor can be used as the prefix for
+  make_utilization_box_whiskers.py), along with a file with the average utilizations during each
+  stage and job. Only the tasks that ran on executors with a continuous monitor are included.
+
+  When the analyzer is following a growing event log, each stage's utilizations are kept in
+  WeightedQuantileSketches, which are merged to write the summaries, so the percentiles are
+  estimates.
+  """
+  def __init__(self, analyzer, prefix):
+    Report.__init__(self, analyzer, prefix)
+    # For each job, a mapping from stage ID to a tuple of the utilizations during the stage (in the
+    # format returned by __get_utilizations(), or as a WeightedQuantileSketch for each utilization
+    # when following a growing log) and the stage's description.
+    self.job_id_to_stages = {}
+    self.job_descriptions = {}
+
+  def add_stage(self, job_id, stage_id, stage):
+    name_to_utilizations = self.__get_utilizations(
+      self.analyzer.task_table.row_indices(stage.rows()))
+    description = "Job {}, Stage {}: {}\n".format(
+      job_id, stage_id, self.__describe(name_to_utilizations))
+    if self.analyzer.following:
+      name_to_sketch = {}
+      for name, (utilizations, weights) in name_to_utilizations.iteritems():
+        name_to_sketch[name] = quantile_sketch.WeightedQuantileSketch()
+        name_to_sketch[name].add(utilizations, weights)
+      name_to_utilizations = name_to_sketch
+    self.job_id_to_stages.setdefault(job_id, {})[stage_id] = (name_to_utilizations, description)
+
+  def add_job(self, job_id, job):
+    rows = numpy.concatenate([self.analyzer.task_table.row_indices(stage.rows())
+      for stage in job.stages.itervalues()])
+    self.job_descriptions[job_id] = "Job {}: {}\n\n".format(
+      job_id, self.__describe(self.__get_utilizations(rows)))
+
+  def finish(self):
+    stages = [stage for _, job_stages in sorted(self.job_id_to_stages.iteritems())
+      for _, stage in sorted(job_stages.iteritems())]
+    for name in monitor_utilization.UTILIZATION_NAMES:
+      if self.analyzer.following:
+        sketch = quantile_sketch.WeightedQuantileSketch()
+        for name_to_sketch, _ in stages:
+          sketch.merge(name_to_sketch[name])
+        if sketch.count > 0:
+          write_utilization_summary("%s_monitor_%s" % (self.prefix, name),
+            sketch.quantiles(UTILIZATION_PERCENTILES), sketch.mean())
+        continue
+      utilizations = numpy.concatenate(
+        [name_to_utilizations[name][0] for name_to_utilizations, _ in stages] + [numpy.zeros(0)])
+      weights = numpy.concatenate(
+        [name_to_utilizations[name][1] for name_to_utilizations, _ in stages] + [numpy.zeros(0)])
+      # Summaries can't be computed for resources that were never used while tasks ran on executors
+      # with a continuous monitor (e.g., when no stages fetched shuffle data).
+      if len(utilizations) > 0:
+        summary = weighted_quantiles.summarize(utilizations, UTILIZATION_PERCENTILES, weights)
+        write_utilization_summary(
+          "%s_monitor_%s" % (self.prefix, name), summary.quantiles, summary.mean)
+    descriptions = []
+    for job_id, job_description in sorted(self.job_descriptions.iteritems()):
+      descriptions.extend([description
+        for _, (_, description) in sorted(self.job_id_to_stages[job_id].iteritems())])
+      descriptions.append(job_description)
+    with open("{}_{}".format(self.prefix, "stage_monitor_utilizations"), "w") as output:
+      output.write("".join(descriptions))
+
+  def __get_utilizations(self, rows):
+    """
+    Returns the utilizations while the tasks in the given rows were running, in the format returned
+    by monitor_utilization.get_utilizations(), combined over all of the executors.
+    """
+    table = self.analyzer.task_table
+    host_names = table.category_values("executor")
+    host_codes = table.column("executor")[rows]
+    # Group the tasks by executor.
+    order = numpy.argsort(host_codes, kind="mergesort")
+    rows = rows[order]
+    host_codes = host_codes[order]
+    group_starts = numpy.flatnonzero(numpy.concatenate([[True], host_codes[1:] != host_codes[:-1]]))
+    name_to_utilizations = {name: ([], []) for name in monitor_utilization.UTILIZATION_NAMES}
+    for host_rows in numpy.split(rows, group_starts[1:]):
+      if len(host_rows) == 0:
+        continue
+      monitor = self.analyzer.host_to_continuous_monitor.get(
+        host_names[table.column("executor")[host_rows[0]]])
+      if monitor is None:
+        continue
+      starts = table.column("start_time")[host_rows]
+      finishes = table.column("finish_time")[host_rows]
+      has_fetch = table.column("has_fetch")[host_rows]
+      host_utilizations = monitor_utilization.get_utilizations(monitor, starts, finishes,
+        starts[has_fetch], finishes[has_fetch], UTILIZATION_DISK_NAMES, NETWORK_BANDWIDTH_BPS)
+      for name, (utilizations, weights) in host_utilizations.iteritems():
+        name_to_utilizations[name][0].append(utilizations)
+        name_to_utilizations[name][1].append(weights)
+    return {name: (numpy.concatenate(utilizations + [numpy.zeros(0)]),
+        numpy.concatenate(weights + [numpy.zeros(0)]))
+      for name, (utilizations, weights) in name_to_utilizations.iteritems()}
+
+  def __describe(self, name_to_utilizations):
+    """ Returns a description of the average CPU, disk, and network utilizations. """
+    averages = []
+    for name in ["cpu_utilization", "disk_utilization", "network_utilization"]:
+      utilizations, weights = name_to_utilizations[name]
+      if numpy.sum(weights) > 0:
+        averages.append("{} {:.2f}%".format(
+          name.split("_")[0], numpy.average(utilizations, weights=weights) * 100))
+    if not averages:
+      return "no continuous monitor data"
+    return ", ".join(averages)
+
+# The reports that Analyzer.output_reports() can write, by name, in the order in which main() writes
+# them by default.
+REPORTS = collections.OrderedDict([
+  ("utilizations", UtilizationsReport),
+  ("load_balancing_badness", LoadBalancingBadnessReport),
+  ("runtimes", RuntimesReport),
+  ("job_resource_metrics", JobResourceMetricsReport),
+  ("stage_resource_metrics", StageResourceMetricsReport),
+  ("ideal_time_metrics", IdealTimeMetricsReport),
+  ("stragglers", StragglersReport),
+  ("monitor_utilizations", MonitorUtilizationsReport)
+])
+# The reports that need continuous monitors (see Analyzer.load_continuous_monitors()), which main()
+# only writes by default when continuous monitors are given.
+MONITOR_REPORTS = ["monitor_utilizations"]
+# The reports that the StreamingAnalyzer can write.
+STREAMING_REPORTS = ["utilizations", "runtimes"]
+
 class Analyzer:
-  def __init__(self, filename, job_filterer = lambda x: x):
+  def __init__(self, filename, job_filterer = None, use_cache = True,
+               invalidate_cache = False, num_processes = 1, job_predicate = None, follow = False):
     """ The job_filterer function here accepts a dictionary mapping job ids to jobs, and returns
     a new dictionary mapping job_ids to jobs. It can be used to filter out particular jobs from
-    the set of jobs that are analyzed. """
+    the set of jobs that are analyzed.
+
+    The job_predicate function is a cheaper way to filter out jobs: it accepts a JobStart describing
+    a job, and returns whether the job should be analyzed. Because it only needs the information in
+    the job's start event, it is called while the event log is parsed, and the tasks that only
+    belong to rejected jobs are skipped without being decoded. Both can be given, in which case the
+    job_filterer is passed the jobs that the job_predicate accepted.
+
+    If use_cache is true, the parsed contents of the event log are read from (or, if they have not
+    been cached yet or the event log has changed, saved to) an EventLogCache. If invalidate_cache is
+    true, any cached copy of the event log is discarded and the event log is parsed again. The cache
+    always holds all of the jobs in the event log, so that it can be used with any job_predicate;
+    when the cache is used, the job_predicate is applied after the jobs have been loaded (or, if
+    there is no cached copy yet, after the whole log has been parsed and saved), instead. The tasks
+    of rejected jobs are only skipped while parsing if use_cache is false.
+
+    If num_processes is greater than 1, the event log is split into byte ranges that are parsed in
+    parallel by num_processes worker processes.
+
+    If follow is true, the event log can still be growing (e.g., because the experiment that writes
+    it is still running), and the events that are appended to it later can be added with update()
+    or follow(). A partial line at the end of the log is left to be read once the rest of it has
+    been written. The log is always parsed by a single process, without using the cache, and since
+    jobs are added as they start, only a job_predicate (and not a job_filterer) can be used.
+
+    The filename can also name a compressed event log, or an event log in a tar bundle (see
+    log_files.py), which is decompressed while it is parsed. Such a log is always parsed by a single
+    process and can't be followed, and if it changes, its cached copy is discarded rather than
+    resumed. """
+    plain_file = log_files.is_plain_file(filename)
+    if follow and (job_filterer is not None or num_processes > 1 or not plain_file):
+      raise ValueError("An Analyzer that follows an event log can't use a job_filterer or more " +
+        "than one process, and the event log can't be compressed or in a bundle")
     self.filename = filename
     self.logger = logging.getLogger("Analyzer")
+    if num_processes > 1 and not plain_file:
+      self.logger.debug("Parsing {} with a single process, since it can't be split into chunks"
+        .format(filename))
+      num_processes = 1
     self.jobs = {}
+    # Stores the tasks for all of the jobs.
+    self.task_table = TaskTable()
+    # Map of stage IDs to Stages. Each task is only added once, to the Stage for its stage, and the
+    # jobs that rely on a stage share its Stage (see __add_stages_to_jobs()).
+    self.stages = {}
     # For each stage, jobs that rely on the stage.
     self.jobs_for_stage = {}
+    # A JobStart for each job in the event log, in the order in which the jobs started.
+    self.job_starts = []
+    self.following = follow
+    # The number of bytes at the beginning of the event log that have been parsed. This is saved
+    # with the cached copy of the log, so that if the log grows, only the appended events need to be
+    # parsed later.
+    self.offset = 0
+    # When following the event log, the job predicate to use for the jobs that start later.
+    self.__job_predicate = job_predicate
+    # The MonitorTable for the continuous monitor of each executor, by host, which is used by the
+    # monitor_utilizations report (see load_continuous_monitors()).
+    self.host_to_continuous_monitor = {}
 
-    f = open(filename, "r")
-    for line in f:
-      try:
-        json_data = get_json(line)
-      except:
-        logger.error("BAD DATA: %s" % line)
-        continue
-      event_type = json_data["Event"]
-      if event_type == "SparkListenerJobStart":
-        stage_ids = json_data["Stage IDs"]
-        job_id = json_data["Job ID"]
-        # Use the name of the stage with the highest ID as the job's name (this seems to be
-        # what the Spark UI does).
-        max_stage_id = max([int(id) for id in stage_ids])
-        for stage_info in json_data["Stage Infos"]:
-          if int(stage_info["Stage ID"]) == max_stage_id:
-            # Use the name of the stage to set the name of the job.
-            self.jobs[job_id] = Job(job_id, stage_info["Stage Name"])
-        for stage_id in stage_ids:
-          if stage_id not in self.jobs_for_stage:
-            self.jobs_for_stage[stage_id] = []
-          self.jobs_for_stage[stage_id].append(job_id)
-      elif event_type == "SparkListenerTaskEnd":
-        stage_id = json_data["Stage ID"]
-        # Add the event to all of the jobs that depend on the stage.
-        for job_id in self.jobs_for_stage[stage_id]:
-          self.jobs[job_id].add_event(json_data)
+    if follow:
+      use_cache = False
+    cache = event_log_cache.EventLogCache()
+    if invalidate_cache:
+      cache.invalidate(filename)
+    cached_log = cache.load(filename) if use_cache else None
+    if cached_log is None:
+      # Only skip tasks while parsing if the result won't be cached, since the cache must hold all
+      # of the jobs.
+      parse_job_predicate = None if use_cache else job_predicate
+      if num_processes > 1:
+        self.__parse_in_parallel(filename, num_processes, parse_job_predicate)
+      else:
+        self.__parse(filename, parse_job_predicate)
+      if use_cache:
+        # Store each stage's tasks contiguously, which is required to save the table.
+        self.__compact()
+        cache.save(filename, self.task_table, self.stages, self.jobs, self.jobs_for_stage,
+          self.job_starts, self.offset)
+    else:
+      (self.task_table, self.stages, self.jobs, self.jobs_for_stage, self.job_starts,
+        self.offset) = cached_log
+      # Resume from the end of the cached part of the log, in case more events were appended to it.
+      # The cache holds all of the jobs, so no job predicate is used. The cached copy of a log that
+      # isn't a plain file is only used if the log is unchanged.
+      cached_offset = self.offset
+      if plain_file:
+        self.__parse_appended_events(None)
+      if self.offset > cached_offset:
+        self.__compact()
+        cache.save(filename, self.task_table, self.stages, self.jobs, self.jobs_for_stage,
+          self.job_starts, self.offset)
 
-    self.logger.debug("Filtering jobs based on passed in filter function")
-    self.jobs = job_filterer(self.jobs)
+    if job_predicate is not None:
+      self.logger.debug("Filtering jobs based on passed in job predicate")
+      accepted_job_ids = set([job_start.job_id for job_start in self.job_starts
+        if job_predicate(job_start)])
+      self.jobs = {job_id: job for job_id, job in self.jobs.iteritems()
+        if job_id in accepted_job_ids}
+    if job_filterer is not None:
+      self.logger.debug("Filtering jobs based on passed in filter function")
+      self.jobs = job_filterer(self.jobs)
+    for job in self.jobs.itervalues():
+      job.initialize_job()
+    # Drop the stages and tasks for jobs that were filtered out, and store each stage's tasks
+    # contiguously. When following the log, stages that don't have any tasks yet are kept, since
+    # their tasks may be added later.
+    if not follow:
+      self.stages = {stage_id: self.stages[stage_id] for job in self.jobs.itervalues()
+        for stage_id in job.stages}
+    self.__compact()
     self.logger.debug("Finished reading input data:")
     for job_id, job in self.jobs.iteritems():
-      job.initialize_job()
-      job_tasks= job.all_tasks()
-      job_start_time = min([task.start_time for task in job_tasks])
-      job_finish_time = max([task.finish_time for task in job_tasks])
-      job_runtime = (job_finish_time - job_start_time) / 1000.0
+      if not job.stages:
+        # When following a log, a job that just started may not have any finished tasks yet.
+        continue
+      job_runtime = job.runtime() / 1000.0
       stage_str = ["%s (%sm)" % (stage_id, stage.runtime() / 60000.0)
         for (stage_id, stage) in job.stages.iteritems()]
       self.logger.debug("Job %s has stages: %s and runtime %sm (%ss)" %
         (job_id, stage_str, job_runtime / 60., job_runtime))
 
-  def write_summary_file(self, values, filename):
-    summary_file = open(filename, "w")
-    for percentile in [5, 25, 50, 75, 95]:
-      summary_file.write("%f\t" % numpy.percentile(values, percentile))
-    summary_file.write("%f\t%f\n" % (min(values), max(values)))
-    summary_file.close()
-
-  def __write_utilization_summary_file(self, utilization_pairs, filename):
-    utilization_pairs.sort()
-    current_total_runtime = 0
-    percentiles = [0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
-    output = []
-    percentile_index = 0
-    # Add this up here rather than passing it in, because for some types of utilization
-    # (e.g., network, disk), each task appears multiple times.
-    total_runtime = sum([x[1] for x in utilization_pairs])
-    for (utilization, runtime) in utilization_pairs:
-      current_total_runtime += runtime
-      current_total_runtime_fraction = float(current_total_runtime) / total_runtime
-      if current_total_runtime_fraction > percentiles[percentile_index]:
-        output.append(utilization)
-        percentile_index += 1
-        if percentile_index >= len(percentiles):
+  def __compact(self):
+    """ Compacts the task table, so that it only holds the tasks in self.stages and self.jobs. """
+    # The stages in self.stages come first, so that the stages for jobs that only include some of a
+    # stage's tasks share the rows used by the stage in self.stages.
+    self.task_table.compact(self.stages.values() +
+      [stage for job in self.jobs.itervalues() for stage in job.stages.itervalues()])
+
+  def __add_job_start(self, job_id, job_name, stage_ids, job_predicate):
+    """ Records a job that started after all of the jobs that have been recorded so far.
+
+    Returns the job's JobStart, and whether the job was accepted by job_predicate (which may be
+    None, in which case all jobs are accepted). A Job is only created for accepted jobs that have a
+    name, and a Stage is added to self.stages for each of the stages that the job relies on. The
+    Job's stages are added later, by __add_stages_to_jobs().
+    """
+    job_start = JobStart(job_id, len(self.job_starts), job_name, stage_ids)
+    self.job_starts.append(job_start)
+    for stage_id in job_start.stage_ids:
+      self.jobs_for_stage.setdefault(stage_id, []).append(job_start.job_id)
+    accepted = job_predicate is None or job_predicate(job_start)
+    if accepted and job_start.name is not None:
+      self.jobs[job_start.job_id] = Job(job_start.job_id, job_start.name, self.task_table)
+      for stage_id in job_start.stage_ids:
+        if stage_id not in self.stages:
+          self.stages[stage_id] = Stage(self.task_table)
+    return (job_start, accepted)
+
+  def __add_stages_to_jobs(self, job_stage_first_rows):
+    """ Adds the stages in self.stages to the jobs that rely on them.
+
+    job_stage_first_rows is a list of (job, stage ID, first row) tuples, where first row is the
+    number of tasks in the task table when the job started. A job only includes the tasks that
+    finished after it started, so the job shares the Stage in self.stages unless some of the stage's
+    tasks finished earlier (e.g., because the stage was run by an earlier job), in which case the
+    job gets a new Stage that uses the rows for the remaining tasks.
+    """
+    start_times = self.task_table.column("start_time")
+    for job, stage_id, first_row in job_stage_first_rows:
+      shared_stage = self.stages[stage_id]
+      # The stage's rows are in increasing order, since the tasks were added in the order in which
+      # they appear in the log.
+      rows = shared_stage.rows()
+      if len(rows) == 0 or rows[0] >= first_row:
+        job.stages[stage_id] = shared_stage
+      else:
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        rows = rows[numpy.searchsorted(rows, first_row):]
+        job_stage = Stage(self.task_table)
+        job_stage.set_rows(rows)
+        if len(rows) > 0:
+          job_stage.start_time = int(start_times[rows].min())
+        job.stages[stage_id] = job_stage
+
+  def __parse(self, filename, job_predicate):
+    """ Reads all of the jobs and tasks from the given event log. """
+    # The ends of tasks in stages that none of the accepted jobs rely on (so the stages aren't in
+    # self.stages yet) aren't decoded, since the tasks wouldn't be used.
+    def should_decode(line, event_type):
+      stage_id = get_task_end_stage_id(line)
+      return stage_id is None or stage_id in self.stages
+
+    def read_lines(f):
+      for line in f:
+        if not line.endswith("\n"):
+          # The rest of the line hasn't been written yet, so it's left to be parsed later (see
+          # update()).
           break
+        self.offset += len(line)
+        yield line
 
-    utilizations = [x[0] for x in utilization_pairs]
-    weights = [x[1] for x in utilization_pairs]
-    weighted_average = numpy.average(utilizations, weights=weights)
-    output.append(weighted_average)
-    f = open(filename, "w")
-    f.write("Utilization\t0\t")
-    f.write("\t".join([str(x) for x in output]))
-    f.write("\n")
+    job_stage_first_rows = []
+    f = log_files.open_log(filename)
+    for json_data in read_events(read_lines(f), ANALYZER_EVENT_TYPES,
+        None if job_predicate is None else should_decode):
+      event_type = json_data["Event"]
+      if event_type == "SparkListenerJobStart":
+        job_start, _ = self.__add_job_start(
+          json_data["Job ID"], get_job_name(json_data), json_data["Stage IDs"], job_predicate)
+        if job_start.job_id in self.jobs:
+          job_stage_first_rows.extend([(self.jobs[job_start.job_id], stage_id, len(self.task_table))
+            for stage_id in job_start.stage_ids])
+      elif event_type == "SparkListenerTaskEnd":
+        # Each task is only added once, to the stage that is shared by all of the jobs that rely on
+        # it.
+        stage_id = json_data["Stage ID"]
+        if stage_id in self.stages:
+          self.stages[stage_id].add_event(json_data)
     f.close()
+    self.__add_stages_to_jobs(job_stage_first_rows)
 
-  def output_load_balancing_badness(self, prefix):
-    self.logger.debug("Outputting information about load balancing")
-    load_balancing = []
-    for job_id, job in self.jobs.iteritems():
-      for stage_id, stage in job.stages.iteritems():
-        load_balancing.append(stage.load_balancing_badness())
+  def __parse_in_parallel(self, filename, num_processes, job_predicate):
+    """ Reads all of the jobs and tasks from the given event log, using num_processes processes.
+
+    Each process decodes the events in a range of the file. A job start and the ends of the tasks
+    that the job relies on can be in different ranges, so the tasks are assigned to stages after the
+    results from all of the ranges have been merged.
+
+    If there is a job_predicate, the job start events are read first, so that the processes can skip
+    the tasks that won't be assigned to any of the accepted jobs.
+    """
+    stage_id_to_offset = None
+    if job_predicate is not None:
+      stage_id_to_offset = {}
+      for ordinal, (offset, json_data) in enumerate(get_job_start_events(filename)):
+        job_start = JobStart(
+          json_data["Job ID"], ordinal, get_job_name(json_data), json_data["Stage IDs"])
+        if job_predicate(job_start):
+          for stage_id in job_start.stage_ids:
+            stage_id_to_offset.setdefault(stage_id, offset)
+
+    # Use more chunks than processes so that the work stays balanced if some parts of the file take
+    # longer to parse than others.
+    chunks = [(filename, start, end, stage_id_to_offset)
+      for start, end in get_chunk_boundaries(filename, 4 * num_processes)]
+    pool = multiprocessing.Pool(num_processes)
+    try:
+      chunk_results = pool.map(parse_event_log_chunk, chunks, chunksize=1)
+    finally:
+      pool.close()
+      pool.join()
+
+    tables = []
+    all_stage_ids = []
+    job_starts = []
+    num_earlier_tasks = 0
+    for (table_arrays, chunk_stage_ids, chunk_job_starts, chunk_end) in chunk_results:
+      self.offset = chunk_end
+      tables.append(TaskTable.from_arrays(*table_arrays))
+      all_stage_ids.append(chunk_stage_ids)
+      job_starts.extend([(num_earlier_tasks + num_tasks_before_start, job_id, job_name, stage_ids)
+        for (num_tasks_before_start, job_id, job_name, stage_ids) in chunk_job_starts])
+      num_earlier_tasks += len(tables[-1])
+    self.task_table = TaskTable.concatenate(tables)
+    stage_ids = numpy.concatenate(all_stage_ids)
+
+    # Find the rows for each stage's tasks, in the order in which they appeared in the log.
+    order = numpy.argsort(stage_ids, kind="mergesort")
+    boundaries = numpy.flatnonzero(numpy.diff(stage_ids[order])) + 1
+    stage_id_to_rows = {stage_ids[rows[0]]: rows for rows in numpy.split(order, boundaries)
+      if len(rows) > 0}
+
+    # As when the log is parsed sequentially, each stage only includes the tasks that finished after
+    # the first job that relies on the stage started.
+    stage_id_to_first_row = {}
+    job_stage_first_rows = []
+    for (first_row, job_id, job_name, job_stage_ids) in job_starts:
+      job_start, _ = self.__add_job_start(job_id, job_name, job_stage_ids, job_predicate)
+      if job_start.job_id in self.jobs:
+        for stage_id in job_start.stage_ids:
+          stage_id_to_first_row.setdefault(stage_id, first_row)
+          job_stage_first_rows.append((self.jobs[job_start.job_id], stage_id, first_row))
+
+    start_times = self.task_table.column("start_time")
+    for stage_id, first_row in stage_id_to_first_row.iteritems():
+      stage_rows = stage_id_to_rows.get(stage_id, numpy.zeros(0, dtype=numpy.int64))
+      stage_rows = stage_rows[numpy.searchsorted(stage_rows, first_row):]
+      if len(stage_rows) > 0:
+        self.stages[stage_id].set_rows(stage_rows)
+        self.stages[stage_id].start_time = int(start_times[stage_rows].min())
+    self.__add_stages_to_jobs(job_stage_first_rows)
+
+  def update(self):
+    """ Adds the events that were appended to the event log since it was last read.
+
+    The Analyzer must have been created with follow=True. Only the bytes after the parsed part of
+    the log are read, so the cost of an update is proportional to the size of the new events. Each
+    new task is added once, to the Stage in self.stages, and then to the jobs that rely on the stage
+    (see Job.add_stage_task()); the cached aggregates of other stages are kept. Returns the number
+    of new job start and task end events.
+    """
+    assert self.following, "Only an Analyzer created with follow=True can be updated"
+    return self.__parse_appended_events(self.__job_predicate)
+
+  def __parse_appended_events(self, job_predicate):
+    """
+    Parses the events after self.offset, and adds them to the jobs and stages that were parsed from
+    the beginning of the log (before the jobs were initialized or filtered, unless the log is being
+    followed). Returns the number of new job start and task end events.
+    """
+    # As in __parse(), the ends of tasks in stages that none of the accepted jobs rely on aren't
+    # decoded.
+    def should_decode(line, event_type):
+      stage_id = get_task_end_stage_id(line)
+      return stage_id is None or stage_id in self.stages
+
+    def read_lines(f):
+      for line in f:
+        if not line.endswith("\n"):
+          # Leave a partial line at the end to be read by a later update.
+          break
+        self.offset += len(line)
+        yield line
+
+    f = open(self.filename, "r")
+    f.seek(self.offset)
+    num_events = 0
+    for json_data in read_events(read_lines(f), ANALYZER_EVENT_TYPES, should_decode):
+      num_events += 1
+      event_type = json_data["Event"]
+      if event_type == "SparkListenerJobStart":
+        self.__add_job_start(json_data["Job ID"], get_job_name(json_data), json_data["Stage IDs"],
+          job_predicate)
+      elif event_type == "SparkListenerTaskEnd":
+        stage_id = json_data["Stage ID"]
+        if stage_id in self.stages:
+          shared_stage = self.stages[stage_id]
+          row = shared_stage.add_event(json_data)
+          for job_id in self.jobs_for_stage[stage_id]:
+            if job_id in self.jobs:
+              self.jobs[job_id].add_stage_task(stage_id, shared_stage, row)
+    f.close()
+    self.logger.debug("Read {} new events from {}".format(num_events, self.filename))
+    return num_events
+
+  def follow(self, prefix, report_names = None, interval_s = DEFAULT_FOLLOW_INTERVAL_S):
+    """
+    Writes the named reports (see output_reports()), and then checks the event log for new events
+    every interval_s seconds and rewrites the reports whenever there are some, until interrupted.
+    The Analyzer must have been created with follow=True.
+
+    The reports are kept between updates, and only the stages that gained tasks (and the jobs with
+    those stages) are added to them again (see Report), so the cost of rewriting the reports
+    depends on the size of the stages that changed rather than on the size of the whole log.
+    """
+    reports = self.__create_reports(prefix, report_names)
+    # The number of tasks that each job's stage had when it was last added to the reports.
+    added_num_tasks = {}
+    has_new_events = True
+    while True:
+      # The reports can't be written until at least one task has finished.
+      if has_new_events and any([job.stages for job in self.jobs.itervalues()]):
+        self.__add_to_reports(reports, added_num_tasks)
+      time.sleep(interval_s)
+      has_new_events = self.update() > 0
+
+  def write_summary_file(self, values, filename):
+    summary = weighted_quantiles.summarize(
+      values, [percentile / 100. for percentile in SUMMARY_PERCENTILES])
+    write_summary(filename, summary.quantiles, summary.min, summary.max)
+
+  def output_reports(self, prefix, report_names = None):
+    """
+    Writes the named reports (all of the REPORTS, by default), using prefix as the beginning of the
+    name of each output file. All of the reports are fed by a single pass over the jobs and stages.
+    """
+    self.__add_to_reports(self.__create_reports(prefix, report_names), {})
+
+  def __create_reports(self, prefix, report_names):
+    if report_names is None:
+      report_names = REPORTS.keys()
+    self.logger.debug("Outputting reports: {}".format(", ".join(report_names)))
+    return [REPORTS[name](self, prefix) for name in report_names]
 
-    self.write_summary_file(load_balancing, "%s_load_balancing_badness" % prefix)
+  def __add_to_reports(self, reports, added_num_tasks):
+    """ Adds the jobs and stages to the reports, and then writes the reports' output files.
+
+    added_num_tasks maps each (job ID, stage ID) to the number of tasks that the job's stage had
+    when it was added to the reports. Only the stages whose number of tasks changed, and the jobs
+    with those stages, are added, and added_num_tasks is updated.
+    """
+    for job_id, job in sorted(self.jobs.iteritems()):
+      # A job without stages is skipped, since none of its tasks have finished yet (which happens
+      # when following a running log).
+      job_changed = False
+      for stage_id, stage in sorted(job.stages.iteritems()):
+        num_tasks = stage.num_tasks()
+        if added_num_tasks.get((job_id, stage_id)) == num_tasks:
+          continue
+        added_num_tasks[(job_id, stage_id)] = num_tasks
+        job_changed = True
+        for report in reports:
+          report.add_stage(job_id, stage_id, stage)
+      if job_changed:
+        for report in reports:
+          report.add_job(job_id, job)
+    for report in reports:
+      report.finish()
+
+  def output_load_balancing_badness(self, prefix):
+    self.output_reports(prefix, ["load_balancing_badness"])
 
   def output_runtimes(self, prefix):
-    runtimes = [job.runtime() for (job_id, job) in self.jobs.iteritems()]
-    self.write_summary_file(runtimes, "%s_runtimes" % prefix)
+    self.output_reports(prefix, ["runtimes"])
 
   def output_utilizations(self, prefix):
-    # TODO: This function outputs the distribution of utilizations while tasks were running by
-    # calculating a weighted average of the utilizations while tasks were running, using the
-    # macrotask duration as the weight. This is just an estimate of the average on the machine;
-    # instead, we should just directly compute the average utilization using the continuous monitor.
-    self.logger.debug("Outputting utilizations")
-    disk_utilizations = []
-    disk_throughputs = []
-    process_user_cpu_utilizations = []
-    process_system_cpu_utilizations = []
-    cpu_utilizations = []
-    network_utilizations = []
-    network_utilizations_recv_only = []
-    network_utilizations_fetch_only = []
-    task_runtimes = []
-    # Divide by 8 to convert to bytes!
-    NETWORK_BANDWIDTH_BPS = 1.0e9 / 8
-
-    for job_id, job in self.jobs.iteritems():
-      for stage_id, stage in job.stages.iteritems():
-        stage_runtime = (max([t.finish_time for t in stage.tasks]) -
-          min([t.start_time for t in stage.tasks]))
-        for task in stage.tasks:
-          task_runtimes.append(task.runtime())
-          cpu_utilizations.append((task.total_cpu_utilization / 8., task.runtime()))
-          process_user_cpu_utilizations.append(
-            (task.process_user_cpu_utilization / 8., task.runtime()))
-          process_system_cpu_utilizations.append(
-            (task.process_system_cpu_utilization / 8., task.runtime()))
-          for name, disk_utilization in task.disk_utilization.iteritems():
-            if name in ["xvdb", "xvdf"]:
-              disk_utilizations.append((disk_utilization.utilization, task.runtime()))
-              disk_throughputs.append((
-                disk_utilization.read_throughput_Bps + disk_utilization.write_throughput_Bps,
-                task.runtime()))
-          received_utilization = (task.network_utilization.bytes_received_ps /
-            NETWORK_BANDWIDTH_BPS, task.runtime())
-          network_utilizations.append(received_utilization)
-          transmitted_utilization = (task.network_utilization.bytes_transmitted_ps /
-            NETWORK_BANDWIDTH_BPS, task.runtime())
-          network_utilizations.append(transmitted_utilization)
-          network_utilizations_recv_only.append(received_utilization)
-          if task.has_fetch:
-            network_utilizations_fetch_only.append(received_utilization)
-            network_utilizations_fetch_only.append(transmitted_utilization)
-
-    self.write_summary_file(task_runtimes, "%s_%s" % (prefix, "task_runtimes"))
-    self.__write_utilization_summary_file(
-      disk_utilizations, "%s_%s" % (prefix, "disk_utilization"))
-    self.__write_utilization_summary_file(
-      disk_throughputs, "%s_%s" % (prefix, "disk_throughput"))
-    self.__write_utilization_summary_file(
-      network_utilizations, "%s_%s" % (prefix, "network_utilization"))
-    self.__write_utilization_summary_file(
-      network_utilizations_recv_only, "%s_%s" % (prefix, "network_utilization_recv"))
-    if network_utilizations_fetch_only:
-      self.__write_utilization_summary_file(
-        network_utilizations_fetch_only,
-        "%s_%s" % (prefix, "network_utilization_fetch_only"))
-    self.__write_utilization_summary_file(
-      cpu_utilizations, "%s_%s" % (prefix, "cpu_utilization"))
-    self.__write_utilization_summary_file(
-      process_user_cpu_utilizations, "%s_%s" % (prefix, "cpu_process_user_utilization"))
-    self.__write_utilization_summary_file(
-      process_system_cpu_utilizations, "%s_%s" % (prefix, "cpu_process_system_utilization"))
+    self.output_reports(prefix, ["utilizations"])
 
   def output_stage_resource_metrics(self, filename):
     """
     Writes a single file with the CPU, network, and disk resources used by each executor during each
     stage.
     """
-    executor_id_to_host = self.get_executor_id_to_host()
-    with open("{}_{}".format(filename, "stage_resource_metrics"), "w") as output:
-      for job_id, job in sorted(self.jobs.iteritems()):
-        for stage_id, stage in sorted(job.stages.iteritems()):
-          executor_to_resource_metrics = stage.get_executor_id_to_resource_metrics()
-          for executor_id, resource_metrics in sorted(executor_to_resource_metrics.iteritems()):
-            output.write("Job {}, Stage {}, Executor {} ({}):\n{}\n\n".format(
-              job_id, stage_id, executor_id, executor_id_to_host[executor_id], resource_metrics))
+    self.output_reports(filename, ["stage_resource_metrics"])
 
   def output_job_resource_metrics(self, filename):
     """
     Writes a single file with the CPU, network, and disk resources used by each executor during each
     job.
     """
-    executor_id_to_host = self.get_executor_id_to_host()
-    with open("{}_{}".format(filename, "job_resource_metrics"), "w") as output:
-      for job_id, job in sorted(self.jobs.iteritems()):
-        executor_to_resource_metrics = job.get_executor_id_to_resource_metrics()
-        for executor_id, resource_metrics in sorted(executor_to_resource_metrics.iteritems()):
-          output.write("Job {}, Executor {} ({}):\n{}\n\n".format(
-            job_id, executor_id, executor_id_to_host[executor_id], resource_metrics))
-
-  def get_executor_id_to_host(self):
-    return {task.executor_id: task.executor
-      for job in self.jobs.itervalues()
-      for task in job.all_tasks()}
+    self.output_reports(filename, ["job_resource_metrics"])
+
+  def load_continuous_monitors(self, monitor_filenames):
+    """
+    Parses the continuous monitors of the executors, for the monitor_utilizations report. See
+    monitor_utilization.match_monitors_to_hosts() for how each monitor is matched to an executor.
+    """
+    host_to_filename = monitor_utilization.match_monitors_to_hosts(
+      monitor_filenames, self.task_table.category_values("executor"))
+    for host, filename in sorted(host_to_filename.iteritems()):
+      self.logger.debug("Using continuous monitor {} for {}".format(filename, host))
+      self.host_to_continuous_monitor[host] = (
+        plot_continuous_monitor.parse_continuous_monitor(filename))
+
+  def get_executor_id_to_host(self, rows = slice(None)):
+    """ Returns a mapping from executor ID to host, for the executors that ran the given tasks. """
+    executor_ids = self.task_table.category_values("executor_id")
+    hosts = self.task_table.category_values("executor")
+    return {executor_ids[executor_id_code]: hosts[host_code]
+      for executor_id_code, host_code in set(zip(
+        self.task_table.column("executor_id")[rows].tolist(),
+        self.task_table.column("executor")[rows].tolist()))}
 
   def output_ideal_time_metrics(self, filename):
     """
@@ -222,38 +1097,161 @@ class Analyzer:
     Then, ideal job runtime is reported as the sum of the runtimes of the bottleneck resource in
     each of the job's stages.
     """
-    with open("{}_{}".format(filename, "ideal_time_metrics"), "w") as output:
-      output.write("Ideal times:\n\n")
-      for job_id, job in self.jobs.iteritems():
-        job_runtime_s = 0
-        for stage_id, stage in job.stages.iteritems():
-          ideal_cpu_millis, ideal_network_millis, ideal_disk_millis = (
-            stage.get_ideal_times_from_metrics())
-          job_runtime_s += max(ideal_cpu_millis, ideal_network_millis, ideal_disk_millis)
-          network_mbits = stage.get_network_mb()
-
-          output.write(
-            "Job {}, Stage {}:\n".format(job_id, stage_id) +
-            "\tcpu: {:.2f} s\n".format(ideal_cpu_millis) +
-            "\tnetwork: {:.2f} s ({} mb)\n".format(ideal_network_millis, network_mbits) +
-            "\tdisk: {:.2f} s\n".format(ideal_disk_millis) +
-            "\tactual: {:.2f} s\n".format(stage.runtime() / 1000.)
-          )
-        output.write("Job {} ideal runtime: {:.2f} s\n".format(job_id, job_runtime_s))
-        output.write("Job {} actual runtime: {:.2f} s\n".format(job_id, job.runtime() / 1000.))
-        total_stage_runtime_s = sum([s.runtime() for s_id, s in job.stages.iteritems()]) / 1000.
-        output.write("Job {} total stage runtime: {:.2f} s\n\n".format(
-          job_id, total_stage_runtime_s))
+    self.output_reports(filename, ["ideal_time_metrics"])
+
+class StreamingAnalyzer(object):
+  """ Summarizes the task runtimes, job runtimes, and utilizations in an event log in a single pass.
+
+  This writes the same summary files as Analyzer.output_utilizations() and output_runtimes(), but
+  only keeps a bounded number of tasks in memory: tasks are decoded into a TaskTable, and every
+  batch_size tasks, the table is summarized into WeightedQuantileSketches and discarded. As a
+  result, the percentiles in the summaries are estimates (see quantile_sketch.py for how accurate
+  they are, which depends on compression), while the weighted averages, minimums, maximums, and the
+  job runtime summary are exact. As in the Analyzer, each task is included once for each job that
+  relies on its stage and started before the task finished, and job_predicate can be used to skip
+  jobs (post-hoc job filterers aren't supported, since the jobs are never built).
+  """
+  def __init__(self, filename, job_predicate = None,
+               compression = quantile_sketch.DEFAULT_COMPRESSION,
+               batch_size = DEFAULT_STREAMING_BATCH_SIZE):
+    self.filename = filename
+    self.logger = logging.getLogger("StreamingAnalyzer")
+    self.batch_size = batch_size
+    self.task_runtimes = quantile_sketch.WeightedQuantileSketch(compression)
+    self.utilizations = {name: quantile_sketch.WeightedQuantileSketch(compression)
+      for name in UTILIZATION_NAMES}
+    # A JobStart for each job in the event log, in the order in which the jobs started.
+    self.job_starts = []
+    # For each accepted job, a list with the earliest start time and the latest finish time of the
+    # job's tasks.
+    self.job_id_to_start_and_finish = {}
+    # For each stage, the accepted jobs that rely on the stage.
+    self.__jobs_for_stage = {}
+    self.__task_table = TaskTable()
+    # The number of jobs that include each of the tasks in the table.
+    self.__num_jobs_per_task = []
+    self.__parse(job_predicate)
+
+  def __parse(self, job_predicate):
+    # Tasks in stages that none of the accepted jobs rely on aren't decoded.
+    def should_decode(line, event_type):
+      stage_id = get_task_end_stage_id(line)
+      return stage_id is None or stage_id in self.__jobs_for_stage
+
+    f = log_files.open_log(self.filename)
+    for json_data in read_events(f, ANALYZER_EVENT_TYPES, should_decode):
+      event_type = json_data["Event"]
+      if event_type == "SparkListenerJobStart":
+        job_start = JobStart(json_data["Job ID"], len(self.job_starts), get_job_name(json_data),
+          json_data["Stage IDs"])
+        self.job_starts.append(job_start)
+        if job_start.name is not None and (job_predicate is None or job_predicate(job_start)):
+          for stage_id in job_start.stage_ids:
+            self.__jobs_for_stage.setdefault(stage_id, []).append(job_start.job_id)
+      elif event_type == "SparkListenerTaskEnd":
+        job_ids = self.__jobs_for_stage.get(json_data["Stage ID"], [])
+        if not job_ids:
+          continue
+        row = self.__task_table.add_task(json_data)
+        self.__num_jobs_per_task.append(len(job_ids))
+        start_time = self.__task_table.get_value("start_time", row)
+        finish_time = self.__task_table.get_value("finish_time", row)
+        for job_id in job_ids:
+          start_and_finish = self.job_id_to_start_and_finish.setdefault(
+            job_id, [start_time, finish_time])
+          start_and_finish[0] = min(start_and_finish[0], start_time)
+          start_and_finish[1] = max(start_and_finish[1], finish_time)
+        if len(self.__task_table) >= self.batch_size:
+          self.__summarize_tasks()
+    f.close()
+    self.__summarize_tasks()
+
+  def __summarize_tasks(self):
+    """ Adds the tasks in the task table to the summaries, and then discards them. """
+    # Repeat each task once for each job that includes it.
+    rows = numpy.repeat(numpy.arange(len(self.__task_table)), self.__num_jobs_per_task)
+    self.task_runtimes.add(self.__task_table.column("finish_time")[rows] -
+      self.__task_table.column("start_time")[rows])
+    for name, (utilizations, runtimes) in get_utilizations(self.__task_table, rows).iteritems():
+      self.utilizations[name].add(utilizations, runtimes)
+    self.__task_table = TaskTable()
+    self.__num_jobs_per_task = []
+
+  def output_runtimes(self, prefix):
+    runtimes = [finish - start for start, finish in self.job_id_to_start_and_finish.itervalues()]
+    summary = weighted_quantiles.summarize(
+      runtimes, [percentile / 100. for percentile in SUMMARY_PERCENTILES])
+    write_summary("%s_runtimes" % prefix, summary.quantiles, summary.min, summary.max)
+
+  def output_utilizations(self, prefix):
+    self.logger.debug("Outputting utilizations")
+    write_sketch_summaries(prefix, self.task_runtimes, self.utilizations)
 
 def main(argv):
   parser = OptionParser(usage="parse_logs.py [options] <log filename>")
   parser.add_option(
       "-d", "--debug", action="store_true", default=True,
       help="Enable additional debug logging")
+  parser.add_option(
+      "--no-cache", action="store_false", dest="use_cache", default=True,
+      help="Parse the event log without reading from or writing to the parsed log cache")
+  parser.add_option(
+      "--invalidate-cache", action="store_true", default=False,
+      help="Discard any cached copy of the event log and parse it again")
+  parser.add_option(
+      "-j", "--jobs", type="int", default=1,
+      help="Number of processes to use to parse the event log")
+  parser.add_option(
+      "--streaming", action="store_true", default=False,
+      help=("Only output the utilization and runtime summaries, computed in a single pass over " +
+        "the event log using a bounded amount of memory. Percentiles are approximate."))
+  parser.add_option(
+      "--sketch-compression", type="int", default=quantile_sketch.DEFAULT_COMPRESSION,
+      help=("With --streaming, the compression of the sketches used to estimate percentiles. " +
+        "Higher values are more accurate and use more memory (see quantile_sketch.py)."))
+  parser.add_option(
+      "--reports",
+      help=("Comma-separated names of the reports to output, from: {}. By default, all of them " +
+        "are output (or, with --streaming, all of the ones it supports: {}).").format(
+          ", ".join(REPORTS), ", ".join(STREAMING_REPORTS)))
+  parser.add_option(
+      "--continuous-monitors",
+      help=("Comma-separated continuous monitors of the executors, used by the " +
+        "monitor_utilizations report (which is written by default when this is given). Each is " +
+        "either the name of a file whose name includes the executor's host, or <host>=<filename>."))
+  parser.add_option(
+      "--follow", action="store_true", default=False,
+      help=("Keep reading events as they are appended to the event log (e.g., by a running " +
+        "experiment), and rewrite the reports with the new events until interrupted"))
+  parser.add_option(
+      "--follow-interval", type="float", default=DEFAULT_FOLLOW_INTERVAL_S,
+      help="With --follow, how often (in seconds) to check the event log for new events")
   (opts, args) = parser.parse_args()
   if len(args) != 1:
     parser.print_help()
     sys.exit(1)
+  if opts.follow and (opts.streaming or opts.jobs > 1):
+    parser.error("--follow can't be used with --streaming or with more than one job")
+  if opts.follow and not log_files.is_plain_file(args[0]):
+    parser.error("--follow can't be used with an event log that is compressed or in a bundle")
+
+  supported_reports = STREAMING_REPORTS if opts.streaming else REPORTS.keys()
+  monitor_filenames = []
+  if opts.continuous_monitors:
+    monitor_filenames = [name.strip() for name in opts.continuous_monitors.split(",")
+      if name.strip()]
+  if opts.reports is None:
+    report_names = [name for name in supported_reports
+      if monitor_filenames or name not in MONITOR_REPORTS]
+  else:
+    report_names = [name.strip() for name in opts.reports.split(",") if name.strip()]
+    unsupported_reports = [name for name in report_names if name not in supported_reports]
+    if unsupported_reports:
+      parser.error("Unsupported reports{}: {}".format(
+        " with --streaming" if opts.streaming else "", ", ".join(unsupported_reports)))
+    if not monitor_filenames and any([name in MONITOR_REPORTS for name in report_names]):
+      parser.error("The {} reports require --continuous-monitors".format(
+        ", ".join(MONITOR_REPORTS)))
 
   if opts.debug:
     logging.basicConfig(level=logging.DEBUG)
@@ -263,15 +1261,28 @@ def main(argv):
   if filename is None:
     parser.print_help()
     sys.exit(1)
+  # The reports for a log in a bundle are written next to the bundle.
+  output_prefix = log_files.get_output_prefix(filename)
 
-  analyzer = Analyzer(filename)
+  if opts.streaming:
+    streaming_analyzer = StreamingAnalyzer(filename, compression=opts.sketch_compression)
+    if "utilizations" in report_names:
+      streaming_analyzer.output_utilizations(output_prefix)
+    if "runtimes" in report_names:
+      streaming_analyzer.output_runtimes(output_prefix)
+    return
 
-  analyzer.output_utilizations(filename)
-  analyzer.output_load_balancing_badness(filename)
-  analyzer.output_runtimes(filename)
-  analyzer.output_job_resource_metrics(filename)
-  analyzer.output_stage_resource_metrics(filename)
-  analyzer.output_ideal_time_metrics(filename)
+  analyzer = Analyzer(
+    filename, use_cache=opts.use_cache, invalidate_cache=opts.invalidate_cache,
+    num_processes=opts.jobs, follow=opts.follow)
+  analyzer.load_continuous_monitors(monitor_filenames)
+  if opts.follow:
+    try:
+      analyzer.follow(output_prefix, report_names, opts.follow_interval)
+    except KeyboardInterrupt:
+      pass
+  else:
+    analyzer.output_reports(output_prefix, report_names)
 
 if __name__ == "__main__":
   main(sys.argv[1:])
@@ -4,89 +4,117 @@ master and generates a graph plotting the job completion time as a function
 of the number of tasks used.
 """
 
+import functools
 import numpy
+from optparse import OptionParser
 import os
 import re
 import subprocess
 import sys
 
+import log_files
 import parse_event_logs
 import utils
 
-def filter(all_jobs_dict):
-  sorted_jobs = sorted(all_jobs_dict.iteritems())
+def job_predicate(job_start):
    # Eliminate the first two jobs (the first one is a warmup job,
    # and the second job was responsible for generating the input RDD and caching
    # it in-memory), and then every other job (since every other job just does GC).
-  filtered_jobs = sorted_jobs[3::2]
-  return {k:v for (k,v) in filtered_jobs}
+  return job_start.ordinal >= 3 and (job_start.ordinal - 3) % 2 == 0
+
+def get_runtimes(num_cores, event_log_filename):
+  """
+  Parses the provided event log and returns a tuple of:
+    ( num tasks, actual job runtimes, ideal job runtimes, actual map stage runtimes,
+      ideal map stage runtimes, actual reduce stage runtimes, ideal reduce stage runtimes )
+  where all of the runtimes are lists of times in milliseconds.
+  """
+  print "Parsing event log in %s" % event_log_filename
+  analyzer = parse_event_logs.Analyzer(event_log_filename, job_predicate = job_predicate)
+
+  all_jobs = analyzer.jobs.values()
+  num_tasks_values = [stage.num_tasks() for job in all_jobs
+    for (stage_id, stage) in job.stages.iteritems()]
+  # Assumes all of the map and reduce staages use the same number of tasks.
+  num_tasks = num_tasks_values[0]
+
+  ideal_runtimes_millis = []
+  ideal_map_runtimes_millis = []
+  actual_map_runtimes_millis = []
+  ideal_reduce_runtimes_millis = []
+  actual_reduce_runtimes_millis = []
+
+  for job in all_jobs:
+    job_ideal_millis = 0
+    for (stage_id, stage) in job.stages.iteritems():
+      stage_ideal_millis = 1000 * stage.ideal_time_s(num_cores_per_executor = num_cores)
+      job_ideal_millis += stage_ideal_millis
+      if stage.has_shuffle_read():
+        ideal_reduce_runtimes_millis.append(stage_ideal_millis)
+        actual_reduce_runtimes_millis.append(stage.runtime())
+      else:
+        ideal_map_runtimes_millis.append(stage_ideal_millis)
+        actual_map_runtimes_millis.append(stage.runtime())
+    ideal_runtimes_millis.append(job_ideal_millis)
+
+  actual_runtimes_millis = [job.runtime() for job in all_jobs]
+  return (num_tasks, actual_runtimes_millis, ideal_runtimes_millis, actual_map_runtimes_millis,
+    ideal_map_runtimes_millis, actual_reduce_runtimes_millis, ideal_reduce_runtimes_millis)
 
 def main(argv):
-  if len(argv) < 2:
-    print ("Usage: parse_vary_num_tasks.py output_directory [opt (to copy data): driver_hostname " +
-        "identity_file num_experiments [opt username]]")
+  parser = OptionParser(usage=("parse_vary_num_tasks.py [options] output_directory [opt (to copy " +
+    "data): driver_hostname identity_file num_experiments [opt username]]"))
+  parser.add_option(
+    "-j", "--jobs", type="int", default=1,
+    help="Number of event logs to parse in parallel, using separate processes")
+  (opts, args) = parser.parse_args(argv[1:])
+  if len(args) < 1:
+    parser.print_help()
     sys.exit(1)
 
-  output_prefix = argv[1]
+  output_prefix = args[0]
   if (not os.path.exists(output_prefix)):
     os.mkdir(output_prefix)
 
   num_cores = 8
 
-  if len(argv) >= 5:
-    driver_hostname = argv[2]
+  if len(args) >= 4:
+    driver_hostname = args[1]
     if "millennium" in driver_hostname:
       # The millennium machines have 16 cores.
       num_cores = 16
-    identity_file = argv[3]
-    num_experiments = argv[4]
-    if len(argv) >= 6:
-      username = argv[5]
+    identity_file = args[2]
+    num_experiments = args[3]
+    if len(args) >= 5:
+      username = args[4]
     else:
       username = "root"
     utils.copy_latest_zipped_logs(driver_hostname, identity_file, output_prefix, num_experiments, username)
 
-  all_dirnames = [d for d in os.listdir(output_prefix) if "experiment" in d and "tar.gz" not in d]
-  all_dirnames.sort(key = lambda d: int(re.search('experiment_log_([0-9]*)_', d).group(1)))
+  # The results of each experiment can be a directory or a bundle that hasn't been extracted.
+  all_experiments = [(name, experiment_path)
+    for name, experiment_path in log_files.list_experiments(output_prefix) if "experiment" in name]
+  all_experiments.sort(
+    key = lambda (name, _): int(re.search('experiment_log_([0-9]*)_', name).group(1)))
+  event_log_filenames = [log_files.find_log(experiment_path, "event_log")
+    for _, experiment_path in all_experiments]
+
+  # Parse the event logs, which may be done in parallel.
+  all_runtimes = utils.parallel_map(
+    functools.partial(get_runtimes, num_cores),
+    [filename for filename in event_log_filenames if filename is not None],
+    opts.jobs)
 
   output_filename = os.path.join(output_prefix, "actual_runtimes")
   output_file = open(output_filename, "w")
 
-  for dirname in all_dirnames:
-    local_event_log_filename = os.path.join(output_prefix, dirname, "event_log")
-    print "Parsing event log in %s" % local_event_log_filename
-    analyzer = parse_event_logs.Analyzer(local_event_log_filename, job_filterer = filter)
-
-    all_jobs = analyzer.jobs.values()
-    num_tasks_values = [len(stage.tasks) for job in all_jobs
-      for (stage_id, stage) in job.stages.iteritems()]
-    # Assumes all of the map and reduce staages use the same number of tasks.
-    num_tasks = num_tasks_values[0]
-
-    ideal_runtimes_millis = []
-    ideal_map_runtimes_millis = []
-    actual_map_runtimes_millis = []
-    ideal_reduce_runtimes_millis = []
-    actual_reduce_runtimes_millis = []
-
-    for job in all_jobs:
-      job_ideal_millis = 0
-      for (stage_id, stage) in job.stages.iteritems():
-        stage_ideal_millis = 1000 * stage.ideal_time_s(num_cores_per_executor = num_cores)
-        job_ideal_millis += stage_ideal_millis
-        if stage.has_shuffle_read():
-          ideal_reduce_runtimes_millis.append(stage_ideal_millis)
-          actual_reduce_runtimes_millis.append(stage.runtime())
-        else:
-          ideal_map_runtimes_millis.append(stage_ideal_millis)
-          actual_map_runtimes_millis.append(stage.runtime())
-      ideal_runtimes_millis.append(job_ideal_millis)
-
+  for (num_tasks, actual_runtimes_millis, ideal_runtimes_millis, actual_map_runtimes_millis,
+       ideal_map_runtimes_millis, actual_reduce_runtimes_millis,
+       ideal_reduce_runtimes_millis) in all_runtimes:
     print "Ideal runtimes:", ideal_runtimes_millis
     print "Ideal map runtimes:", ideal_map_runtimes_millis
     print "Ideal reduce runtimes:", ideal_reduce_runtimes_millis
 
-    actual_runtimes_millis = [job.runtime() for job in all_jobs]
     actual_over_ideal = [actual / ideal
       for actual, ideal in zip(actual_runtimes_millis, ideal_runtimes_millis)]
 
@@ -88,6 +88,20 @@ def __parse_args():
     help=("If present, will plot all continuous monitors, whose names must end with " +
       "'executor_monitor'"),
     required=False)
+  parser.add_argument(
+    "--invalidate-cache",
+    action="store_true",
+    default=False,
+    help="Discard any cached copies of the event logs and parse them again.",
+    required=False)
+  parser.add_argument(
+    "-j",
+    "--jobs",
+    default=1,
+    help=("The number of event logs to parse (and of continuous monitors to plot) in parallel, " +
+      "using separate processes."),
+    required=False,
+    type=int)
   return parser.parse_args()
 
 
@@ -123,7 +137,7 @@ def __find_event_logs(args):
         branch_dir = path.join(query_dir, branch_name)
         if (path.isdir(branch_dir)):
           if plot_continuous_monitors:
-            utils.plot_continuous_monitors(branch_dir)
+            utils.plot_continuous_monitors(branch_dir, args.jobs)
 
           event_log = path.join(branch_dir, "event_log")
           if is_monotasks_branch:
@@ -171,23 +185,34 @@ def __generate_graphs(queries, args):
       new_line = new_line.replace("__XRANGE__", str(x_max))
       plot_file.write(new_line)
 
+  # Parse the event logs, which may be done in parallel.
+  query_names_and_event_logs = [(query_name, event_log)
+    for (query_name, event_logs) in sorted_queries
+    for event_log in event_logs]
+  all_jcts = utils.parallel_map(
+    functools.partial(__get_jcts, args.num_warmup_trials, args.invalidate_cache),
+    query_names_and_event_logs,
+    args.jobs)
+  query_name_and_event_log_to_jcts = dict(zip(query_names_and_event_logs, all_jcts))
+
   # Construct the data files.
-  num_warmup_trials = args.num_warmup_trials
   with open(monotasks_data_filepath, "w") as monotasks_data_file, \
        open(spark_data_filepath, "w") as spark_data_file:
     i = 0
     for (query_name, (monotasks_event_log, spark_event_log)) in sorted_queries:
-      __add_jct_results(monotasks_data_file, monotasks_event_log, query_name, num_warmup_trials, i)
-      __add_jct_results(spark_data_file, spark_event_log, query_name, num_warmup_trials, i)
+      __add_jct_results(monotasks_data_file,
+        query_name_and_event_log_to_jcts[(query_name, monotasks_event_log)], query_name, i)
+      __add_jct_results(spark_data_file,
+        query_name_and_event_log_to_jcts[(query_name, spark_event_log)], query_name, i)
       i += 1
 
   # Generate the graph.
   subprocess.check_call("gnuplot {}".format(plot_filepath), shell=True)
 
 
-def __drop_warmup_filterer(num_warmup_jobs, all_jobs_dict):
-  """ A filterer that drops the first few jobs. """
-  return {k: v for k, v in sorted(all_jobs_dict.iteritems())[num_warmup_jobs:]}
+def __is_not_warmup_job(num_warmup_jobs, job_start):
+  """ A job predicate that drops the first few jobs. """
+  return job_start.ordinal >= num_warmup_jobs
 
 
 def __build_data_line(query_name, x_coordinate, data_values):
@@ -207,23 +232,30 @@ def __sum_adjacent_items(items):
   return result
 
 
-def __add_jct_results(data_file, event_log, query_name, num_warmup_trials, x_coordinate):
+def __get_jcts(num_warmup_trials, invalidate_cache, query_name_and_event_log):
   """
-  Parses the provided event log, extracts the JCTs, and writes the min, median, and max JCTs to the
-  provided data file.
+  Parses the provided event log, writes its utilization files, and returns the JCT of each trial.
+  query_name_and_event_log should be a tuple of the form ( query name, event log file ).
   """
+  query_name, event_log = query_name_and_event_log
   # Each trial of queries 3abc and 4 consists of two jobs.,
   has_two_jobs_per_trial = ("3" in query_name) or ("4" in query_name)
   num_warmup_jobs = 2 * num_warmup_trials if has_two_jobs_per_trial else num_warmup_trials
 
-  filterer = functools.partial(__drop_warmup_filterer, num_warmup_jobs)
-  analyzer = parse_event_logs.Analyzer(event_log, filterer)
+  job_predicate = functools.partial(__is_not_warmup_job, num_warmup_jobs)
+  analyzer = parse_event_logs.Analyzer(
+    event_log, invalidate_cache=invalidate_cache, job_predicate=job_predicate)
   analyzer.output_utilizations(event_log)
   jcts = [job.runtime() for _, job in sorted(analyzer.jobs.iteritems())]
 
   if has_two_jobs_per_trial:
     # We sum adjacent JCTs together in order to get the total JCT for each trial.
     jcts = __sum_adjacent_items(jcts)
+  return jcts
+
+
+def __add_jct_results(data_file, jcts, query_name, x_coordinate):
+  """ Writes the min, median, and max of the provided JCTs to the provided data file. """
   data_values = [numpy.median(jcts), min(jcts), max(jcts)]
   data_file.write(__build_data_line(query_name, x_coordinate, data_values))
 
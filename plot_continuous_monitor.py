@@ -1,5 +1,13 @@
 import argparse
+import hashlib
 import json
+import numpy
+import os
+from os import path
+
+import event_log_cache
+import log_files
+from monitor_table import MonitorTable
 import plot_gnuplot
 import plot_matplotlib
 
@@ -7,6 +15,11 @@ BYTES_PER_GIGABYTE = float(1024 * 1024 * 1024)
 BYTES_PER_KILOBYTE = 1024 * 1024
 BYTES_PER_GIGABIT = BYTES_PER_GIGABYTE / 8
 CORES = 8.0
+# The default maximum number of samples to plot for each monitor (see MonitorTable.downsample()).
+DEFAULT_MAX_PLOT_POINTS = 2000
+# Should be incremented whenever the format of the checkpoints changes, so that old checkpoints are
+# ignored.
+CHECKPOINT_VERSION = 3
 
 class DiskUtilization:
   """ Represents the utilization of one disk at one point in time. """
@@ -36,15 +49,132 @@ def is_valid_disk_name(disk_name):
   return True
 
 
-def plot_continuous_monitor(filename, open_graphs=False, use_gnuplot=False):
-  continuous_monitor_data = []
+def get_checkpoint_filename(filename):
+  """ Returns the name of the file that holds the checkpoint for a continuous monitor.
+
+  Checkpoints are stored with the cached event logs (see event_log_cache.py), which also limits
+  their total size. The checkpoint file is a JSON header that describes the checkpoint; the arrays
+  of the parsed MonitorTable are stored in separate .npy files (see
+  get_checkpoint_array_filename()).
+  """
+  key = hashlib.sha1(path.abspath(filename)).hexdigest()
+  return path.join(event_log_cache.DEFAULT_CACHE_DIR, "{}.monitor.json".format(key))
+
+
+def get_checkpoint_array_filename(checkpoint_filename, name):
+  """ Returns the name of the .npy file that holds the named array for the given checkpoint. """
+  return "{}.{}.npy".format(path.splitext(checkpoint_filename)[0], name)
+
+
+def load_checkpoint(filename):
+  """ Returns the checkpoint that save_checkpoint() saved for the given continuous monitor.
+
+  The arrays of the checkpoint's MonitorTable are memory-mapped rather than read, so loading the
+  checkpoint of a large monitor is fast, and the samples are only read from disk when they are
+  used. Returns None if there is no checkpoint, or if the continuous monitor was truncated or
+  replaced since the checkpoint was saved (so it has to be parsed from the beginning).
+  """
+  checkpoint_filename = get_checkpoint_filename(filename)
+  try:
+    with open(checkpoint_filename, "r") as checkpoint_file:
+      checkpoint = json.load(checkpoint_file)
+  except (IOError, ValueError):
+    return None
+  if (checkpoint.get("version") != CHECKPOINT_VERSION or
+      checkpoint.get("path") != path.abspath(filename)):
+    return None
+  if not event_log_cache.is_unchanged_prefix(
+      filename, checkpoint["offset"], checkpoint["prefix_hash"]):
+    print "Ignoring checkpoint for {}, which was truncated or replaced".format(filename)
+    return None
+  array_filenames = [get_checkpoint_array_filename(checkpoint_filename, name)
+    for name in checkpoint["array_names"]]
+  try:
+    arrays = {name: numpy.load(array_filename, mmap_mode="r")
+      for name, array_filename in zip(checkpoint["array_names"], array_filenames)}
+    table = MonitorTable.from_arrays(arrays, checkpoint["disk_names"])
+  except (IOError, ValueError):
+    # One of the arrays was evicted from the cache, or was overwritten by another process.
+    return None
+  if len(table) != checkpoint["num_rows"]:
+    return None
+  checkpoint["table"] = table
+  # Update the modification times, which are used to find the least recently used cache entries.
+  for used_filename in [checkpoint_filename] + array_filenames:
+    os.utime(used_filename, None)
+  return checkpoint
+
+
+def save_checkpoint(filename, checkpoint):
+  """
+  Saves a checkpoint of the parsed contents of a continuous monitor: a dictionary with the state of
+  parse_continuous_monitor(), including the number of bytes of the monitor that were parsed, in
+  "offset", and the MonitorTable with the parsed samples, in "table".
+  """
+  checkpoint = dict(checkpoint)
+  table = checkpoint.pop("table")
+  arrays = table.to_arrays()
+  checkpoint.update({
+    "array_names": sorted(arrays),
+    "disk_names": table.disk_names,
+    "num_rows": len(table),
+    "version": CHECKPOINT_VERSION,
+    "path": path.abspath(filename),
+    "prefix_hash": event_log_cache.get_content_hash(filename, checkpoint["offset"])
+  })
+  checkpoint_filename = get_checkpoint_filename(filename)
+  checkpoint_dir = path.dirname(checkpoint_filename)
+  try:
+    os.makedirs(checkpoint_dir)
+  except OSError:
+    if not path.isdir(checkpoint_dir):
+      raise
+  # Write to temporary files first, so that a partially written checkpoint is never used. The
+  # header is written last, and load_checkpoint() checks that the arrays match it.
+  for name, array in arrays.iteritems():
+    array_filename = get_checkpoint_array_filename(checkpoint_filename, name)
+    temp_filename = "{}.{}.tmp".format(array_filename, os.getpid())
+    with open(temp_filename, "wb") as array_file:
+      numpy.save(array_file, array)
+    os.rename(temp_filename, array_filename)
+  temp_filename = "{}.{}.tmp".format(checkpoint_filename, os.getpid())
+  with open(temp_filename, "w") as checkpoint_file:
+    json.dump(checkpoint, checkpoint_file)
+  os.rename(temp_filename, checkpoint_filename)
+  event_log_cache.EventLogCache().evict_old_entries(checkpoint_filename)
+
+
+def parse_continuous_monitor(filename, use_checkpoint=True, monitor_file=None):
+  """ Parses a continuous monitor.
 
-  start = -1
-  at_beginning = True
-  # Mapping of disk IDs to the 1-indexed index in utilization file where the information
-  # about that disk begins.
-  disks_to_index = {}
-  for (i, line) in enumerate(open(filename, "r")):
+  Returns a MonitorTable with the samples in the monitor (see monitor_table.py for the names of the
+  fields); its start_time is the "Current Time" of the first sample. If use_checkpoint is true
+  and the monitor was parsed before, parsing resumes from the end of the part of the monitor that
+  was parsed then, and a new checkpoint is saved afterwards, so only the lines that were appended
+  since (e.g., because the experiment was still running) are parsed. The monitor can also be
+  compressed or in a tar bundle (see log_files.py), in which case it is always parsed from the
+  beginning, without a checkpoint. If monitor_file is given, the monitor is read from it (e.g., a
+  file from log_files.iter_logs()) rather than by opening filename, and it isn't closed.
+  """
+  use_checkpoint = use_checkpoint and log_files.is_plain_file(filename)
+  checkpoint = load_checkpoint(filename) if use_checkpoint else None
+  if checkpoint is None:
+    checkpoint = {"offset": 0, "start": -1, "at_beginning": True, "table": MonitorTable()}
+  offset = checkpoint["offset"]
+  table = checkpoint["table"]
+  start = checkpoint["start"]
+  at_beginning = checkpoint["at_beginning"]
+
+  close_monitor_file = monitor_file is None
+  if close_monitor_file:
+    monitor_file = log_files.open_log(filename)
+  if offset > 0:
+    monitor_file.seek(offset)
+  for line in monitor_file:
+    if not line.endswith("\n"):
+      # The rest of the line hasn't been written yet, or the file was cut off when the job stopped.
+      print "Stopping parsing due to incomplete line"
+      break
     try:
       json_data = json.loads(line)
     except ValueError:
@@ -55,7 +185,9 @@ def plot_continuous_monitor(filename, open_graphs=False, use_gnuplot=False):
       else:
         # There are some non-JSON lines at the beginning of the file.
         print "Skipping non-JSON line at beginning of file: {}".format(line)
+        offset += len(line)
         continue
+    offset += len(line)
     at_beginning = False
     time = json_data["Current Time"]
     if start == -1:
@@ -121,46 +253,60 @@ def plot_continuous_monitor(filename, open_graphs=False, use_gnuplot=False):
     if "Free Off-Heap Memory Bytes" in json_data:
       free_off_heap_memory = json_data["Free Off-Heap Memory Bytes"]
 
-    data = [
-      ('time', time - start),
-      ('cpu utilization', cpu_total / CORES),
-      ('bytes received', bytes_received / BYTES_PER_GIGABIT),
-      ('bytes transmitted', bytes_transmitted / BYTES_PER_GIGABIT),
-      ('running compute monotasks', running_compute_monotasks), # 5
-      ('running macrotasks', running_macrotasks),
-      ('gc fraction', gc_fraction),
-      ('outstanding network bytes', outstanding_network_bytes / BYTES_PER_KILOBYTE),
-      ('macrotasks in network', macrotasks_in_network),
-      ('macrotasks in compute', macrotasks_in_compute), # 10
-      ('cpu system', cpu_system / CORES),
-      ('macrotasks in disk', macrotasks_in_disk),
-      ('free heap memory', free_heap_memory / BYTES_PER_GIGABYTE),
-      ('free off heap memory', free_off_heap_memory / BYTES_PER_GIGABYTE),
-      ('local running macrotasks', local_running_macrotasks) # 15
+    # The values are in the order of monitor_table.COLUMNS.
+    values = [
+      time - start,
+      cpu_total / CORES,
+      bytes_received / BYTES_PER_GIGABIT,
+      bytes_transmitted / BYTES_PER_GIGABIT,
+      running_compute_monotasks, # 5
+      running_macrotasks,
+      gc_fraction,
+      outstanding_network_bytes / BYTES_PER_KILOBYTE,
+      macrotasks_in_network,
+      macrotasks_in_compute, # 10
+      cpu_system / CORES,
+      macrotasks_in_disk,
+      free_heap_memory / BYTES_PER_GIGABYTE,
+      free_off_heap_memory / BYTES_PER_GIGABYTE,
+      local_running_macrotasks # 15
     ]
+    # The values for each disk are in the order of monitor_table.DISK_COLUMNS.
+    disk_to_values = {disk_id: [disk_util.total_utilization, disk_util.read_throughput,
+        disk_util.write_throughput, disk_util.running_disk_monotasks]
+      for disk_id, disk_util in disk_to_utilization.iteritems()}
+    table.add_sample(values, disk_to_values)
+  if close_monitor_file:
+    monitor_file.close()
 
-    # Append info about each disk (in sorted order, so that the standard EC2 disks appear in
-    # predictable order).
-    for disk_id, disk_util in sorted(disk_to_utilization.iteritems()):
-      # Saving the index needs to happen before the disk's utilization information gets appended to
-      # data below.
-      if disk_id not in disks_to_index:
-        disks_to_index[disk_id] = len(data) + 1
+  if use_checkpoint and offset > checkpoint["offset"]:
+    save_checkpoint(filename, {"offset": offset, "start": start, "at_beginning": at_beginning,
+      "table": table})
+  if start != -1:
+    table.start_time = start
+  return table
 
-      data.extend([
-        ("{} utilization".format(disk_id), disk_util.total_utilization),
-        ("{} read throughput".format(disk_id), disk_util.read_throughput),
-        ("{} write throughput".format(disk_id), disk_util.write_throughput),
-        ("{} running disk monotasks".format(disk_id), disk_util.running_disk_monotasks)
-      ])
 
-    continuous_monitor_data.append(data)
+def plot_continuous_monitor(filename, open_graphs=False, use_gnuplot=False, use_checkpoint=True,
+                            max_points=DEFAULT_MAX_PLOT_POINTS, single_pdf=False,
+                            monitor_file=None):
+  """ Plots a continuous monitor.
 
+  Unless max_points is None, the samples are downsampled before they are plotted, so that at most
+  max_points samples are plotted (keeping the minimum and maximum of each series over each
+  interval, so spikes are still visible). If single_pdf is true, the matplotlib graphs are written
+  to a single multi-page PDF rather than one PDF per graph. monitor_file is passed on to
+  parse_continuous_monitor().
+  """
+  table = parse_continuous_monitor(filename, use_checkpoint, monitor_file)
+  if max_points is not None:
+    table = table.downsample(max_points)
+  # The graphs for a monitor in a bundle are written next to the bundle.
+  output_prefix = log_files.get_output_prefix(filename)
   if use_gnuplot:
-    plot_gnuplot.plot(continuous_monitor_data, filename, open_graphs, disks_to_index)
+    plot_gnuplot.plot(table, output_prefix, open_graphs)
   else:
-    plot_matplotlib.plot([dict(line) for line in continuous_monitor_data], filename, open_graphs,
-                         disks_to_index.iterkeys())
+    plot_matplotlib.plot(table, output_prefix, open_graphs, table.disk_names, single_pdf)
 
 
 def get_util_for_disk(disk_utils, disk):
@@ -178,7 +324,9 @@ def get_util_for_disk(disk_utils, disk):
 def parse_args():
   parser = argparse.ArgumentParser(description="Plots Spark continuous monitor logs.")
   parser.add_argument("-f", "--filename",
-                      help="The path to a continuous monitor log file.",
+                      help=("The path to a continuous monitor log file, which can be " +
+                        "compressed or a member of a tar bundle (e.g., " +
+                        "logs.tar.gz/logs/executor_monitor)."),
                       required=True)
   parser.add_argument("-o", "--open-graphs",
                       help="open generated graphs",
@@ -186,13 +334,30 @@ def parse_args():
   parser.add_argument("-g", "--gnuplot",
                       help="generate graphs with gnuplot",
                       action="store_true", default=False)
+  parser.add_argument("--no-checkpoint",
+                      help=("parse the whole file, without resuming from or saving a checkpoint " +
+                        "of the parsed data"),
+                      action="store_false", dest="use_checkpoint", default=True)
+  parser.add_argument("--max-points",
+                      help=("the maximum number of samples to plot; longer monitors are " +
+                        "downsampled, keeping the minimum and maximum values over " +
+                        "each interval"),
+                      type=int, default=DEFAULT_MAX_PLOT_POINTS)
+  parser.add_argument("--no-downsample",
+                      help="plot every sample, without downsampling",
+                      action="store_const", dest="max_points", const=None)
+  parser.add_argument("--single-pdf",
+                      help=("write all of the matplotlib graphs to a single multi-page PDF " +
+                        "(ignored with --gnuplot)"),
+                      action="store_true", default=False)
 
   return parser.parse_args()
 
 
 def main():
   args = parse_args()
-  plot_continuous_monitor(args.filename, args.open_graphs, args.gnuplot)
+  plot_continuous_monitor(args.filename, args.open_graphs, args.gnuplot, args.use_checkpoint,
+                          args.max_points, args.single_pdf)
 
 if __name__ == "__main__":
   main()
@@ -2,34 +2,71 @@ import inspect
 from os import path
 import subprocess
 
+import monitor_table
+
 LINE_TEMPLATE = "\"{}\" using 1:{} with l ls {} title \"{}\""
+# The format of the values in the data file, which uses the same number of significant digits as
+# str() does for floats.
+VALUE_FORMAT = "%.12g"
+WRITE_BATCH_ROWS = 10000
 
-def plot(cm_data, file_prefix, open_graphs, disk_to_index):
+def plot(table, file_prefix, open_graphs):
   """
   Creates gnuplot files that can be used to generate plots with data for
-  various continuous monitor attributes, and uses those files to generate PDFs
-  of each plot
+  various continuous monitor attributes (from a MonitorTable), and uses those
+  files to generate PDFs of each plot
   """
-  # Write continuous monitor data to tab deliminated data file.
+  # Write continuous monitor data to tab deliminated data file. The columns for each disk follow
+  # the columns in monitor_table.COLUMNS, and missing disk values are written as NaN, which gnuplot
+  # skips.
   out_filename = "{}_utilization".format(file_prefix)
-  with open(out_filename, 'w') as out_file:
-    for data in cm_data:
-      write_data(out_file, [val[1] for val in data])
+  disk_to_index = get_disk_to_index(table)
+  write_data(out_filename, table)
 
   # Get the location of the monotasks-scripts repository by getting the
   # directory containing the file that is currently being executed.
   scripts_dir = path.dirname(inspect.stack()[0][1])
   attributes = ['utilization', 'monotasks', 'memory']
 
-  for attribute in attributes:
-    plot_gnuplot_attribute(attribute, file_prefix, open_graphs, scripts_dir, disk_to_index)
+  # Each function returns a tuple of (gnuplot file, pdf file).
+  plot_and_pdf_filenames = [
+    write_gnuplot_attribute(attribute, file_prefix, scripts_dir, disk_to_index)
+    for attribute in attributes]
+  plot_and_pdf_filenames.extend([
+    write_single_disk(disk_name, index, file_prefix, scripts_dir, out_filename)
+    for disk_name, index in sorted(disk_to_index.iteritems())])
 
-  for disk_name, index in disk_to_index.iteritems():
-    plot_single_disk(disk_name, index, file_prefix, open_graphs, scripts_dir, out_filename)
+  run_gnuplot([plot_filename for plot_filename, _ in plot_and_pdf_filenames])
+  if open_graphs:
+    for _, pdf_filename in plot_and_pdf_filenames:
+      subprocess.check_call(['open', pdf_filename])
 
 
-def plot_gnuplot_attribute(attribute, file_prefix, open_graphs, scripts_dir, disk_to_index):
-  """ Create a gnuplot file and associated pdf for a some attribute (like utilization) """
+def run_gnuplot(plot_filenames):
+  """ Runs the given gnuplot files, in order, using a single gnuplot process.
+
+  gnuplot's settings are reset before each file, so each file is run as if it were run on its own.
+  If gnuplot fails, each file is run again on its own to find the one that failed, and a
+  subprocess.CalledProcessError is raised for the first such file (whose command names the file).
+  """
+  command = ['gnuplot']
+  for plot_filename in plot_filenames:
+    if len(command) > 1:
+      command.extend(['-e', 'reset'])
+    command.append(plot_filename)
+  if subprocess.call(command) == 0:
+    return
+  for plot_filename in plot_filenames:
+    subprocess.check_call(['gnuplot', plot_filename])
+  # Every file succeeded on its own, so running them together failed for some other reason.
+  raise subprocess.CalledProcessError(1, command)
+
+
+def write_gnuplot_attribute(attribute, file_prefix, scripts_dir, disk_to_index):
+  """
+  Create a gnuplot file for some attribute (like utilization), and returns a tuple of its name and
+  the name of the pdf that it generates
+  """
   data_filename = '{}_utilization'.format(file_prefix)
   plot_filename = '{}_{}.gp'.format(file_prefix, attribute)
   base_plot_filename = path.join(scripts_dir, 'gnuplot_files/plot_{}_base.gp'.format(attribute))
@@ -45,15 +82,14 @@ def plot_gnuplot_attribute(attribute, file_prefix, open_graphs, scripts_dir, dis
         plot_file.write(",\\\n{}".format(LINE_TEMPLATE.format(
           data_filename, index, color, "{} Utilization".format(disk))))
         color += 1
-
-  subprocess.check_call('gnuplot {}'.format(plot_filename), shell=True)
-  if open_graphs:
-    subprocess.check_call('open {}'.format(pdf_filename), shell=True)
+  return (plot_filename, pdf_filename)
 
 
-def plot_single_disk(disk_to_plot, start_index, file_prefix, open_graphs, scripts_dir,
-                     util_filename):
-  """ Plots the utilization for a single disk. """
+def write_single_disk(disk_to_plot, start_index, file_prefix, scripts_dir, util_filename):
+  """
+  Creates a gnuplot file that plots the utilization for a single disk, and returns a tuple of its
+  name and the name of the pdf that it generates.
+  """
   disk_plot_filename_prefix = '{}_{}_disk_utilization'.format(file_prefix, disk_to_plot)
   disk_plot_filename = '{}.gp'.format(disk_plot_filename_prefix)
   disk_plot_output = '{}.pdf'.format(disk_plot_filename_prefix)
@@ -73,14 +109,24 @@ def plot_single_disk(disk_to_plot, start_index, file_prefix, open_graphs, script
       util_filename, start_index + 2, 4, "Write Throughput"))
     disk_plot_file.write(",\\\n")
     disk_plot_file.write(LINE_TEMPLATE.format(util_filename, start_index + 3, 5, "Monotasks"))
+  return (disk_plot_filename, disk_plot_output)
 
-  subprocess.check_call('gnuplot {}'.format(disk_plot_filename), shell=True)
-  if open_graphs:
-    subprocess.check_call('open {}'.format(disk_plot_output), shell=True)
-  return disk_plot_output
 
+def get_disk_to_index(table):
+  """
+  Returns a mapping of disk names to the 1-indexed column in the data file where the information
+  about that disk begins.
+  """
+  return {disk_name: len(monitor_table.COLUMNS) + 1 + i * len(monitor_table.DISK_COLUMNS)
+    for i, disk_name in enumerate(table.disk_names)}
 
-def write_data(out_file, data):
-  stringified = [str(x) for x in data]
-  out_file.write('\t'.join(stringified))
-  out_file.write('\n')
+
+def write_data(out_filename, table):
+  """ Writes the samples in a MonitorTable to a tab-delimited data file, one line per sample. """
+  values = table.values()
+  line_format = "\t".join([VALUE_FORMAT] * values.shape[1]) + "\n"
+  with open(out_filename, 'w') as out_file:
+    # Format the values in batches, so that the Python lists of values don't use much memory.
+    for start in xrange(0, len(values), WRITE_BATCH_ROWS):
+      out_file.write("".join([line_format % tuple(row)
+        for row in values[start:start + WRITE_BATCH_ROWS].tolist()]))
@@ -1,17 +1,27 @@
-import matplotlib.pyplot as pyplot
-
+from matplotlib.backends import backend_agg
 from matplotlib.backends import backend_pdf
+from matplotlib import figure
 
 
 def continuous_monitor_col(continuous_monitor, key):
   """
-  For a given key, returns a list of data from continuous monitor entries
-  corresponding to that key.
+  For a given key, returns an array of data from a continuous monitor's
+  MonitorTable corresponding to that key.
   """
-  return [data[key] for data in continuous_monitor]
+  return continuous_monitor.series(key)
+
 
+def plot(cm_data, file_prefix, open_graphs, disks, single_pdf=False):
+  """
+  Plots the data in a continuous monitor's MonitorTable. Each graph is written to a separate PDF,
+  unless single_pdf is true, in which case all of the graphs are written as the pages of a single
+  PDF, named <file_prefix>_graphs.pdf.
 
-def plot(cm_data, file_prefix, open_graphs, disks):
+  Unless open_graphs is true, the graphs are drawn one at a time on a single matplotlib Figure that
+  isn't registered with pyplot, using the Agg renderer, so plotting doesn't depend on the configured
+  backend (or need a display), and the memory used by each graph is freed once it has been saved.
+  pyplot (and the configured interactive backend) is only used to open the graphs.
+  """
   disk_utilization_params = ['{0} utilization'.format(disk) for disk in disks]
   disk_params = (
     disk_utilization_params +
@@ -39,35 +49,54 @@ def plot(cm_data, file_prefix, open_graphs, disks):
     'gc fraction'
   ] + disk_utilization_params
 
-  def plot_params(params_to_plot, title):
+  titles_and_params = [
+    ('Disk Utilization', disk_params),
+    ('Memory', memory_params),
+    ('Monotasks', monotasks_params),
+    ('Utilization', utilization_params)
+  ]
+  for disk in disks:
+    titles_and_params.append(('{0} Utilization'.format(disk),
+      ['{0} running disk monotasks'.format(disk),
+       '{0} write throughput'.format(disk),
+       '{0} read throughput'.format(disk),
+       '{0} utilization'.format(disk)]))
+
+  times = continuous_monitor_col(cm_data, key='time')
+  if open_graphs:
+    import matplotlib.pyplot as pyplot
+  else:
+    headless_figure = figure.Figure()
+    backend_agg.FigureCanvasAgg(headless_figure)
+
+  def plot_params(params_to_plot, title, pdf):
     """
-    Creates a matplotlib graph using continuous monitor data.
+    Creates a matplotlib graph using continuous monitor data, and saves it to the given PdfPages.
     Time is the x axis and data corresponding to each parameter is used to
     generate a new line on the line graph.
     """
-    pyplot.figure(title)
-    pyplot.title(title)
-    pyplot.grid(b=True, which='both')
-    times = continuous_monitor_col(cm_data, key='time')
+    if open_graphs:
+      fig = pyplot.figure(title)
+    else:
+      fig = headless_figure
+      fig.clear()
+    axes = fig.add_subplot(111)
+    axes.set_title(title)
+    axes.grid(b=True, which='both')
     for key in params_to_plot:
-      pyplot.plot(times, continuous_monitor_col(cm_data, key), label=key)
-    legend = pyplot.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+      axes.plot(times, continuous_monitor_col(cm_data, key), label=key)
+    legend = axes.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    pdf.savefig(fig, additional_artists=[legend], bbox_inches='tight')
 
-    pdf_filepath = '{0}_{1}_graphs.pdf'.format(file_prefix, title.lower().replace(' ', '_'))
-    with backend_pdf.PdfPages(pdf_filepath) as pdf:
-      pdf.savefig(additional_artists=[legend], bbox_inches='tight')
-
-  plot_params(disk_params, title='Disk Utilization')
-  plot_params(memory_params, title='Memory')
-  plot_params(monotasks_params, title='Monotasks')
-  plot_params(utilization_params, title='Utilization')
-
-  for disk in disks:
-    disk_params = ['{0} running disk monotasks'.format(disk),
-                   '{0} write throughput'.format(disk),
-                   '{0} read throughput'.format(disk),
-                   '{0} utilization'.format(disk)]
-    plot_params(disk_params, title='{0} Utilization'.format(disk))
+  if single_pdf:
+    with backend_pdf.PdfPages('{0}_graphs.pdf'.format(file_prefix)) as pdf:
+      for title, params in titles_and_params:
+        plot_params(params, title, pdf)
+  else:
+    for title, params in titles_and_params:
+      pdf_filepath = '{0}_{1}_graphs.pdf'.format(file_prefix, title.lower().replace(' ', '_'))
+      with backend_pdf.PdfPages(pdf_filepath) as pdf:
+        plot_params(params, title, pdf)
 
   if open_graphs:
     pyplot.show()
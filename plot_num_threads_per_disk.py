@@ -22,9 +22,9 @@ import argparse
 import math
 from matplotlib import pyplot
 from matplotlib.backends import backend_pdf
-import os
 from os import path
 
+import log_files
 import parse_event_logs
 import utils
 
@@ -34,13 +34,12 @@ def main():
   num_threads_to_jcts = {}
 
   log_dir = args.log_dir
-  for trial_log_dir in os.listdir(log_dir):
-    trial_log_dir_filepath = path.join(log_dir, trial_log_dir)
-    if path.isdir(trial_log_dir_filepath):
-      utils.plot_continuous_monitors(trial_log_dir_filepath)
-      num_threads = __get_num_threads_from_log_dir(trial_log_dir)
-      jcts = __get_jcts_from_logs(trial_log_dir_filepath, args.warmup_count)
-      num_threads_to_jcts[num_threads] = jcts
+  # Each trial's logs can be in a directory or in a bundle that hasn't been extracted.
+  for trial_log_dir, trial_log_dir_filepath in log_files.list_experiments(log_dir):
+    utils.plot_continuous_monitors(trial_log_dir_filepath)
+    num_threads = __get_num_threads_from_log_dir(trial_log_dir)
+    jcts = __get_jcts_from_logs(trial_log_dir_filepath, args.warmup_count, args.invalidate_cache)
+    num_threads_to_jcts[num_threads] = jcts
 
   assert len(num_threads_to_jcts) > 0, "No valid logs found in {}".format(log_dir)
 
@@ -70,6 +69,12 @@ def __parse_args():
     help="The number of iterations that are warmup and should be discarded.",
     required=True,
     type=int)
+  parser.add_argument(
+    "--invalidate-cache",
+    action="store_true",
+    default=False,
+    help="Discard any cached copies of the event logs and parse them again.",
+    required=False)
 
   args = parser.parse_args()
   log_dir = args.log_dir
@@ -81,13 +86,14 @@ def __parse_args():
   return args
 
 
-def __get_jcts_from_logs(log_dir, warmup_count):
+def __get_jcts_from_logs(log_dir, warmup_count, invalidate_cache):
   """
   Returns a tuple of (list of write job JCTs, list of read job JCTs) parsed from the event log
-  contained in the provided directory.
+  contained in the provided directory or tar bundle.
   """
-  event_log_filepath = path.join(log_dir, "event_log")
-  sorted_job_pairs = sorted(parse_event_logs.Analyzer(event_log_filepath).jobs.iteritems())
+  event_log_filepath = log_files.find_log(log_dir, "event_log")
+  analyzer = parse_event_logs.Analyzer(event_log_filepath, invalidate_cache=invalidate_cache)
+  sorted_job_pairs = sorted(analyzer.jobs.iteritems())
   return (__get_jcts_for_phase(sorted_job_pairs, warmup_count, phase="write"),
     __get_jcts_for_phase(sorted_job_pairs, warmup_count, phase="read"))
 
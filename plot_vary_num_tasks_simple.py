@@ -22,18 +22,21 @@ import functools
 from matplotlib import pyplot
 from matplotlib.backends import backend_pdf
 import numpy
-import os
 from os import path
 import re
 
+import log_files
 import parse_event_logs
+import utils
 
 
 def main():
   args = __parse_args()
   num_warmup_trials = args.num_warmup_trials
-  monotasks_num_tasks_to_jcts = __get_num_tasks_to_jcts(args.monotasks_dir, num_warmup_trials)
-  spark_num_tasks_to_jcts = __get_num_tasks_to_jcts(args.spark_dir, num_warmup_trials)
+  monotasks_num_tasks_to_jcts = __get_num_tasks_to_jcts(
+    args.monotasks_dir, num_warmup_trials, args.invalidate_cache, args.jobs)
+  spark_num_tasks_to_jcts = __get_num_tasks_to_jcts(
+    args.spark_dir, num_warmup_trials, args.invalidate_cache, args.jobs)
   __plot_num_tasks_vs_jct(monotasks_num_tasks_to_jcts, spark_num_tasks_to_jcts, args.output_dir)
 
 
@@ -62,19 +65,34 @@ def __parse_args():
       "discarded."),
     required=False,
     type=int)
+  parser.add_argument(
+    "--invalidate-cache",
+    action="store_true",
+    default=False,
+    help="Discard any cached copies of the event logs and parse them again.",
+    required=False)
+  parser.add_argument(
+    "-j",
+    "--jobs",
+    default=1,
+    help="The number of event logs to parse in parallel, using separate processes.",
+    required=False,
+    type=int)
   return parser.parse_args()
 
 
 def __get_num_tasks_to_event_log(log_dir):
   """
   Returns a mapping from a number of tasks to the path to an event log file, for each experiment
-  result directory in log_dir. The name of each directory in log_dir must start with
-  "experiment_log".
+  result directory or tar bundle in log_dir. The name of each directory or bundle in log_dir must
+  start with "experiment_log".
   """
-  all_dirs = [path.join(log_dir, dirname)
-    for dirname in os.listdir(log_dir) if "experiment_log" in dirname]
-  return {__extract_num_tasks(dirpath): path.join(log_dir, dirpath, "event_log")
-    for dirpath in all_dirs if "event_log" in os.listdir(dirpath)}
+  experiment_paths = [experiment_path
+    for name, experiment_path in log_files.list_experiments(log_dir) if "experiment_log" in name]
+  event_logs = [(experiment_path, log_files.find_log(experiment_path, "event_log"))
+    for experiment_path in experiment_paths]
+  return {__extract_num_tasks(experiment_path): event_log
+    for experiment_path, event_log in event_logs if event_log is not None}
 
 
 def __extract_num_tasks(dirpath):
@@ -85,27 +103,33 @@ def __extract_num_tasks(dirpath):
   return int(re.search('experiment_log_[0-9]*_([0-9]*)_', dirpath).group(1))
 
 
-def __get_num_tasks_to_jcts(log_dir, num_warmup_trials):
+def __get_num_tasks_to_jcts(log_dir, num_warmup_trials, invalidate_cache, num_processes):
   """
   Returns a mapping from number of tasks to a list of the JCTs from the jobs that used that number
-  of tasks.
+  of tasks. The event logs are parsed using num_processes processes.
   """
-  num_tasks_to_event_log = __get_num_tasks_to_event_log(log_dir)
-  partial_filterer = functools.partial(__filterer, num_warmup_trials)
-  return {num_tasks:
-      [float(job.runtime()) / 1000
-        for job in parse_event_logs.Analyzer(event_log, partial_filterer).jobs.itervalues()]
-    for num_tasks, event_log in num_tasks_to_event_log.iteritems()}
+  all_num_tasks, event_logs = zip(*__get_num_tasks_to_event_log(log_dir).iteritems())
+  all_jcts = utils.parallel_map(
+    functools.partial(__get_jcts, num_warmup_trials, invalidate_cache), event_logs, num_processes)
+  return dict(zip(all_num_tasks, all_jcts))
+
+
+def __get_jcts(num_warmup_trials, invalidate_cache, event_log):
+  """ Returns a list of the JCTs (in seconds) of the jobs in the provided event log. """
+  job_predicate = functools.partial(__job_predicate, num_warmup_trials)
+  return [float(job.runtime()) / 1000
+    for job in parse_event_logs.Analyzer(
+      event_log, invalidate_cache=invalidate_cache, job_predicate=job_predicate).jobs.itervalues()]
 
 
-def __filterer(num_warmup_trials, all_jobs_dict):
+def __job_predicate(num_warmup_trials, job_start):
   """
   Eliminate the first job, because it generates the input data and writes it to HDFS. Then drop the
   warmup trials, keeping in mind that each job is preceeded by a job that clears the buffer cache
   and forces a GC. Then drop the remainder of the GC/buffer cache jobs.
   """
-  return {job_id: job
-    for job_id, job in sorted(all_jobs_dict.iteritems())[(2 + (2 * num_warmup_trials))::2]}
+  first_ordinal = 2 + (2 * num_warmup_trials)
+  return job_start.ordinal >= first_ordinal and (job_start.ordinal - first_ordinal) % 2 == 0
 
 
 def __plot_num_tasks_vs_jct(monotasks_num_tasks_to_jcts, spark_num_tasks_to_jcts, output_dir):
@@ -0,0 +1,137 @@
+"""
+This file contains a mergeable sketch that estimates the weighted quantiles of a stream of values
+using a bounded amount of memory.
+
+The sketch is a merging t-digest (see Dunning and Ertl, "Computing Extremely Accurate Quantiles
+Using t-Digests"). Values are summarized by centroids (a mean and a total weight), and the centroids
+near the middle of the distribution are allowed to hold more weight than the centroids near the
+tails. The compression parameter controls the trade off between size and accuracy: a centroid whose
+values are centered at quantile q holds at most 4 * q * (1 - q) / compression of the total weight,
+so the number of centroids is proportional to compression (a few hundred with the default), and
+the estimate of quantile q is at most about 2 * q * (1 - q) / compression of the total weight away
+from the exact quantile. With the default compression of 100, that is 0.5% of the weight for the
+median, 0.095% for the 5th and 95th percentiles, and 0.02% for the 99th percentile. The mean,
+minimum, and maximum are exact.
+"""
+
+import numpy
+
+DEFAULT_COMPRESSION = 100
+# Values are buffered, and merged into the centroids once this many values per unit of compression
+# have been added, so that the cost of merging is amortized over many values.
+BUFFER_SIZE_PER_COMPRESSION = 10
+
+
+class WeightedQuantileSketch(object):
+
+  def __init__(self, compression=DEFAULT_COMPRESSION):
+    self.compression = compression
+    self.means = numpy.zeros(0)
+    self.weights = numpy.zeros(0)
+    # The number of values (not the total weight) that have been added.
+    self.count = 0
+    self.total_weight = 0.0
+    self.weighted_sum = 0.0
+    self.min = float("inf")
+    self.max = float("-inf")
+    self.__buffered_means = []
+    self.__buffered_weights = []
+    self.__num_buffered = 0
+
+  def add(self, values, weights=None):
+    """ Adds the given array of values, each with the given weight (1 if weights is None). """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if weights is None:
+      weights = numpy.ones(len(values))
+    else:
+      weights = numpy.asarray(weights, dtype=numpy.float64)
+    if len(values) == 0:
+      return
+    self.count += len(values)
+    self.total_weight += weights.sum()
+    self.weighted_sum += numpy.dot(values, weights)
+    self.min = min(self.min, values.min())
+    self.max = max(self.max, values.max())
+    self.__buffer(values, weights)
+
+  def merge(self, other):
+    """ Adds all of the values summarized by another sketch to this sketch. """
+    if other.count == 0:
+      return
+    other.__compress()
+    self.count += other.count
+    self.total_weight += other.total_weight
+    self.weighted_sum += other.weighted_sum
+    self.min = min(self.min, other.min)
+    self.max = max(self.max, other.max)
+    self.__buffer(other.means, other.weights)
+
+  def mean(self):
+    """ Returns the weighted mean of the values, or NaN if no values have been added. """
+    if self.total_weight == 0:
+      return float("nan")
+    return self.weighted_sum / self.total_weight
+
+  def quantiles(self, quantiles):
+    """
+    Returns a list with an estimate of each of the given weighted quantiles (between 0 and 1), or
+    NaNs if no values with a positive weight have been added.
+    """
+    self.__compress()
+    if len(self.means) == 0:
+      return [float("nan")] * len(quantiles)
+    # Interpolate between the centers of the centroids, using the minimum and maximum as the values
+    # at the ends.
+    centers = numpy.cumsum(self.weights) - self.weights / 2.0
+    total_weight = centers[-1] + self.weights[-1] / 2.0
+    positions = numpy.concatenate([[0.0], centers, [total_weight]])
+    values = numpy.concatenate([[self.min], self.means, [self.max]])
+    return numpy.interp(numpy.asarray(quantiles) * total_weight, positions, values).tolist()
+
+  def __buffer(self, means, weights):
+    self.__buffered_means.append(means)
+    self.__buffered_weights.append(weights)
+    self.__num_buffered += len(means)
+    if self.__num_buffered >= BUFFER_SIZE_PER_COMPRESSION * self.compression:
+      self.__compress()
+
+  def __compress(self):
+    """ Merges the buffered values into the centroids. """
+    if self.__num_buffered == 0:
+      return
+    means = numpy.concatenate([self.means] + self.__buffered_means)
+    weights = numpy.concatenate([self.weights] + self.__buffered_weights)
+    self.__buffered_means = []
+    self.__buffered_weights = []
+    self.__num_buffered = 0
+
+    # Values with no weight don't affect the quantiles.
+    positive = weights > 0
+    order = numpy.argsort(means[positive], kind="mergesort")
+    means = means[positive][order].tolist()
+    weights = weights[positive][order].tolist()
+    if not means:
+      return
+    total_weight = sum(weights)
+
+    new_means = []
+    new_weights = []
+    current_mean = means[0]
+    current_weight = weights[0]
+    weight_before_current = 0.0
+    for mean, weight in zip(means[1:], weights[1:]):
+      merged_weight = current_weight + weight
+      q = (weight_before_current + merged_weight / 2.0) / total_weight
+      if merged_weight <= 4 * total_weight * q * (1 - q) / self.compression:
+        current_mean += (mean - current_mean) * weight / merged_weight
+        current_weight = merged_weight
+      else:
+        new_means.append(current_mean)
+        new_weights.append(current_weight)
+        weight_before_current += current_weight
+        current_mean = mean
+        current_weight = weight
+    new_means.append(current_mean)
+    new_weights.append(current_weight)
+    self.means = numpy.array(new_means)
+    self.weights = numpy.array(new_weights)
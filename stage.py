@@ -1,102 +1,218 @@
 import logging
+import numpy
 
 import metrics
-from task import Task
+import stragglers
+import task_intervals
 
 
 class Stage:
-  def __init__(self):
+  def __init__(self, task_table):
     self.start_time = -1
-    self.tasks = []
+    # The TaskTable that stores this stage's tasks.
+    self.task_table = task_table
+    # The rows in task_table that hold this stage's tasks. This is a list of row indices while
+    # tasks are being added, and is replaced with a slice once the table has been compacted.
+    self.task_rows = []
+    # Values computed from this stage's tasks, which are computed the first time that they're
+    # needed, and discarded whenever the stage's tasks change.
+    self.__aggregates = {}
+
+  def __get_aggregate(self, name, compute):
+    """ Returns the named aggregate, calling compute() to compute it if it isn't cached. """
+    if name not in self.__aggregates:
+      self.__aggregates[name] = compute()
+    return self.__aggregates[name]
+
+  @property
+  def tasks(self):
+    """ Returns a list of Tasks that describe the tasks in this stage. """
+    return self.__get_aggregate("tasks", lambda: [self.task_table.task(row)
+      for row in numpy.arange(len(self.task_table))[self.rows()]])
+
+  def rows(self):
+    """ Returns an index that selects this stage's tasks from the columns of the task table. """
+    return self.task_rows
+
+  def set_rows(self, rows):
+    self.task_rows = rows
+    self.__aggregates = {}
+
+  def rows_after(self, num_tasks):
+    """
+    Returns an index that selects the tasks that were added to this stage after its first num_tasks
+    tasks (e.g., the tasks that were added since the stage was last summarized), in time
+    proportional to the number of those tasks.
+    """
+    if isinstance(self.task_rows, slice):
+      return slice(self.task_rows.start + num_tasks, self.task_rows.stop)
+    return numpy.array(self.task_rows[num_tasks:], dtype=numpy.int64)
+
+  def num_tasks(self):
+    if isinstance(self.task_rows, slice):
+      return self.task_rows.stop - self.task_rows.start
+    return len(self.task_rows)
+
+  def column(self, name):
+    """ Returns an array with the value of the given task field for each of this stage's tasks. """
+    return self.task_table.column(name)[self.rows()]
 
   def average_task_runtime(self):
-    return sum([t.runtime() for t in self.tasks]) * 1.0 / len(self.tasks)
+    return self.__get_aggregate("average_task_runtime",
+      lambda: float(numpy.mean(self.column("finish_time") - self.column("start_time"))))
+
+  def task_intervals(self):
+    """
+    Returns a TaskIntervals that indexes the times when this stage's tasks were running (see
+    task_intervals.py).
+    """
+    return self.__get_aggregate("task_intervals",
+      lambda: task_intervals.TaskIntervals(self.task_table, self.rows()))
+
+  def max_concurrency(self):
+    """ Returns the largest number of this stage's tasks that were running at the same time. """
+    return self.task_intervals().max_concurrency()
+
+  def get_stragglers(self):
+    """
+    Returns a Stragglers that describes the stragglers among this stage's tasks (see stragglers.py).
+    Finding the stragglers sets straggler_behavior_explained for the stage's tasks.
+    """
+    return self.__get_aggregate("stragglers",
+      lambda: stragglers.find_stragglers(self.task_table, self.rows()))
+
+  def traditional_stragglers(self):
+    """ Returns the number of tasks that took much longer than the median task. """
+    return self.get_stragglers().num_stragglers()
+
+  def progress_rate_stragglers(self):
+    """
+    Returns a tuple of the number of tasks that processed their input much more slowly than the
+    median task, and the total runtime of those tasks.
+    """
+    return self.get_stragglers().progress_rate_stragglers()
+
+  def scheduler_delay_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.SCHEDULER_DELAY)
+
+  def hdfs_read_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.HDFS_READ)
+
+  def hdfs_read_and_scheduler_delay_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.HDFS_READ_AND_SCHEDULER_DELAY)
+
+  def gc_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.GC)
+
+  def network_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.NETWORK)
+
+  def output_write_stragglers(self):
+    return self.get_stragglers().explained_stragglers(stragglers.OUTPUT_WRITE)
+
+  def output_progress_rate_stragglers(self):
+    return self.get_stragglers().output_progress_rate_stragglers()
 
   def __str__(self):
-    max_task_runtime = max([t.runtime() for t in self.tasks])
-    if self.tasks[0].has_fetch:
+    max_task_runtime = (self.column("finish_time") - self.column("start_time")).max()
+    first_task = self.task_table.task(self.task_table.row_indices(self.rows())[0])
+    if first_task.has_fetch:
       input_method = "shuffle"
     else:
-      input_method = self.tasks[0].input_read_method
+      input_method = first_task.input_read_method
     return (("%s tasks (avg runtime: %s, max runtime: %s) Start: %s, runtime: %s, "
       "Max concurrency: %s, "
       "Input MB: %s (from %s), Output MB: %s, Straggers: %s, Progress rate straggers: %s, "
       "Progress rate stragglers explained by scheduler delay (%s), HDFS read (%s), "
-      "HDFS and read (%s), GC (%s), Network (%s), JIT (%s), output rate stragglers: %s") %
-      (len(self.tasks), self.average_task_runtime(), max_task_runtime, self.start_time,
-       self.finish_time() - self.start_time, concurrency.get_max_concurrency(self.tasks),
+      "HDFS and read (%s), GC (%s), Network (%s), JIT (%s), Output write (%s), "
+      "output rate stragglers: %s") %
+      (self.num_tasks(), self.average_task_runtime(), max_task_runtime, self.start_time,
+       self.finish_time() - self.start_time, self.max_concurrency(),
        self.input_mb(), input_method, self.output_mb(),
        self.traditional_stragglers(), self.progress_rate_stragglers()[0],
        self.scheduler_delay_stragglers()[0], self.hdfs_read_stragglers()[0],
        self.hdfs_read_and_scheduler_delay_stragglers()[0], self.gc_stragglers()[0],
-       # Do not compute the JIT stragglers here! Screws up the calculation.
-       self.network_stragglers()[0], -1,
+       # JIT stragglers aren't detected: the event logs don't record JIT compilation time.
+       self.network_stragglers()[0], -1, self.output_write_stragglers()[0],
        self.output_progress_rate_stragglers()[0]))
 
   def verbose_str(self):
     # Get info about the longest task.
-    max_index = -1
-    max_runtime = -1
-    for i, task in enumerate(self.tasks):
-      if task.runtime() > max_runtime:
-        max_runtime = task.runtime()
-        max_index = i
-    return "%s\n    Longest Task: %s" % (self, self.tasks[i])
+    max_index = numpy.argmax(self.column("finish_time") - self.column("start_time"))
+    return "%s\n    Longest Task: %s" % (self, self.tasks[max_index])
 
   def get_executor_id_to_resource_metrics(self):
     """Compiles a description of this stage's resource usage on each executor.
 
     Returns a mapping from executor id to an ExecutorResourceMetrics object containing the
     executor's CPU, network, and GC resource usage while this stage was running.
+
+    The metrics are computed once, from the grouping of this stage's rows by executor, and cached
+    until the stage's tasks change, so callers must not modify them.
     """
-    return {executor: metrics.ExecutorResourceMetrics.get_resource_metrics_for_executor_tasks(tasks)
-      for executor, tasks in self.get_executor_id_to_tasks().iteritems()}
+    return self.__get_aggregate("executor_id_to_resource_metrics",
+      lambda: {executor_id: metrics.ExecutorResourceMetrics.get_resource_metrics_for_executor_rows(
+          self.task_table, rows)
+        for executor_id, rows in self.get_executor_id_to_rows().iteritems()})
 
   def get_executor_id_to_tasks(self):
     """
     Returns a mapping from executor id to a list of all the tasks from this stage that ran on that
     executor.
     """
-    executor_id_to_tasks = {}
-    for task in self.tasks:
-      if task.executor_id not in executor_id_to_tasks:
-        executor_id_to_tasks[task.executor_id] = []
-      executor_id_to_tasks[task.executor_id].append(task)
-    return executor_id_to_tasks
+    return self.__get_aggregate("executor_id_to_tasks",
+      lambda: {executor_id: [self.task_table.task(row) for row in rows]
+        for executor_id, rows in self.get_executor_id_to_rows().iteritems()})
+
+  def get_executor_id_to_rows(self):
+    """
+    Returns a mapping from executor id to an array of the task table rows for the tasks from this
+    stage that ran on that executor.
+    """
+    return self.__get_aggregate("executor_id_to_rows",
+      lambda: self.task_table.group_rows("executor_id", self.rows()))
 
   def load_balancing_badness(self):
-    executor_id_to_tasks = self.get_executor_id_to_tasks()
-    total_time = 0
-    for executor_id, tasks in executor_id_to_tasks.iteritems():
-      min_start_time = min([t.start_time for t in tasks])
-      max_finish_time = max([t.finish_time for t in tasks])
-      total_time += max_finish_time - min_start_time
+    return float(self.runtime()) / self.__get_aggregate(
+      "load_balancing_ideal_time", self.__get_load_balancing_ideal_time)
 
-    ideal_time = total_time / len(executor_id_to_tasks)
-    return float(self.runtime()) / ideal_time
+  def __get_load_balancing_ideal_time(self):
+    executor_id_to_rows = self.get_executor_id_to_rows()
+    start_times = self.task_table.column("start_time")
+    finish_times = self.task_table.column("finish_time")
+    total_time = 0
+    for executor_id, rows in executor_id_to_rows.iteritems():
+      total_time += int(finish_times[rows].max() - start_times[rows].min())
+    return total_time / len(executor_id_to_rows)
 
   def runtime(self):
     return self.finish_time() - self.start_time
 
   def has_shuffle_read(self):
-    total_shuffle_read_bytes = sum(
-      [t.remote_mb_read + t.local_mb_read for t in self.tasks if t.has_fetch])
-    return total_shuffle_read_bytes > 0
+    return self.__shuffle_mb_read() > 0
+
+  def __shuffle_mb_read(self):
+    return self.__get_aggregate("shuffle_mb_read", self.__compute_shuffle_mb_read)
+
+  def __compute_shuffle_mb_read(self):
+    has_fetch = self.column("has_fetch")
+    return float((self.column("remote_mb_read")[has_fetch].sum() +
+      self.column("local_mb_read")[has_fetch].sum()))
 
   def finish_time(self):
-    return max([t.finish_time for t in self.tasks])
+    return self.__get_aggregate("finish_time", lambda: int(self.column("finish_time").max()))
 
   def total_runtime(self):
-    return sum([t.finish_time - t.start_time for t in self.tasks])
+    return self.__get_aggregate("total_runtime",
+      lambda: int((self.column("finish_time") - self.column("start_time")).sum()))
 
   def input_mb(self):
     """ Returns the total input size for this stage.
 
     This is only valid if the stage read data from a shuffle.
     """
-    total_input_bytes = sum([t.remote_mb_read + t.local_mb_read for t in self.tasks if t.has_fetch])
-    total_input_bytes += sum([t.input_mb for t in self.tasks])
-    return total_input_bytes
+    return self.__shuffle_mb_read() + self.__get_aggregate(
+      "input_mb", lambda: float(self.column("input_mb").sum()))
 
   def output_mb(self):
     """ Returns the total output size for this stage.
@@ -104,21 +220,33 @@ class Stage:
     This is only valid if the output data was written for a shuffle.
     TODO: Add HDFS / in-memory RDD output size.
     """
-    total_output_size = sum([t.shuffle_mb_written for t in self.tasks])
-    return total_output_size
+    return self.__get_aggregate(
+      "output_mb", lambda: float(self.column("shuffle_mb_written").sum()))
 
   def get_network_mb(self):
-    return sum([t.remote_mb_read for t in self.tasks if t.has_fetch])
+    return self.__get_aggregate("network_mb",
+      lambda: float(self.column("remote_mb_read")[self.column("has_fetch")].sum()))
 
   def add_event(self, data):
-    task = Task(data)
+    """ Adds the task described by a SparkListenerTaskEnd event, and returns the task's row. """
+    row = self.task_table.add_task(data)
+    self.add_row(row)
+    return row
+
+  def add_row(self, row):
+    """ Adds the task stored in the given row of the task table to this stage. """
+    task_start_time = self.task_table.get_value("start_time", row)
 
     if self.start_time == -1:
-      self.start_time = task.start_time
+      self.start_time = task_start_time
     else:
-      self.start_time = min(self.start_time, task.start_time)
+      self.start_time = min(self.start_time, task_start_time)
 
-    self.tasks.append(task)
+    if not isinstance(self.task_rows, list):
+      # The rows were replaced with a slice or an array (e.g., when the table was compacted).
+      self.task_rows = self.task_table.row_indices(self.task_rows).tolist()
+    self.task_rows.append(row)
+    self.__aggregates = {}
 
   def ideal_time_s(self, num_cores_per_executor):
     ideal_times = self.get_ideal_times_from_metrics(num_cores_per_executor)
@@ -179,7 +307,8 @@ class Stage:
     # Attempt to use the CPU monotask time to compute the ideal time. If the CPU monotask time
     # is 0, that means this was a Spark job, in which case we have no choice but to use the OS
     # counters.
-    total_cpu_monotask_millis = sum([t.compute_monotask_millis for t in self.tasks])
+    total_cpu_monotask_millis = self.__get_aggregate("cpu_monotask_millis",
+      lambda: float(self.column("compute_monotask_millis").sum()))
     if total_cpu_monotask_millis > 0:
       # The compute monotask time should be very close to the time from the OS counters.
       self.__check_times_within_error_bound(
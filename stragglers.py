@@ -0,0 +1,145 @@
+"""
+This file contains functions to find the stragglers in a stage, and to attribute them to a cause,
+using vectorized operations over the columns of the stage's tasks in a TaskTable.
+
+A task is a traditional straggler if its runtime is more than STRAGGLER_THRESHOLD times the median
+runtime of the stage's tasks. Since tasks that read more data take longer, stragglers are mainly
+found using progress rates instead: a task's progress rate is its input size (Task.input_size_mb())
+divided by its runtime, and a task is a progress rate straggler if its progress rate is less than
+the median progress rate divided by STRAGGLER_THRESHOLD (i.e., if it took more than
+STRAGGLER_THRESHOLD times as long per MB as the median task). Tasks without input aren't included.
+
+Each progress rate straggler is attributed to the first of CAUSES that explains it. A cause explains
+a straggler if the task would not have been a straggler without the time that it spent on the cause
+beyond the median time that the stage's tasks spent on it. Tasks whose straggling is explained have
+straggler_behavior_explained set in the TaskTable. Output progress rate stragglers are found in the
+same way as progress rate stragglers, using the size of the task's output rather than its input.
+"""
+
+import numpy
+
+STRAGGLER_THRESHOLD = 1.5
+# The causes that stragglers are attributed to, in the order in which they're tried, and the
+# columns of the TaskTable with the time (in milliseconds) that each task spent on each of them.
+SCHEDULER_DELAY = "scheduler delay"
+HDFS_READ = "HDFS read"
+HDFS_READ_AND_SCHEDULER_DELAY = "HDFS read and scheduler delay"
+GC = "GC"
+NETWORK = "network"
+OUTPUT_WRITE = "output write"
+CAUSES = [SCHEDULER_DELAY, HDFS_READ, HDFS_READ_AND_SCHEDULER_DELAY, GC, NETWORK, OUTPUT_WRITE]
+CAUSE_TO_COLUMNS = {
+  SCHEDULER_DELAY: ["scheduler_delay"],
+  HDFS_READ: ["input_read_time"],
+  HDFS_READ_AND_SCHEDULER_DELAY: ["input_read_time", "scheduler_delay"],
+  GC: ["gc_time"],
+  NETWORK: ["fetch_wait"],
+  OUTPUT_WRITE: ["shuffle_write_time", "output_write_time"]
+}
+
+
+class Stragglers(object):
+  """ Describes the stragglers among a set of tasks (usually, the tasks in a stage).
+
+  rows holds the tasks' rows in the TaskTable, and the other arrays have one entry per task:
+  is_straggler and is_progress_rate_straggler say whether the task is a traditional or a progress
+  rate straggler, cause holds the index in CAUSES of the cause that a progress rate straggler was
+  attributed to (or -1 if it wasn't attributed to one, or isn't a straggler), and
+  is_output_progress_rate_straggler says whether the task is an output progress rate straggler.
+  """
+
+  def __init__(self, rows, runtimes, is_straggler, is_progress_rate_straggler, cause,
+               is_output_progress_rate_straggler):
+    self.rows = rows
+    self.runtimes = runtimes
+    self.is_straggler = is_straggler
+    self.is_progress_rate_straggler = is_progress_rate_straggler
+    self.cause = cause
+    self.is_output_progress_rate_straggler = is_output_progress_rate_straggler
+
+  def num_stragglers(self):
+    """ Returns the number of traditional stragglers. """
+    return int(self.is_straggler.sum())
+
+  def progress_rate_stragglers(self):
+    """
+    Returns a tuple of the number of progress rate stragglers and their total runtime (in
+    milliseconds).
+    """
+    return self.__describe(self.is_progress_rate_straggler)
+
+  def explained_stragglers(self, cause_name):
+    """
+    Returns a tuple of the number of progress rate stragglers that were attributed to the named
+    cause (one of CAUSES) and their total runtime.
+    """
+    return self.__describe(self.cause == CAUSES.index(cause_name))
+
+  def unexplained_stragglers(self):
+    """ Returns the same tuple for stragglers that weren't attributed to any cause. """
+    return self.__describe(self.is_progress_rate_straggler & (self.cause == -1))
+
+  def output_progress_rate_stragglers(self):
+    """ Returns the same tuple for output progress rate stragglers. """
+    return self.__describe(self.is_output_progress_rate_straggler)
+
+  def __describe(self, selected):
+    return (int(selected.sum()), int(self.runtimes[selected].sum()))
+
+
+def get_rate_stragglers(runtimes, sizes):
+  """
+  Returns a tuple of a boolean array that says whether each task is a straggler based on the given
+  amounts of data that the tasks processed, the time that each task took per MB, and the maximum
+  time per MB of tasks that aren't stragglers. Tasks without data are never stragglers.
+  """
+  has_data = sizes > 0
+  millis_per_mb = numpy.zeros(len(runtimes))
+  millis_per_mb[has_data] = runtimes[has_data] / sizes[has_data]
+  if not has_data.any():
+    return (has_data, millis_per_mb, 0.)
+  max_millis_per_mb = STRAGGLER_THRESHOLD * numpy.median(millis_per_mb[has_data])
+  return (has_data & (millis_per_mb > max_millis_per_mb), millis_per_mb, max_millis_per_mb)
+
+
+def find_stragglers(task_table, rows):
+  """ Finds the stragglers among the tasks in the given rows of the TaskTable.
+
+  Returns a Stragglers. Sets straggler_behavior_explained in the table for the tasks whose
+  straggling was attributed to a cause (and clears it for the other tasks).
+  """
+  rows = task_table.row_indices(rows)
+  column = lambda name: task_table.column(name)[rows]
+  runtimes = (column("finish_time") - column("start_time")).astype(numpy.float64)
+  if len(rows) == 0:
+    empty = numpy.zeros(0, dtype=numpy.bool_)
+    return Stragglers(rows, runtimes, empty, empty, numpy.zeros(0, dtype=numpy.int64), empty)
+  is_straggler = runtimes > STRAGGLER_THRESHOLD * numpy.median(runtimes)
+
+  has_fetch = column("has_fetch")
+  input_sizes = numpy.where(
+    has_fetch, column("remote_mb_read") + column("local_mb_read"), column("input_mb"))
+  is_progress_rate_straggler, _, max_millis_per_mb = get_rate_stragglers(runtimes, input_sizes)
+
+  cause = numpy.full(len(rows), -1, dtype=numpy.int64)
+  has_input = input_sizes > 0
+  if is_progress_rate_straggler.any():
+    column_to_excess = {}
+    for cause_index, cause_name in enumerate(CAUSES):
+      excess_millis = numpy.zeros(len(rows))
+      for name in CAUSE_TO_COLUMNS[cause_name]:
+        if name not in column_to_excess:
+          # The time beyond the median time spent on the cause by tasks that have input.
+          times = column(name).astype(numpy.float64)
+          column_to_excess[name] = numpy.maximum(times - numpy.median(times[has_input]), 0)
+        excess_millis += column_to_excess[name]
+      unattributed = is_progress_rate_straggler & (cause == -1)
+      explained = unattributed & (
+        (runtimes - excess_millis) <= max_millis_per_mb * numpy.where(has_input, input_sizes, 1))
+      cause[explained] = cause_index
+  task_table.set_value("straggler_behavior_explained", rows, cause != -1)
+
+  output_sizes = column("shuffle_mb_written") + column("output_mb")
+  is_output_progress_rate_straggler = get_rate_stragglers(runtimes, output_sizes)[0]
+  return Stragglers(rows, runtimes, is_straggler, is_progress_rate_straggler, cause,
+    is_output_progress_rate_straggler)
@@ -0,0 +1,185 @@
+"""
+This file contains indexes of the times when tasks were running, which answer questions such as
+"which tasks were running at time t" or "how many tasks were running at once" without scanning all
+of the tasks.
+
+Each task runs during the half-open interval [start time, finish time), so a task that finishes at
+time t isn't running at t, and a task that starts at t is.
+"""
+
+import numpy
+
+# Nodes of an IntervalIndex's tree with at most this many intervals are not split further; their
+# intervals are checked one by one (with vectorized comparisons).
+LEAF_SIZE = 64
+
+
+class IntervalIndex(object):
+  """ An index of a set of intervals, each identified by an ID (e.g., the task's row).
+
+  Counting queries (num_running() and num_overlapping()) use the sorted start and finish times, so
+  each takes O(log n) time. Queries that return the intervals (running_at() and overlapping()) use
+  a centered interval tree, so each takes O(log n + k) time for k results. The index is static:
+  intervals can't be added after it has been built.
+  """
+
+  def __init__(self, starts, finishes, ids=None):
+    self.starts = numpy.asarray(starts, dtype=numpy.int64)
+    self.finishes = numpy.asarray(finishes, dtype=numpy.int64)
+    if ids is None:
+      ids = numpy.arange(len(self.starts))
+    self.ids = numpy.asarray(ids)
+    self.sorted_starts = numpy.sort(self.starts)
+    self.sorted_finishes = numpy.sort(self.finishes)
+    # The tree is stored as parallel lists, with one entry per node. Each internal node has a
+    # center, the intervals that contain the center sorted by start time and by decreasing finish
+    # time, and the indices of the left child (for intervals that finish at or before the center)
+    # and the right child (for intervals that start after it). Leaves have a center of None, and
+    # store their intervals in the first list.
+    self.__centers = []
+    self.__by_start = []
+    self.__by_finish = []
+    self.__children = []
+    self.__build(numpy.arange(len(self.starts)))
+
+  def __len__(self):
+    return len(self.starts)
+
+  def num_running(self, times):
+    """ Returns the number of intervals that contain each of the given times. """
+    return (numpy.searchsorted(self.sorted_starts, times, side="right") -
+      numpy.searchsorted(self.sorted_finishes, times, side="right"))
+
+  def num_overlapping(self, range_start, range_finish):
+    """ Returns the number of intervals that overlap with [range_start, range_finish). """
+    return int(numpy.searchsorted(self.sorted_starts, range_finish, side="left") -
+      numpy.searchsorted(self.sorted_finishes, range_start, side="right"))
+
+  def running_at(self, time):
+    """ Returns an array with the IDs of the intervals that contain the given time. """
+    return self.overlapping(time, time + 1)
+
+  def overlapping(self, range_start, range_finish):
+    """ Returns an array with the IDs of the intervals that overlap [range_start, range_finish). """
+    found = []
+    nodes = [0] if len(self.starts) > 0 else []
+    while nodes:
+      node = nodes.pop()
+      center = self.__centers[node]
+      if center is None:
+        indices = self.__by_start[node]
+        found.append(indices[(self.starts[indices] < range_finish) &
+          (self.finishes[indices] > range_start)])
+        continue
+      left, right = self.__children[node]
+      if range_finish <= center:
+        # All of the intervals at this node finish after the range starts, since they contain the
+        # center, so only their start times need to be checked.
+        by_start = self.__by_start[node]
+        found.append(by_start[:numpy.searchsorted(
+          self.starts[by_start], range_finish, side="left")])
+        nodes.append(left)
+      elif range_start >= center:
+        by_finish = self.__by_finish[node]
+        found.append(by_finish[:numpy.searchsorted(
+          -self.finishes[by_finish], -range_start, side="left")])
+        nodes.append(right)
+      else:
+        found.append(self.__by_start[node])
+        nodes.extend([left, right])
+    if not found:
+      return self.ids[:0]
+    return self.ids[numpy.sort(numpy.concatenate(found))]
+
+  def concurrency_profile(self):
+    """ Returns the number of intervals running over time, as a step function.
+
+    Returns a tuple of (times, counts) arrays, where counts[i] intervals were running from times[i]
+    until times[i + 1]. times holds every distinct start and finish time, in order.
+    """
+    times = numpy.union1d(self.sorted_starts, self.sorted_finishes)
+    return (times, self.num_running(times))
+
+  def max_concurrency(self):
+    """ Returns the largest number of intervals that were running at the same time. """
+    if len(self.starts) == 0:
+      return 0
+    # The number of running intervals can only increase when an interval starts.
+    return int(self.num_running(self.sorted_starts).max())
+
+  def __build(self, indices):
+    """ Adds a node for the intervals with the given indices (and its children) to the tree. """
+    node = len(self.__centers)
+    self.__centers.append(None)
+    self.__by_start.append(indices)
+    self.__by_finish.append(None)
+    self.__children.append(None)
+    if len(indices) <= LEAF_SIZE:
+      return node
+    starts = self.starts[indices]
+    finishes = self.finishes[indices]
+    center = numpy.median(numpy.concatenate([starts, finishes]))
+    is_left = finishes <= center
+    is_right = starts > center
+    if is_left.all() or is_right.all():
+      # The intervals can't be split (e.g., because they're all empty and at the same time).
+      return node
+    is_center = ~(is_left | is_right)
+    center_indices = indices[is_center]
+    self.__centers[node] = center
+    self.__by_start[node] = center_indices[numpy.argsort(starts[is_center], kind="mergesort")]
+    self.__by_finish[node] = center_indices[
+      numpy.argsort(-finishes[is_center], kind="mergesort")]
+    self.__children[node] = (self.__build(indices[is_left]), self.__build(indices[is_right]))
+    return node
+
+
+class TaskIntervals(object):
+  """ Indexes the times when the tasks in a TaskTable were running.
+
+  There is one IntervalIndex for all of the tasks, and one for the tasks on each executor. The IDs
+  of the intervals in the indexes are the tasks' rows in the table.
+  """
+
+  def __init__(self, task_table, rows=slice(None)):
+    rows = task_table.row_indices(rows)
+    start_times = task_table.column("start_time")
+    finish_times = task_table.column("finish_time")
+    self.all_tasks = IntervalIndex(start_times[rows], finish_times[rows], rows)
+    self.executor_id_to_tasks = {
+      executor_id: IntervalIndex(start_times[executor_rows], finish_times[executor_rows],
+        executor_rows)
+      for executor_id, executor_rows in task_table.group_rows("executor_id", rows).iteritems()}
+
+  def running_at(self, time, executor_id=None):
+    """
+    Returns an array with the rows of the tasks that were running at the given time, on the given
+    executor (or on any executor, if executor_id is None).
+    """
+    return self.__get_index(executor_id).running_at(time)
+
+  def overlapping(self, range_start, range_finish, executor_id=None):
+    """
+    Returns an array with the rows of the tasks that were running at some time during
+    [range_start, range_finish), on the given executor (or on any executor).
+    """
+    return self.__get_index(executor_id).overlapping(range_start, range_finish)
+
+  def num_running(self, times, executor_id=None):
+    """ Returns the number of tasks running at each of the given times. """
+    return self.__get_index(executor_id).num_running(times)
+
+  def concurrency_profile(self, executor_id=None):
+    """ See IntervalIndex.concurrency_profile(). """
+    return self.__get_index(executor_id).concurrency_profile()
+
+  def max_concurrency(self, executor_id=None):
+    """ Returns the largest number of tasks that were running at once. """
+    return self.__get_index(executor_id).max_concurrency()
+
+  def __get_index(self, executor_id):
+    if executor_id is None:
+      return self.all_tasks
+    if executor_id not in self.executor_id_to_tasks:
+      return IntervalIndex([], [])
+    return self.executor_id_to_tasks[executor_id]
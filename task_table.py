@@ -0,0 +1,491 @@
+"""
+This file contains a columnar store for the tasks parsed from a Spark event log.
+"""
+
+import numpy
+
+import task
+
+# Keys used for the per-disk counters in the "Start Counters" and "End Counters" dictionaries.
+DISK_COUNTER_KEYS = ["Sectors Read", "Millis Reading", "Sectors Written", "Millis Writing",
+  "Millis Total"]
+# Keys used for the network counters in the "Start Counters" and "End Counters" dictionaries.
+TRANSMITTED_BYTES_KEY = "Transmitted Bytes"
+RECEIVED_BYTES_KEY = "Received Bytes"
+
+INITIAL_CAPACITY = 1024
+
+# Names and types of the columns that hold one value per task. Fields that Spark reports as longs
+# are stored as integers, so that they print the same way as they did when they were stored as
+# Python ints.
+SCALAR_COLUMNS = [
+  ("task_id", numpy.int64),
+  ("start_time", numpy.int64),
+  ("finish_time", numpy.int64),
+  ("executor_run_time", numpy.int64),
+  ("executor_deserialize_time", numpy.int64),
+  ("result_serialization_time", numpy.int64),
+  ("scheduler_delay", numpy.int64),
+  ("gc_time", numpy.int64),
+  ("start_gc_millis", numpy.int64),
+  ("end_gc_millis", numpy.int64),
+  ("disk_monotask_millis", numpy.float64),
+  ("compute_monotask_millis", numpy.float64),
+  ("start_network_transmit_idle_millis", numpy.int64),
+  ("end_network_transmit_idle_millis", numpy.int64),
+  ("start_transmitted_bytes", numpy.int64),
+  ("end_transmitted_bytes", numpy.int64),
+  ("start_received_bytes", numpy.int64),
+  ("end_received_bytes", numpy.int64),
+  ("bytes_transmitted_ps", numpy.float64),
+  ("bytes_received_ps", numpy.float64),
+  ("process_cpu_utilization", numpy.float64),
+  ("process_user_cpu_utilization", numpy.float64),
+  ("process_system_cpu_utilization", numpy.float64),
+  ("total_cpu_utilization", numpy.float64),
+  ("start_total_cpu_jiffies", numpy.int64),
+  ("start_cpu_utilization_millis", numpy.int64),
+  ("end_total_cpu_jiffies", numpy.int64),
+  ("end_cpu_utilization_millis", numpy.int64),
+  ("hdfs_deser_decomp_millis", numpy.int64),
+  ("hdfs_ser_comp_millis", numpy.int64),
+  ("shuffle_write_time", numpy.float64),
+  ("shuffle_mb_written", numpy.float64),
+  ("input_read_time", numpy.float64),
+  ("input_mb", numpy.float64),
+  ("output_write_time", numpy.float64),
+  ("output_mb", numpy.float64),
+  ("output_on_disk", numpy.bool_),
+  ("has_fetch", numpy.bool_),
+  ("data_local", numpy.bool_),
+  ("fetch_wait", numpy.int64),
+  ("local_blocks_read", numpy.int64),
+  ("remote_blocks_read", numpy.int64),
+  ("remote_mb_read", numpy.float64),
+  ("local_mb_read", numpy.float64),
+  ("local_read_time", numpy.float64),
+  ("total_time_fetching", numpy.int64),
+  ("straggler_behavior_explained", numpy.bool_),
+]
+
+# Columns that hold strings. These are stored as integer codes into a per-column list of values,
+# since there are only a handful of distinct values (one per executor, for example).
+CATEGORICAL_COLUMNS = ["executor", "executor_id", "input_read_method"]
+
+# Names and types of the columns that hold one value per task per disk. Each of these is stored
+# as a 2-D array with one row per task and one column per disk.
+DISK_COLUMNS = (
+  [("disk_present", numpy.bool_),
+   ("disk_utilization", numpy.float64),
+   ("disk_read_throughput_Bps", numpy.float64),
+   ("disk_write_throughput_Bps", numpy.float64)] +
+  [("disk_start_{}".format(key), numpy.int64) for key in DISK_COUNTER_KEYS] +
+  [("disk_end_{}".format(key), numpy.int64) for key in DISK_COUNTER_KEYS])
+
+
+class TaskTable(object):
+  """ Stores all of the tasks from an event log, using one NumPy array for each task field.
+
+  Tasks are identified by their row index in the table. Stages hold the rows of their tasks, and
+  Task objects are lightweight views of a single row, so reading many tasks doesn't require
+  creating a Python object (with nested dictionaries of counters) for every task.
+  """
+
+  def __init__(self):
+    self.num_rows = 0
+    self.capacity = INITIAL_CAPACITY
+    self.__columns = {name: numpy.zeros(self.capacity, dtype=dtype)
+      for name, dtype in SCALAR_COLUMNS}
+    for name in CATEGORICAL_COLUMNS:
+      self.__columns[name] = numpy.zeros(self.capacity, dtype=numpy.int32)
+    # For each categorical column, the list of values and a mapping from each value to its code.
+    self.__categories = {name: ([], {}) for name in CATEGORICAL_COLUMNS}
+    # Names of all disks that have been seen, in the order of the columns of the disk arrays.
+    self.disk_names = []
+    self.__disk_name_to_index = {}
+    self.__disk_columns = {name: numpy.zeros((self.capacity, 0), dtype=dtype)
+      for name, dtype in DISK_COLUMNS}
+
+  def __len__(self):
+    return self.num_rows
+
+  def task(self, row):
+    """ Returns a Task that describes the task stored in the given row. """
+    return task.Task(self, row)
+
+  def column(self, name):
+    """ Returns an array with the value of the given field for all tasks.
+
+    For categorical columns (e.g., "executor_id"), the returned array contains integer codes that
+    can be converted to the corresponding values with category_values().
+    """
+    return self.__columns[name][:self.num_rows]
+
+  def disk_column(self, name):
+    """ Returns a 2-D array with one row per task and one column per disk in self.disk_names. """
+    return self.__disk_columns[name][:self.num_rows]
+
+  def category_values(self, name):
+    """ Returns the list of values for a categorical column, indexed by code. """
+    return self.__categories[name][0]
+
+  def get_value(self, name, row):
+    """ Returns the value of the given field for the task in the given row, as a Python object. """
+    if name in self.__categories:
+      return self.__categories[name][0][self.__columns[name][row]]
+    if name in self.__columns:
+      return self.__columns[name][row].item()
+    raise AttributeError("Tasks do not have a field named {}".format(name))
+
+  def set_value(self, name, row, value):
+    self.__columns[name][row] = value
+
+  def row_indices(self, rows):
+    """ Returns a new array with the indices of the given rows (a slice, or a list or array).
+
+    This takes time proportional to the number of rows selected, rather than indexing
+    numpy.arange(len(table)), which creates an array with an entry for every row of the table (and,
+    for a slice, returns a view that keeps that array alive).
+    """
+    if isinstance(rows, slice):
+      return numpy.arange(*rows.indices(self.num_rows))
+    return numpy.array(rows, dtype=numpy.int64)
+
+  def get_disk_values(self, name, row):
+    """ Returns a mapping from disk name to the value of the given disk field for one task. """
+    present = self.__disk_columns["disk_present"][row]
+    values = self.__disk_columns[name][row]
+    return {disk_name: values[i].item()
+      for i, disk_name in enumerate(self.disk_names) if present[i]}
+
+  def group_rows(self, name, rows):
+    """ Groups the given rows by the value of a categorical column.
+
+    Returns a mapping from each value to an array of the rows that have that value, in the order
+    in which they appear in `rows`.
+    """
+    rows = self.row_indices(rows)
+    codes = self.__columns[name][rows]
+    order = numpy.argsort(codes, kind="mergesort")
+    sorted_codes = codes[order]
+    boundaries = numpy.flatnonzero(numpy.diff(sorted_codes)) + 1
+    values = self.__categories[name][0]
+    return {values[group_codes[0]]: rows[group_order]
+      for group_codes, group_order in zip(
+        numpy.split(sorted_codes, boundaries), numpy.split(order, boundaries))
+      if len(group_codes) > 0}
+
+  def compact(self, stages):
+    """ Rewrites the table so that it only contains the tasks in the given stages.
+
+    Afterwards, the tasks for each stage are stored in a contiguous range of rows (in the order in
+    which they were added to the stage), and each stage's rows are replaced by that range, so
+    reading a column for a stage doesn't require copying the data. A task that is in several stages
+    is only stored once, so a stage whose tasks are a suffix of an earlier stage's tasks (as when a
+    job starts relying on a stage that is already running) shares that stage's rows.
+    """
+    unique_stages = []
+    seen_stage_ids = set()
+    for stage in stages:
+      if id(stage) not in seen_stage_ids:
+        seen_stage_ids.add(id(stage))
+        unique_stages.append(stage)
+
+    stage_rows = [numpy.arange(self.num_rows)[stage.rows()] for stage in unique_stages]
+    all_rows = numpy.concatenate(stage_rows) if stage_rows else numpy.zeros(0, dtype=numpy.int64)
+    # Keep the first copy of each row, in the order in which the rows first appear.
+    _, first_indices = numpy.unique(all_rows, return_index=True)
+    order = all_rows[numpy.sort(first_indices)]
+    self.__columns = {name: column[:self.num_rows][order]
+      for name, column in self.__columns.iteritems()}
+    self.__disk_columns = {name: column[:self.num_rows][order]
+      for name, column in self.__disk_columns.iteritems()}
+    new_rows = numpy.zeros(self.num_rows, dtype=numpy.int64)
+    new_rows[order] = numpy.arange(len(order))
+    self.num_rows = self.capacity = len(order)
+
+    for stage, rows in zip(unique_stages, stage_rows):
+      rows = new_rows[rows]
+      if len(rows) == 0:
+        stage.set_rows(slice(0, 0))
+      elif numpy.all(numpy.diff(rows) == 1):
+        stage.set_rows(slice(int(rows[0]), int(rows[-1]) + 1))
+      else:
+        stage.set_rows(rows)
+
+  def to_arrays(self):
+    """ Returns a mapping from name to array with the contents of the table.
+
+    The result can be saved (e.g., with numpy.savez) and passed to from_arrays(), along with
+    disk_names and the values returned by category_values() for each categorical column, to
+    recreate the table.
+    """
+    arrays = {"column:{}".format(name): column[:self.num_rows]
+      for name, column in self.__columns.iteritems()}
+    arrays.update({"disk:{}".format(name): column[:self.num_rows]
+      for name, column in self.__disk_columns.iteritems()})
+    return arrays
+
+  @staticmethod
+  def from_arrays(arrays, name_to_category_values, disk_names):
+    """ Creates a TaskTable from the output of to_arrays(). """
+    table = TaskTable()
+    table.__columns = {name: numpy.asarray(arrays["column:{}".format(name)], dtype=dtype)
+      for name, dtype in SCALAR_COLUMNS}
+    for name in CATEGORICAL_COLUMNS:
+      table.__columns[name] = numpy.asarray(arrays["column:{}".format(name)], dtype=numpy.int32)
+      values = list(name_to_category_values[name])
+      table.__categories[name] = (values, {value: code for code, value in enumerate(values)})
+    table.disk_names = list(disk_names)
+    table.__disk_name_to_index = {name: index for index, name in enumerate(table.disk_names)}
+    table.__disk_columns = {name: numpy.asarray(arrays["disk:{}".format(name)], dtype=dtype)
+      for name, dtype in DISK_COLUMNS}
+    table.num_rows = table.capacity = len(table.__columns["task_id"])
+    return table
+
+  @staticmethod
+  def concatenate(tables):
+    """ Returns a new TaskTable with all of the tasks in the given tables, in order. """
+    result = TaskTable()
+    result.num_rows = result.capacity = sum([len(table) for table in tables])
+    for name, column in result.__columns.iteritems():
+      if name in result.__categories:
+        # Each table has its own codes, so they need to be translated to the new table's codes.
+        parts = []
+        for table in tables:
+          code_map = numpy.array(
+            [result.__get_code(name, value) for value in table.category_values(name)],
+            dtype=numpy.int32)
+          parts.append(code_map[table.column(name)])
+      else:
+        parts = [table.column(name) for table in tables]
+      result.__columns[name] = numpy.concatenate(parts).astype(column.dtype)
+
+    for table in tables:
+      for disk_name in table.disk_names:
+        if disk_name not in result.__disk_name_to_index:
+          result.__disk_name_to_index[disk_name] = len(result.disk_names)
+          result.disk_names.append(disk_name)
+    for name, dtype in DISK_COLUMNS:
+      column = numpy.zeros((result.num_rows, len(result.disk_names)), dtype=dtype)
+      start = 0
+      for table in tables:
+        disk_indices = [result.__disk_name_to_index[disk_name] for disk_name in table.disk_names]
+        column[start:start + len(table), disk_indices] = table.disk_column(name)
+        start += len(table)
+      result.__disk_columns[name] = column
+    return result
+
+  def add_task(self, json_data):
+    """ Parses a SparkListenerTaskEnd event and adds the task to the table.
+
+    Returns the row index of the new task.
+    """
+    task_info = json_data["Task Info"]
+    task_metrics = json_data["Task Metrics"]
+    row = {}
+    row["task_id"] = task_info["Task ID"]
+
+    # Times for monotasks.
+    if "Disk Nanos" in task_metrics:
+      row["disk_monotask_millis"] = task_metrics["Disk Nanos"] / 1000000.
+    if "Computation Nanos" in task_metrics:
+      row["compute_monotask_millis"] = task_metrics["Computation Nanos"] / 1000000.
+
+    DISK_BYTES_SPILLED_KEY = "Disk Bytes Spilled"
+    if DISK_BYTES_SPILLED_KEY in task_metrics and task_metrics[DISK_BYTES_SPILLED_KEY] > 0:
+      print "Task has spilled disk bytes! these aren't accounted for in metrics"
+      print row["task_id"]
+
+    row["start_time"] = task_info["Launch Time"]
+    row["finish_time"] = task_info["Finish Time"]
+    row["executor"] = task_info["Host"]
+    row["executor_run_time"] = task_metrics["Executor Run Time"]
+    row["executor_deserialize_time"] = task_metrics["Executor Deserialize Time"]
+    row["result_serialization_time"] = task_metrics["Result Serialization Time"]
+    row["scheduler_delay"] = (row["finish_time"] - row["executor_run_time"] -
+      row["executor_deserialize_time"] - row["result_serialization_time"] - row["start_time"])
+    row["gc_time"] = task_metrics["JVM GC Time"]
+    row["end_gc_millis"] = task_metrics.get("JVM GC Time Total", 0)
+    row["start_gc_millis"] = row["end_gc_millis"] - row["gc_time"]
+    row["executor_id"] = task_info["Executor ID"]
+
+    disks = {}
+    DISK_UTILIZATION_KEY = "Disk Utilization"
+    if DISK_UTILIZATION_KEY in task_metrics:
+      for dic in task_metrics[DISK_UTILIZATION_KEY]["Device Name To Utilization"]:
+        for device_name, block_utilization in dic.iteritems():
+          disk = {
+            "disk_present": True,
+            "disk_utilization": block_utilization["Disk Utilization"],
+            "disk_read_throughput_Bps": block_utilization["Read Throughput"],
+            "disk_write_throughput_Bps": block_utilization["Write Throughput"]
+          }
+          start_counters = block_utilization.get("Start Counters", {})
+          end_counters = block_utilization.get("End Counters", {})
+          for key in DISK_COUNTER_KEYS:
+            disk["disk_start_{}".format(key)] = start_counters.get(key, 0)
+            disk["disk_end_{}".format(key)] = end_counters.get(key, 0)
+          disks[device_name] = disk
+
+    row["start_network_transmit_idle_millis"] = task_metrics.get(
+      "Start Network Transmit Total Idle Millis", 0)
+    row["end_network_transmit_idle_millis"] = task_metrics.get(
+      "End Network Transmit Total Idle Millis", 0)
+
+    network_util_info = task_metrics.get("Network Utilization", {})
+    start_network_counters = network_util_info.get("Start Counters", {})
+    end_network_counters = network_util_info.get("End Counters", {})
+    row["start_transmitted_bytes"] = start_network_counters.get(TRANSMITTED_BYTES_KEY, 0)
+    row["end_transmitted_bytes"] = end_network_counters.get(TRANSMITTED_BYTES_KEY, 0)
+    row["start_received_bytes"] = start_network_counters.get(RECEIVED_BYTES_KEY, 0)
+    row["end_received_bytes"] = end_network_counters.get(RECEIVED_BYTES_KEY, 0)
+    row["bytes_transmitted_ps"] = network_util_info.get("Bytes Transmitted Per Second", 0.)
+    row["bytes_received_ps"] = network_util_info.get("Bytes Received Per Second", 0.)
+
+    CPU_UTILIZATION_KEY = "Cpu Utilization"
+    if CPU_UTILIZATION_KEY in task_metrics:
+      cpu_utilization = task_metrics[CPU_UTILIZATION_KEY]
+      row["process_user_cpu_utilization"] = cpu_utilization["Process User Utilization"]
+      row["process_system_cpu_utilization"] = cpu_utilization["Process System Utilization"]
+      row["process_cpu_utilization"] = (row["process_user_cpu_utilization"] +
+        row["process_system_cpu_utilization"])
+      row["total_cpu_utilization"] = (cpu_utilization["Total User Utilization"] +
+        cpu_utilization["Total System Utilization"])
+
+      START_COUNTER_KEY = "Start Counters"
+      if START_COUNTER_KEY in cpu_utilization:
+        start_counters = cpu_utilization[START_COUNTER_KEY]
+        row["start_total_cpu_jiffies"] = (start_counters["Total User Jiffies"] +
+          start_counters["Total System Jiffies"])
+        row["start_cpu_utilization_millis"] = start_counters["Time Milliseconds"]
+        end_counters = cpu_utilization["End Counters"]
+        row["end_total_cpu_jiffies"] = (end_counters["Total User Jiffies"] +
+          end_counters["Total System Jiffies"])
+        row["end_cpu_utilization_millis"] = end_counters["Time Milliseconds"]
+
+    row["hdfs_deser_decomp_millis"] = task_metrics.get(
+      "HDFS Deserialization/Decompression Millis", 0)
+    row["hdfs_ser_comp_millis"] = task_metrics.get("HDFS Serialization/Compression Millis", 0)
+
+    SHUFFLE_WRITE_METRICS_KEY = "Shuffle Write Metrics"
+    if SHUFFLE_WRITE_METRICS_KEY in task_metrics:
+      shuffle_write_metrics = task_metrics[SHUFFLE_WRITE_METRICS_KEY]
+      # Convert to milliseconds (from nanoseconds).
+      shuffle_write_time = shuffle_write_metrics["Shuffle Write Time"] / 1.0e6
+      OPEN_TIME_KEY = "Shuffle Open Time"
+      if OPEN_TIME_KEY in shuffle_write_metrics:
+        shuffle_write_time += shuffle_write_metrics[OPEN_TIME_KEY] / 1.0e6
+      CLOSE_TIME_KEY = "Shuffle Close Time"
+      if CLOSE_TIME_KEY in shuffle_write_metrics:
+        shuffle_write_time += shuffle_write_metrics[CLOSE_TIME_KEY] / 1.0e6
+      row["shuffle_write_time"] = shuffle_write_time
+      row["shuffle_mb_written"] = shuffle_write_metrics["Shuffle Bytes Written"] / 1048576.
+
+    INPUT_METRICS_KEY = "Input Metrics"
+    row["input_read_method"] = "unknown"
+    if INPUT_METRICS_KEY in task_metrics:
+      input_metrics = task_metrics[INPUT_METRICS_KEY]
+      if "Read Time Nanos" in input_metrics:
+        row["input_read_time"] = input_metrics["Read Time Nanos"] / 1.0e6
+      row["input_read_method"] = input_metrics["Data Read Method"]
+      if row["input_read_method"] == "Hadoop" and "Hadoop Bytes Read" in input_metrics:
+        # Use a special counter; Spark's estimate is wrong.
+        row["input_mb"] = input_metrics["Hadoop Bytes Read"] / 1048576.
+      else:
+        row["input_mb"] = input_metrics["Bytes Read"] / 1048576.
+
+    output_mb = 0
+    output_on_disk = True
+    OUTPUT_WRITE_KEY = "Output Write Blocked Nanos"
+    if OUTPUT_WRITE_KEY in task_metrics:
+      row["output_write_time"] = task_metrics[OUTPUT_WRITE_KEY] / 1.0e6
+
+    OUTPUT_BYTES_KEY = "Output Bytes"
+    if OUTPUT_BYTES_KEY in task_metrics:
+      output_mb = task_metrics[OUTPUT_BYTES_KEY] / 1048576.
+
+    # Account for in-memory output.
+    UPDATED_BLOCKS_KEY = "Updated Blocks"
+    if UPDATED_BLOCKS_KEY in task_metrics:
+      for block in task_metrics[UPDATED_BLOCKS_KEY]:
+        status = block["Status"]
+        memory_size = block["Status"]["Memory Size"]
+        if status["Memory Size"] > 0 and output_on_disk:
+          assert(output_mb == 0)
+          output_on_disk = False
+        output_mb += memory_size / 1048576.
+    row["output_mb"] = output_mb
+    row["output_on_disk"] = output_on_disk
+
+    # False if the task was a map task that did not run locally with its input data.
+    row["data_local"] = True
+    SHUFFLE_READ_METRICS_KEY = "Shuffle Read Metrics"
+    if SHUFFLE_READ_METRICS_KEY not in task_metrics:
+      if task_info["Locality"] != "NODE_LOCAL":
+        row["data_local"] = False
+      row["has_fetch"] = False
+    else:
+      row["has_fetch"] = True
+      shuffle_read_metrics = task_metrics[SHUFFLE_READ_METRICS_KEY]
+      row["fetch_wait"] = shuffle_read_metrics["Fetch Wait Time"]
+      row["local_blocks_read"] = shuffle_read_metrics["Local Blocks Fetched"]
+      row["remote_blocks_read"] = shuffle_read_metrics["Remote Blocks Fetched"]
+      row["remote_mb_read"] = shuffle_read_metrics["Remote Bytes Read"] / 1048576.
+      LOCAL_BYTES_READ_KEY = "Local Bytes Read"
+      if LOCAL_BYTES_READ_KEY in shuffle_read_metrics:
+        row["local_mb_read"] = shuffle_read_metrics[LOCAL_BYTES_READ_KEY] / 1048576.
+      # The local read time is not included in the fetch wait time: the task blocks
+      # on reading data locally in the BlockFetcherIterator.initialize() method.
+      LOCAL_READ_TIME_KEY = "Local Read Time"
+      if LOCAL_READ_TIME_KEY in shuffle_read_metrics:
+        # Local read time is in nanoseconds in Kay's special branch.
+        row["local_read_time"] = shuffle_read_metrics[LOCAL_READ_TIME_KEY] / 1.0e6
+      row["total_time_fetching"] = shuffle_read_metrics["Fetch Wait Time"]
+
+    return self.__append(row, disks)
+
+  def __append(self, row, disks):
+    """ Adds a task, described by a mapping from column name to value, to the table. """
+    index = self.num_rows
+    if index == self.capacity:
+      self.__grow(max(2 * self.capacity, INITIAL_CAPACITY))
+    for disk_name in disks:
+      if disk_name not in self.__disk_name_to_index:
+        self.__add_disk(disk_name)
+
+    for name, value in row.iteritems():
+      if name in self.__categories:
+        value = self.__get_code(name, value)
+      self.__columns[name][index] = value
+    for disk_name, disk in disks.iteritems():
+      disk_index = self.__disk_name_to_index[disk_name]
+      for name, value in disk.iteritems():
+        self.__disk_columns[name][index, disk_index] = value
+    self.num_rows += 1
+    return index
+
+  def __get_code(self, name, value):
+    values, value_to_code = self.__categories[name]
+    if value not in value_to_code:
+      value_to_code[value] = len(values)
+      values.append(value)
+    return value_to_code[value]
+
+  def __grow(self, new_capacity):
+    for name, column in self.__columns.iteritems():
+      new_column = numpy.zeros(new_capacity, dtype=column.dtype)
+      new_column[:self.num_rows] = column[:self.num_rows]
+      self.__columns[name] = new_column
+    for name, column in self.__disk_columns.iteritems():
+      new_column = numpy.zeros((new_capacity, column.shape[1]), dtype=column.dtype)
+      new_column[:self.num_rows] = column[:self.num_rows]
+      self.__disk_columns[name] = new_column
+    self.capacity = new_capacity
+
+  def __add_disk(self, disk_name):
+    self.__disk_name_to_index[disk_name] = len(self.disk_names)
+    self.disk_names.append(disk_name)
+    for name, column in self.__disk_columns.iteritems():
+      self.__disk_columns[name] = numpy.hstack(
+        [column, numpy.zeros((column.shape[0], 1), dtype=column.dtype)])
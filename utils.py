@@ -2,12 +2,14 @@
 This file contains helper functions used by many of the experiment scripts.
 """
 
+import functools
+import multiprocessing
 from optparse import OptionParser
 import os
-from os import path
 import subprocess
 import sys
 
+import log_files
 import plot_continuous_monitor
 
 # Copy a file from a given host through scp, throwing an exception if scp fails.
@@ -24,6 +26,10 @@ def ssh_get_stdout(host, identity_file, username, command):
 
 def copy_latest_zipped_logs(driver_hostname, identity_file, output_prefix, num_experiments,
                             username):
+  """ Copies the bundles with the logs from the latest experiments into output_prefix.
+
+  The bundles aren't extracted, since the logs in them can be read directly (see log_files.py).
+  """
   list_filenames_command = "ls -t /mnt/experiment_log_*gz | head -n " + num_experiments
   event_log_filenames = ssh_get_stdout(
     driver_hostname,
@@ -45,11 +51,6 @@ def copy_latest_zipped_logs(driver_hostname, identity_file, output_prefix, num_e
       event_log_filename,
       local_zipped_logs_name)
 
-    # Unzip the file.
-    subprocess.check_call(
-      "tar -xvzf %s -C %s" % (local_zipped_logs_name, output_prefix),
-      shell=True)
-
 def copy_latest_continuous_monitor(hostname, identity_file, filename_prefix, username):
   """ Copies logs back from a Spark cluster.
 
@@ -77,12 +78,40 @@ def copy_latest_continuous_monitor(hostname, identity_file, filename_prefix, use
   plot_continuous_monitor.plot_continuous_monitor(local_continuous_monitor_file, open_graphs=True)
   return local_continuous_monitor_file
 
-def plot_continuous_monitors(log_dir):
-  """ Plots all of the continuous monitors in the provided directory. """
-  for log_filename in os.listdir(log_dir):
-    if log_filename.endswith("executor_monitor"):
-      plot_continuous_monitor.plot_continuous_monitor(
-        path.join(log_dir, log_filename), use_gnuplot=True)
+def plot_continuous_monitors(log_dir, num_processes=1, use_gnuplot=True, single_pdf=False):
+  """ Plots all of the continuous monitors in the provided directory or tar bundle.
+
+  The monitors are plotted in parallel by num_processes worker processes (see parallel_map()). When
+  use_gnuplot is false, the graphs are drawn with matplotlib's Agg renderer, so no display is
+  needed; if single_pdf is also true, the graphs for each monitor are written to a single
+  multi-page PDF. With a single process, a bundle is only read once (see log_files.iter_logs());
+  otherwise, each worker reads the bundle up to the monitor that it plots.
+  """
+  plot = functools.partial(plot_continuous_monitor.plot_continuous_monitor,
+    use_gnuplot=use_gnuplot, single_pdf=single_pdf)
+  is_monitor = lambda name: name.endswith("executor_monitor")
+  if num_processes <= 1:
+    for filename, monitor_file in log_files.iter_logs(log_dir, is_monitor):
+      plot(filename, monitor_file=monitor_file)
+  else:
+    parallel_map(plot, log_files.find_logs(log_dir, is_monitor), num_processes)
+
+def parallel_map(function, items, num_processes):
+  """ Returns [function(item) for item in items], computed using a pool of worker processes.
+
+  If num_processes is 1, the items are processed in the current process. The function, items, and
+  results are passed between processes, so they must be picklable (so, for example, the function
+  should be defined at the top level of a module, or be a functools.partial of such a function),
+  and should be small.
+  """
+  if num_processes <= 1:
+    return map(function, items)
+  pool = multiprocessing.Pool(num_processes)
+  try:
+    return pool.map(function, items, chunksize=1)
+  finally:
+    pool.close()
+    pool.join()
 
 def bytes_to_string(size):
   """Converts a quantity in bytes to a human-readable string such as "4.0 MB".
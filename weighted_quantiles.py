@@ -0,0 +1,62 @@
+"""
+This file contains functions to compute exact summaries (quantiles, mean, minimum, and maximum) of
+weighted or unweighted distributions, using vectorized NumPy operations.
+
+For unweighted values, quantiles are linearly interpolated between the closest values, which is
+what numpy.percentile does. For weighted values, quantile q is the smallest value for which the
+total weight of that value and all smaller values is more than q of the total weight.
+"""
+
+import collections
+
+import numpy
+
+Summary = collections.namedtuple("Summary", ["quantiles", "mean", "min", "max"])
+
+
+def summarize(values, quantiles, weights=None):
+  """
+  Returns a Summary of the given values, with the value of each of the given quantiles (between 0
+  and 1), the (weighted) mean, and the minimum and maximum. If weights is given, it must be an array
+  with a non-negative weight for each value, with a positive sum. values must not be empty.
+  """
+  values = numpy.asarray(values)
+  quantiles = numpy.asarray(quantiles, dtype=numpy.float64)
+  if weights is None:
+    sorted_values = numpy.sort(values)
+    quantile_values = get_interpolated_quantiles(sorted_values, quantiles)
+    mean = numpy.mean(sorted_values)
+  else:
+    weights = numpy.asarray(weights)
+    # Break ties using the weights, so that the order (and therefore the mean) is deterministic.
+    order = numpy.lexsort((weights, values))
+    sorted_values = values[order]
+    sorted_weights = weights[order]
+    quantile_values = get_weighted_quantiles(sorted_values, sorted_weights, quantiles)
+    # Sum in sorted order, so that the result doesn't depend on the order of the values.
+    mean = numpy.average(sorted_values, weights=sorted_weights)
+  return Summary(quantile_values.tolist(), mean, sorted_values[0], sorted_values[-1])
+
+
+def get_interpolated_quantiles(sorted_values, quantiles):
+  """
+  Returns an array with the given quantiles of the sorted values, interpolating linearly between the
+  closest values.
+  """
+  positions = quantiles * (len(sorted_values) - 1)
+  lower_indices = numpy.floor(positions).astype(numpy.int64)
+  upper_indices = numpy.minimum(lower_indices + 1, len(sorted_values) - 1)
+  fractions = positions - lower_indices
+  lower_values = sorted_values[lower_indices]
+  return lower_values + (sorted_values[upper_indices] - lower_values) * fractions
+
+
+def get_weighted_quantiles(sorted_values, sorted_weights, quantiles):
+  """
+  Returns an array with the given weighted quantiles of the sorted values, where sorted_weights has
+  the weight of each of the values.
+  """
+  cumulative_fractions = numpy.cumsum(sorted_weights, dtype=numpy.float64)
+  cumulative_fractions /= cumulative_fractions[-1]
+  indices = numpy.searchsorted(cumulative_fractions, quantiles, side="right")
+  return sorted_values[numpy.minimum(indices, len(sorted_values) - 1)]